@@ -1,3 +1,6 @@
 # adk/__init__.py
 
 from .agent import Agent
+from .graph import AgentGraph
+from .metrics import REGISTRY, TRACER
+from .context import PipelineContext
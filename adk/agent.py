@@ -1,8 +1,46 @@
 # adk/agent.py
 
+import time
+from .metrics import REGISTRY, TRACER
+
+
 class Agent:
+    # Context keys this agent reads from / writes to the shared pipeline context.
+    # AgentGraph uses them to work out which agents can run at the same time.
+    reads = ()
+    writes = ()
+    # Seconds before the executor gives up waiting on run() (None = no limit).
+    # run() keeps going in its thread after that, so its own side effects land late
+    timeout = None
+
     def __init__(self, name="Agent"):
         self.name = name
 
     def run(self, context):
         raise NotImplementedError("Subclasses must implement the run() method")
+
+    def invoke(self, context):
+        # run() with wall/CPU timing, run/error counters and a span per call
+        with TRACER.span(f"{self.name}.run", agent=self.name):
+            wall_start = time.perf_counter()
+            cpu_start = time.thread_time()
+            try:
+                return self.run(context)
+            except Exception:
+                REGISTRY.inc("agent_errors_total", agent=self.name)
+                raise
+            finally:
+                REGISTRY.inc("agent_runs_total", agent=self.name)
+                REGISTRY.observe("agent_run_seconds", time.perf_counter() - wall_start, agent=self.name)
+                REGISTRY.observe("agent_cpu_seconds", time.thread_time() - cpu_start, agent=self.name)
+
+    def record_call(self, target, seconds, ok=True, retries=0):
+        # Latency / outcome of a call to an external service
+        REGISTRY.observe("external_call_seconds", seconds, agent=self.name, target=target)
+        if retries:
+            REGISTRY.inc("external_call_retries_total", retries, agent=self.name, target=target)
+        if not ok:
+            REGISTRY.inc("external_call_errors_total", agent=self.name, target=target)
+
+    def record_cache(self, cache, hit):
+        REGISTRY.inc("cache_hits_total" if hit else "cache_misses_total", agent=self.name, cache=cache)
@@ -0,0 +1,221 @@
+# adk/context.py
+# Struct-of-arrays pipeline context.
+#
+# The agents exchange a handful of numeric fields per household (sensor
+# reading, forecast, price, optimizer outcome). As nested dicts that is ~20
+# Python objects per household; here each field is one NumPy column for all
+# households, decisions/actions are int8 codes, and row i is available as a
+# read/write dict view for code that still expects today's shape:
+#
+#     ctx[i]["forecast"]["predicted_consumption_kWh"]
+#
+# to_arrow() hands the columns to Arrow without copying them.
+
+from collections.abc import Mapping
+
+import numpy as np
+
+from utils.battery import ACTIONS, DECISIONS
+
+# section -> fields; None is the top level of today's context dict
+SCHEMA = {
+    "sensor_data": ("timestamp", "consumption_kWh", "solar_generation_kWh"),
+    "forecast": ("predicted_consumption_kWh", "predicted_solar_kWh"),
+    None: (
+        "price_kWh", "decision", "battery_action", "battery_charge_kWh", "expected_cost",
+        "net_demand_kWh", "effective_consumption_kWh", "effective_solar_kWh", "net_cost", "savings",
+    ),
+}
+# Fields stored as codes into these label arrays (-1 = missing)
+CATEGORIES = {"decision": DECISIONS, "battery_action": ACTIONS}
+TIMESTAMP_DTYPE = "datetime64[ns]"
+
+
+def _dtype(field):
+    if field == "timestamp":
+        return np.dtype(TIMESTAMP_DTYPE)
+    if field in CATEGORIES:
+        return np.dtype(np.int8)
+    return np.dtype(np.float64)
+
+
+def _missing(dtype):
+    if dtype.kind == "M":
+        return np.datetime64("NaT")
+    return -1 if dtype.kind == "i" else np.nan
+
+
+COLUMNS = tuple(field for fields in SCHEMA.values() for field in fields)
+SECTION_OF = {field: section for section, fields in SCHEMA.items() for field in fields}
+DTYPES = {field: _dtype(field) for field in COLUMNS}
+
+
+class PipelineContext:
+    __slots__ = ("n", "columns")
+
+    def __init__(self, n, columns=None):
+        self.n = n
+        self.columns = {}
+        for field in COLUMNS:
+            self.columns[field] = np.full(n, _missing(DTYPES[field]), dtype=DTYPES[field])
+        self.update(columns or {})
+
+    def update(self, columns):
+        # Store arrays by field name (e.g. a FleetOptimizerAgent.step result);
+        # arrays that already have the column dtype are kept without copying.
+        # Scalars broadcast; unknown keys are ignored.
+        for field, values in columns.items():
+            if field not in DTYPES:
+                continue
+            values = np.asarray(values)
+            if field in CATEGORIES and values.dtype.kind in "US":
+                values = _encode(field, values)
+            values = values.astype(DTYPES[field], copy=False)
+            if values.shape == (self.n,):
+                self.columns[field] = values
+            else:
+                self.columns[field][:] = values
+        return self
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        if not -self.n <= i < self.n:
+            raise IndexError(i)
+        return ContextView(self, i % self.n)
+
+    def __iter__(self):
+        for i in range(self.n):
+            yield ContextView(self, i)
+
+    def labels(self, field):
+        # Decision/action strings for a categorical column
+        codes = self.columns[field]
+        return np.where(codes >= 0, CATEGORIES[field][np.maximum(codes, 0)], None)
+
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    @classmethod
+    def from_dicts(cls, contexts):
+        # Build from today's nested context dicts
+        contexts = list(contexts)
+        ctx = cls(len(contexts))
+        for field in COLUMNS:
+            section = SECTION_OF[field]
+            values = [(c.get(section) or {} if section else c).get(field) for c in contexts]
+            if all(v is None for v in values):
+                continue
+            if field == "timestamp":
+                values = [np.datetime64(v.rstrip("Z"), "ns") if v else np.datetime64("NaT") for v in values]
+            elif field in CATEGORIES:
+                values = _encode(field, np.array(["" if v is None else v for v in values]))
+            else:
+                values = [np.nan if v is None else v for v in values]
+            ctx.columns[field] = np.array(values, dtype=DTYPES[field])
+        return ctx
+
+    def to_dicts(self):
+        return [view.to_dict() for view in self]
+
+    def to_arrow(self):
+        # Zero-copy: numeric and timestamp columns share their buffers with the
+        # NumPy arrays (missing floats stay NaN); categorical codes become the
+        # indices of a dictionary array, with a validity mask only if a code is missing.
+        import pyarrow as pa
+
+        arrays = {}
+        for field, column in self.columns.items():
+            if field in CATEGORIES:
+                missing = column < 0
+                indices = pa.array(column, mask=missing) if missing.any() else pa.array(column)
+                arrays[field] = pa.DictionaryArray.from_arrays(indices, pa.array(CATEGORIES[field].tolist()))
+            else:
+                arrays[field] = pa.array(column)
+        return pa.table(arrays)
+
+    @classmethod
+    def from_arrow(cls, table):
+        # Inverse of to_arrow(); columns without nulls come back without a copy
+        columns = {}
+        for field in table.column_names:
+            if field not in DTYPES:
+                continue
+            chunked = table.column(field)
+            array = chunked.combine_chunks() if chunked.num_chunks != 1 else chunked.chunk(0)
+            if field in CATEGORIES:
+                labels = array.dictionary.to_pylist()
+                codes = array.indices.fill_null(0).to_numpy(zero_copy_only=False).astype(np.int8, copy=False)
+                if labels != CATEGORIES[field].tolist():
+                    codes = _encode(field, np.array(labels, dtype=str))[codes]
+                if array.null_count:
+                    codes = np.where(array.is_null().to_numpy(zero_copy_only=False), -1, codes)
+                columns[field] = codes
+            else:
+                columns[field] = array.to_numpy(zero_copy_only=array.null_count == 0)
+        return cls(table.num_rows, columns)
+
+
+def _encode(field, labels):
+    # Label strings -> int8 codes, -1 for anything unknown
+    categories = CATEGORIES[field]
+    order = np.argsort(categories)
+    pos = np.clip(np.searchsorted(categories, labels, sorter=order), 0, len(categories) - 1)
+    codes = order[pos]
+    return np.where(categories[codes] == labels, codes, -1).astype(np.int8)
+
+
+class ContextView(Mapping):
+    # Row i of a PipelineContext in the shape of today's context dict
+    __slots__ = ("_ctx", "_i", "_section")
+
+    def __init__(self, ctx, i, section=None):
+        self._ctx = ctx
+        self._i = i
+        self._section = section
+
+    def _keys(self):
+        if self._section is not None:
+            return SCHEMA[self._section]
+        return tuple(s for s in SCHEMA if s is not None) + SCHEMA[None]
+
+    def __getitem__(self, key):
+        if self._section is None and key in SCHEMA and key is not None:
+            return ContextView(self._ctx, self._i, key)
+        if key not in self._keys():
+            raise KeyError(key)
+        value = self._ctx.columns[key][self._i]
+        if key == "timestamp":
+            return None if np.isnat(value) else np.datetime_as_string(value, unit="us") + "Z"
+        if key in CATEGORIES:
+            return str(CATEGORIES[key][value]) if value >= 0 else None
+        return float(value)
+
+    def __setitem__(self, key, value):
+        if self._section is None and key in SCHEMA and key is not None:
+            for field, item in value.items():
+                ContextView(self._ctx, self._i, key)[field] = item
+            return
+        if key not in self._keys():
+            raise KeyError(f"{key!r} is not a context field")
+        if key == "timestamp":
+            value = np.datetime64(value.rstrip("Z"), "ns") if value else np.datetime64("NaT")
+        elif key in CATEGORIES:
+            value = _encode(key, np.array([value]))[0]
+        self._ctx.columns[key][self._i] = value
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def to_dict(self):
+        return {
+            key: value.to_dict() if isinstance(value, ContextView) else value
+            for key, value in self.items()
+        }
+
+    def __repr__(self):
+        return repr(self.to_dict())
@@ -0,0 +1,124 @@
+# adk/graph.py
+
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.logger import get_logger
+from .metrics import REGISTRY, TRACER
+
+
+class AgentGraph:
+    """Runs agents as a dependency graph built from their declared reads/writes.
+
+    An agent depends on every earlier agent (in list order) that writes a key
+    it reads, or that writes a key it also writes. Agents whose dependencies
+    have finished are submitted to a thread pool together, so independent
+    agents run concurrently.
+
+    An agent that raises or passes its timeout is recorded in `last_errors` and
+    its `writes` keys are left out of the result, so callers must not assume
+    every key is present. Agents that read those keys still run and see them
+    missing. A timed-out agent's thread can't be stopped: its return value is
+    dropped, but side effects it makes itself (the optimizer's stored state of
+    charge, a queued sensor reading) still land whenever it finishes.
+    """
+
+    def __init__(self, agents, max_workers=None, default_timeout=None, name="AgentGraph"):
+        self.agents = list(agents)
+        self.default_timeout = default_timeout
+        self.logger = get_logger(name)
+        self.deps = self._build_deps()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or len(self.agents),
+            thread_name_prefix=name,
+        )
+        self.last_errors = {}
+
+    def _build_deps(self):
+        last_writer = {}
+        deps = []
+        for i, agent in enumerate(self.agents):
+            keys = set(agent.reads) | set(agent.writes)
+            deps.append({last_writer[k] for k in keys if k in last_writer})
+            for key in agent.writes:
+                last_writer[key] = i
+        return deps
+
+    def _timeout_for(self, agent):
+        return agent.timeout if agent.timeout is not None else self.default_timeout
+
+    def run(self, context=None):
+        with TRACER.span("tick", graph=self.logger.name):
+            return self._run(context)
+
+    def _run(self, context):
+        ctx = dict(context or {})
+        timings = {}
+        errors = {}
+        pending = set(range(len(self.agents)))
+        finished = set()
+        running = {}  # future -> (index, start, deadline)
+        tick_start = time.perf_counter()
+
+        while pending or running:
+            ready = sorted(i for i in pending if self.deps[i] <= finished)
+            for i in ready:
+                agent = self.agents[i]
+                timeout = self._timeout_for(agent)
+                start = time.perf_counter()
+                deadline = start + timeout if timeout is not None else None
+                # Each agent gets its own snapshot so concurrent updates can't race;
+                # copying the contextvars keeps its span under this tick's trace
+                future = self.executor.submit(contextvars.copy_context().run, agent.invoke, dict(ctx))
+                running[future] = (i, start, deadline)
+                pending.discard(i)
+
+            if not running:
+                break
+
+            deadlines = [d for _, _, d in running.values() if d is not None]
+            wait_for = max(0.0, min(deadlines) - time.perf_counter()) if deadlines else None
+            done, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                i, start, _ = running.pop(future)
+                agent = self.agents[i]
+                timings[agent.name] = round((time.perf_counter() - start) * 1000, 2)
+                try:
+                    ctx.update(future.result() or {})
+                except Exception as e:
+                    errors[agent.name] = repr(e)
+                    self.logger.error(f"{agent.name} failed: {e}")
+                finished.add(i)
+
+            now = time.perf_counter()
+            for future, (i, start, deadline) in list(running.items()):
+                if deadline is not None and now >= deadline:
+                    agent = self.agents[i]
+                    # The worker thread can't be interrupted; its result is dropped but
+                    # anything it writes outside the context still happens late
+                    future.cancel()
+                    running.pop(future)
+                    timings[agent.name] = round((now - start) * 1000, 2)
+                    errors[agent.name] = f"timed out after {self._timeout_for(agent)}s"
+                    REGISTRY.inc("agent_timeouts_total", agent=agent.name)
+                    self.logger.warning(f"{agent.name} timed out after {self._timeout_for(agent)}s")
+                    finished.add(i)
+
+        timings["tick"] = round((time.perf_counter() - tick_start) * 1000, 2)
+        REGISTRY.observe("tick_seconds", timings["tick"] / 1000, graph=self.logger.name)
+        self.last_errors = errors
+        ctx["timings_ms"] = timings
+        return ctx
+
+    def critical_path_ms(self, timings):
+        # Longest dependency chain of agent run times: the least a tick could take
+        # if scheduling cost nothing. Wall time above it is graph/caller overhead.
+        longest = []
+        for i, agent in enumerate(self.agents):
+            before = max((longest[d] for d in self.deps[i]), default=0.0)
+            longest.append(before + timings.get(agent.name, 0.0))
+        return max(longest, default=0.0)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
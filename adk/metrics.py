@@ -0,0 +1,198 @@
+# adk/metrics.py
+# In-process metrics and tracing for agents.
+#
+# REGISTRY holds counters, gauges and latency histograms keyed by name + labels
+# and renders them in the Prometheus text format. TRACER records
+# OpenTelemetry-style spans (trace/span/parent ids, attributes) for the most
+# recent ticks, and mirrors them into OpenTelemetry when the opentelemetry
+# package is installed and GREENGRID_OTEL=1.
+
+import contextlib
+import contextvars
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+# Samples kept per histogram for percentiles
+RESERVOIR_SIZE = 1024
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def percentile(self, q, samples=None):
+        # samples: a copy taken under the registry lock, when other threads may be observing
+        ordered = sorted(self.samples if samples is None else samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    # Reads take the lock too (or copy under it): agent workers, the HTTP loop, the
+    # ingestion worker and report threads write while status()/dashboards read
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self.counters.get(_key(name, labels), 0)
+
+    def percentile(self, name, q, **labels):
+        with self._lock:
+            histogram = self.histograms.get(_key(name, labels))
+            if histogram is None:
+                return None
+            samples = list(histogram.samples)
+        return histogram.percentile(q, samples)
+
+    def label_values(self, name, label):
+        # Distinct values of one label across a metric, e.g. every agent seen
+        with self._lock:
+            keys = list(itertools.chain(self.counters, self.gauges, self.histograms))
+        return sorted({dict(labels).get(label) for n, labels in keys if n == name} - {None})
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted({n for n, _ in metrics}):
+                    lines.append(f"# TYPE {name} {kind}")
+                    for (n, labels), value in sorted(metrics.items()):
+                        if n == name:
+                            lines.append(f"{name}{_format_labels(labels)} {value}")
+            for name in sorted({n for n, _ in self.histograms}):
+                lines.append(f"# TYPE {name} summary")
+                for (n, labels), histogram in sorted(self.histograms.items()):
+                    if n != name:
+                        continue
+                    for q in QUANTILES:
+                        value = histogram.percentile(q)
+                        lines.append(f"{name}{_format_labels(labels, [('quantile', q)])} {value}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "end", "attributes", "status", "trace")
+
+    def __init__(self, trace_id, span_id, parent_id, name, attributes):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.end = None
+        self.attributes = attributes
+        self.status = "ok"
+        self.trace = None  # list the finished spans of this trace are collected in
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": None if self.end is None else round((self.end - self.start) * 1000, 3),
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+class Tracer:
+    def __init__(self, max_traces=20):
+        self._current = contextvars.ContextVar("greengrid_span", default=None)
+        self._ids = itertools.count(1)
+        self._traces = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+        self._otel = None
+        if os.environ.get("GREENGRID_OTEL") == "1":
+            try:
+                from opentelemetry import trace
+                self._otel = trace.get_tracer("greengrid")
+            except ImportError:
+                pass
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        parent = self._current.get()
+        span = Span(
+            trace_id=parent.trace_id if parent else next(self._ids),
+            span_id=next(self._ids),
+            parent_id=parent.span_id if parent else None,
+            name=name,
+            attributes=attributes,
+        )
+        if parent is None:
+            span.trace = []
+            with self._lock:
+                self._traces.append(span.trace)
+        else:
+            span.trace = parent.trace
+        token = self._current.set(span)
+        otel = self._otel.start_as_current_span(name, attributes=attributes) if self._otel else contextlib.nullcontext()
+        try:
+            with otel:
+                yield span
+        except BaseException:
+            span.status = "error"
+            raise
+        finally:
+            span.end = time.time()
+            self._current.reset(token)
+            with self._lock:
+                span.trace.append(span)
+
+    def last_trace(self):
+        # Spans of the most recent finished root span (one tick), in finish order
+        with self._lock:
+            return [span.to_dict() for span in self._traces[-1]] if self._traces else []
+
+
+REGISTRY = MetricsRegistry()
+TRACER = Tracer()
@@ -1,34 +1,258 @@
 
 # agents/advisor_agent.py
 from adk import Agent
-import google.generativeai as genai
+import json
+import math
 import os
-from dotenv import load_dotenv
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dotenv import load_dotenv
+from utils.rate_limit import TokenBucket
+from utils.offline import is_offline
+from utils.ttl_cache import TTLCache
 
 
 load_dotenv()
-genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+
+# Gemini free tier allows 15 requests per minute
+REQUESTS_PER_MINUTE = 15
+REPORT_TTL_S = 3600
+# Batch mode: households whose cost falls in the same bucket share one report
+COST_BUCKET = 0.5
+# Distinct cases per multi-item prompt
+BATCH_ITEMS_PER_PROMPT = 50
+
+
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def get_genai():
+    # google.generativeai is imported and configured on first use only
+    global _genai
+    with _genai_lock:
+        if _genai is None:
+            import google.generativeai as genai
+            if os.environ.get("GOOGLE_API_KEY"):
+                genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+            _genai = genai
+        return _genai
+
+
+def template_report(decision, cost):
+    # Deterministic report used while the LLM report is pending or when it is unavailable
+    return (
+        f"Recommendation: {decision}.\n\n"
+        f"Based on the current forecast and electricity price, the system expects this hour "
+        f"to cost about ${cost:.2f}. Following the recommendation keeps your grid usage and "
+        f"costs as low as possible - no action is needed beyond that."
+    )
 
  
 class AdvisorAgent(Agent):
-    def __init__(self, name="AdvisorAgent"):
+    reads = ("decision", "expected_cost")
+    writes = ("report", "report_status")
+    timeout = 60
+
+    def __init__(self, name="AdvisorAgent", model=None, requests_per_minute=REQUESTS_PER_MINUTE,
+                 cache_size=256, cache_ttl=REPORT_TTL_S, wait_s=0.0):
         super().__init__(name)
-        self.model = genai.GenerativeModel("gemini-2.0-flash")
+        # model: anything with generate_content(prompt) -> response.text (a stub in tests).
+        # The Gemini model is only built when the first report is generated.
+        self.model = model
+        self._model_checked = model is not None
+        # Token bucket instead of a fixed sleep between calls
+        self.rate_limiter = TokenBucket(rate=requests_per_minute / 60, capacity=1)
+        self.reports = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        # How long run() waits for a fresh report before returning the template
+        self.wait_s = wait_s
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix=name)
+        self.batch_stats = {
+            "households": 0, "groups": 0, "cache_hits": 0, "llm_calls": 0, "llm_items": 0,
+            "fallbacks": 0, "prompt_tokens": 0, "output_tokens": 0, "seconds": 0.0,
+        }
 
-    def run(self, ctx):
-        decision = ctx.get("decision", "No decision available")
-        cost = round(ctx.get("expected_cost", 0.0), 2)
+    def get_model(self):
+        if not self._model_checked:
+            self._model_checked = True
+            from services.replay import RecordedModel, get_recorder
 
-        prompt = f"""
+            recorder = get_recorder()
+            if recorder is not None and recorder.replaying:
+                # Replayed reports never import or call Gemini
+                self.model = RecordedModel(recorder, "gemini-2.0-flash")
+            elif not is_offline():
+                try:
+                    self.model = get_genai().GenerativeModel("gemini-2.0-flash")
+                    if recorder is not None:
+                        self.model = RecordedModel(recorder, "gemini-2.0-flash", self.model)
+                except Exception as e:
+                    print(f"[{self.name}] Gemini unavailable, using template reports: {e}")
+        return self.model
+
+    @staticmethod
+    def cache_key(decision, cost):
+        return (decision, round(cost, 2))
+
+    def build_prompt(self, decision, cost):
+        return f"""
         Based on the decision "{decision}" and an estimated cost of ${cost}, write a clear, concise, and user-friendly report
         explaining what the user should do and why, assuming they’re not energy experts.
         """
-        time.sleep(5) 
-        response = self.model.generate_content(prompt)
-        # sleep 5 seconds between calls to avoid hitting the limit
 
-        report = response.text.strip()
-        print(f"[{self.name}] Gemini-generated report:\n{report}")
+    def _generate(self, decision, cost):
+        # (report, "ready"), or (template, "template") when the LLM couldn't be used
+        key = self.cache_key(decision, cost)
+        try:
+            model = self.get_model()
+            if model is None:
+                raise RuntimeError("no model configured")
+            self.rate_limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = model.generate_content(self.build_prompt(decision, cost))
+            except Exception:
+                self.record_call("gemini", time.perf_counter() - start, ok=False)
+                raise
+            self.record_call("gemini", time.perf_counter() - start)
+            report = response.text.strip()
+            print(f"[{self.name}] Gemini-generated report:\n{report}")
+        except Exception as e:
+            # Not cached, so the next tick tries the LLM again
+            print(f"[{self.name}] ⚠️ Report generation failed, using template: {e}")
+            return template_report(decision, cost), "template"
+        self.reports.set(key, report)
+        return report, "ready"
+
+    def submit(self, decision, cost):
+        # Future for (report, status); cached reports resolve immediately and
+        # concurrent requests for the same key share one generation
+        key = self.cache_key(decision, cost)
+        report = self.reports.get(key)
+        self.record_cache("reports", hit=report is not None)
+        if report is not None:
+            future = Future()
+            future.set_result((report, "ready"))
+            return future
+
+        with self._pending_lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._executor.submit(self._generate, decision, cost)
+                self._pending[key] = future
+                future.add_done_callback(lambda _: self._pending.pop(key, None))
+            return future
+
+    def get_report(self, decision, cost, timeout=None):
+        return self.submit(decision, round(cost, 2)).result(timeout)
+
+    def build_batch_prompt(self, items):
+        # items: [(item_id, decision, cost)] -> one prompt asking for a JSON array back
+        cases = "\n".join(
+            f'- id {item_id}: decision "{decision}", estimated cost ${cost}' for item_id, decision, cost in items
+        )
+        return f"""
+        For each case below, write a clear, concise, and user-friendly report explaining what the user
+        should do and why, assuming they’re not energy experts. Each case is a decision and an estimated cost.
+        {cases}
+
+        Respond with only a JSON array of objects with keys "id" (the case id) and "report".
+        """
+
+    def _generate_batch(self, items):
+        # One LLM call for several cases; returns {item_id: report} for the ones that came back
+        self.rate_limiter.acquire()
+        start = time.perf_counter()
+        try:
+            response = self.get_model().generate_content(
+                self.build_batch_prompt(items),
+                generation_config={"response_mime_type": "application/json"},
+            )
+        except Exception:
+            self.record_call("gemini", time.perf_counter() - start, ok=False)
+            raise
+        self.record_call("gemini", time.perf_counter() - start)
+        self.batch_stats["llm_calls"] += 1
+        self.batch_stats["llm_items"] += len(items)
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self.batch_stats["prompt_tokens"] += getattr(usage, "prompt_token_count", 0) or 0
+            self.batch_stats["output_tokens"] += getattr(usage, "candidates_token_count", 0) or 0
+        parsed = json.loads(response.text)
+        return {int(entry["id"]): str(entry["report"]).strip() for entry in parsed if "id" in entry and "report" in entry}
+
+    def run_batch(self, households):
+        # households: {household_id: {"decision": ..., "expected_cost": ...}} -> {household_id: report}
+        start = time.perf_counter()
+
+        # Group households whose decision and cost bucket match; each group gets one report
+        groups = {}
+        for household_id, ctx in households.items():
+            decision = ctx.get("decision", "No decision available")
+            bucket = math.floor(ctx.get("expected_cost", 0.0) / COST_BUCKET)
+            groups.setdefault((decision, bucket), []).append(household_id)
+
+        reports = {}
+        missing = []
+        for decision, bucket in groups:
+            # Groups are described by their bucket's midpoint cost
+            cost = round((bucket + 0.5) * COST_BUCKET, 2)
+            report = self.reports.get(self.cache_key(decision, cost))
+            if report is not None:
+                reports[(decision, bucket)] = report
+                self.batch_stats["cache_hits"] += 1
+            else:
+                missing.append((decision, bucket, cost))
+
+        # Remaining distinct cases go out as multi-item prompts
+        for chunk_start in range(0, len(missing), BATCH_ITEMS_PER_PROMPT):
+            chunk = missing[chunk_start:chunk_start + BATCH_ITEMS_PER_PROMPT]
+            items = [(i, decision, cost) for i, (decision, _, cost) in enumerate(chunk)]
+            try:
+                if self.get_model() is None:
+                    raise RuntimeError("no model configured")
+                generated = self._generate_batch(items)
+            except Exception as e:
+                print(f"[{self.name}] ⚠️ Batch report generation failed, using templates: {e}")
+                generated = {}
+            for i, (decision, bucket, cost) in enumerate(chunk):
+                report = generated.get(i)
+                if report:
+                    self.reports.set(self.cache_key(decision, cost), report)
+                else:
+                    report = template_report(decision, cost)
+                    self.batch_stats["fallbacks"] += 1
+                reports[(decision, bucket)] = report
+
+        self.batch_stats["households"] += len(households)
+        self.batch_stats["groups"] += len(groups)
+        self.batch_stats["seconds"] += time.perf_counter() - start
+        return {household_id: reports[key] for key, ids in groups.items() for household_id in ids}
+
+    def batch_metrics(self):
+        # Throughput and per-report cost of run_batch so far
+        stats = self.batch_stats
+        households = max(stats["households"], 1)
+        return {
+            **stats,
+            "reports_per_s": stats["households"] / stats["seconds"] if stats["seconds"] else 0.0,
+            "llm_calls_per_report": stats["llm_calls"] / households,
+            "tokens_per_report": (stats["prompt_tokens"] + stats["output_tokens"]) / households,
+        }
+
+    def run(self, ctx):
+        decision = ctx.get("decision", "No decision available")
+        cost = round(ctx.get("expected_cost", 0.0), 2)
+
+        future = self.submit(decision, cost)
+        try:
+            report, status = future.result(timeout=self.wait_s)
+        except Exception:
+            # Still generating in the background; the coordinator attaches it later
+            report = template_report(decision, cost)
+            status = "pending"
 
-        return {"report": report}
+        return {"report": report, "report_status": status}
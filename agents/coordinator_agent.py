@@ -1,4 +1,6 @@
-from adk import Agent
+import os
+
+from adk import Agent, AgentGraph, REGISTRY
 from agents.sensor_agent import SensorAgent
 from agents.forecast_agent import ForecastAgent
 from agents.pricing_agent import PricingAgent
@@ -6,19 +8,66 @@ from agents.optimizer_agent import OptimizerAgent
 from agents.advisor_agent import AdvisorAgent
 
 class CoordinatorAgent(Agent):
-    def __init__(self, name="CoordinatorAgent"):
+    def __init__(self, name="CoordinatorAgent", default_timeout=30, sensor_stream=None, state_store=None,
+                 optimizer_mode=None):
         super().__init__(name)
-        self.sensor = SensorAgent()
+        # A streaming meter source (GREENGRID_SENSOR_SOURCE) is read as a window snapshot each tick;
+        # imported lazily so the default single-reading path doesn't pay for asyncio
+        if sensor_stream is None and os.environ.get("GREENGRID_SENSOR_SOURCE"):
+            from services.sensor_stream import stream_from_env
+            sensor_stream = stream_from_env()
+        self.sensor = SensorAgent(stream=sensor_stream)
         self.forecast = ForecastAgent()
         self.pricing = PricingAgent()
-        self.optimizer = OptimizerAgent()
+        # state_store: the optimizer's battery state (services.battery_state), the shared store by default.
+        # optimizer_mode: "greedy" (default) or "schedule", also set by GREENGRID_OPTIMIZER_MODE
+        optimizer_mode = optimizer_mode or os.environ.get("GREENGRID_OPTIMIZER_MODE") or "greedy"
+        self.optimizer = OptimizerAgent(mode=optimizer_mode, state_store=state_store)
         self.advisor = AdvisorAgent()
 
+        # Sensor, forecast and pricing don't depend on each other, so they run
+        # concurrently; optimizer waits for forecast + pricing, advisor for optimizer.
+        self.graph = AgentGraph(
+            [self.sensor, self.forecast, self.pricing, self.optimizer, self.advisor],
+            default_timeout=default_timeout,
+            name=f"{name}.graph",
+        )
+
     def run(self, context):
-        ctx = {}
-        ctx.update(self.sensor.run(ctx))
-        ctx.update(self.forecast.run(ctx))
-        ctx.update(self.pricing.run(ctx))
-        ctx.update(self.optimizer.run(ctx))
-        ctx.update(self.advisor.run(ctx))
-        return ctx
\ No newline at end of file
+        ctx = self.graph.run(context)
+        print(f"[{self.name}] Tick latency (ms): {ctx['timings_ms']}")
+        return ctx
+
+    def status(self):
+        # This process's agent instrumentation (adk.REGISTRY) and the last tick's
+        # errors, as plain JSON for the results API and the dashboard
+        agents = [
+            {
+                "agent": agent,
+                "runs": REGISTRY.counter("agent_runs_total", agent=agent),
+                "p50_s": REGISTRY.percentile("agent_run_seconds", 0.5, agent=agent),
+                "p99_s": REGISTRY.percentile("agent_run_seconds", 0.99, agent=agent),
+                "errors": REGISTRY.counter("agent_errors_total", agent=agent),
+                "timeouts": REGISTRY.counter("agent_timeouts_total", agent=agent),
+            }
+            for agent in REGISTRY.label_values("agent_runs_total", "agent")
+        ]
+        graph = self.graph.logger.name
+        return {
+            "agents": agents,
+            "tick_p50_s": REGISTRY.percentile("tick_seconds", 0.5, graph=graph),
+            "tick_p99_s": REGISTRY.percentile("tick_seconds", 0.99, graph=graph),
+            "last_errors": dict(self.graph.last_errors),
+        }
+
+    def attach_report(self, result, timeout=None):
+        # Swap the placeholder report for the generated one once it's done; a
+        # generation that fell back leaves the template with status "template"
+        if result.get("report_status") == "pending":
+            try:
+                result["report"], result["report_status"] = self.advisor.get_report(
+                    result.get("decision", "No decision available"), result.get("expected_cost", 0.0), timeout
+                )
+            except Exception:
+                pass
+        return result
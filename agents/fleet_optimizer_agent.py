@@ -0,0 +1,98 @@
+# agents/fleet_optimizer_agent.py
+from adk import Agent
+from adk.context import PipelineContext
+import numpy as np
+from utils import battery
+from utils.battery import DECISIONS, ACTIONS, PENCE_PER_POUND
+
+
+def _site_array(value, n_sites):
+    # Broadcast a scalar or per-site sequence to an owned float64 array
+    return np.array(np.broadcast_to(np.asarray(value, dtype=np.float64), (n_sites,)))
+
+
+class FleetOptimizerAgent(Agent):
+    """Battery optimizer for N sites, with all site state held in NumPy arrays.
+
+    Same decision rule as OptimizerAgent (utils.battery.simulate), applied to
+    every site in one vectorized step instead of one Python object per household.
+    """
+
+    reads = ("forecast", "price_kWh")
+    writes = (
+        "decision", "battery_action", "battery_charge_kWh", "expected_cost",
+        "net_demand_kWh", "effective_consumption_kWh", "effective_solar_kWh",
+        "net_cost", "savings",
+    )
+
+    def __init__(
+        self,
+        n_sites,
+        name="FleetOptimizerAgent",
+        battery_capacity_kWh=battery.BATTERY_CAPACITY_KWH,
+        battery_current_charge=10,
+        battery_charge_efficiency=battery.CHARGE_EFFICIENCY,
+        battery_discharge_efficiency=battery.DISCHARGE_EFFICIENCY,
+        price_threshold=battery.PRICE_THRESHOLD,
+    ):
+        super().__init__(name)
+        self.n_sites = n_sites
+        self.battery_capacity_kWh = _site_array(battery_capacity_kWh, n_sites)
+        self.battery_current_charge = _site_array(battery_current_charge, n_sites)
+        self.battery_charge_efficiency = _site_array(battery_charge_efficiency, n_sites)
+        self.battery_discharge_efficiency = _site_array(battery_discharge_efficiency, n_sites)
+        self.price_threshold = _site_array(price_threshold, n_sites)
+
+    def step(self, consumption_kWh, solar_kWh, price_kWh):
+        # consumption/solar/price (£/kWh) may be scalars or arrays of length n_sites
+        result = battery.simulate(
+            consumption_kWh,
+            solar_kWh,
+            price_kWh,
+            self.battery_current_charge,
+            battery_capacity_kWh=self.battery_capacity_kWh,
+            charge_efficiency=self.battery_charge_efficiency,
+            discharge_efficiency=self.battery_discharge_efficiency,
+            price_threshold=self.price_threshold,
+        )
+        self.battery_current_charge[:] = result["battery_charge_kWh"]
+        result["expected_cost"] = np.round(result["expected_cost"], 2)
+        return result
+
+    def site_result(self, result, i):
+        # Per-site dict in the same shape OptimizerAgent.run returns
+        return {
+            "decision": str(DECISIONS[result["decision"][i]]),
+            "battery_action": str(ACTIONS[result["battery_action"][i]]),
+            "battery_charge_kWh": float(result["battery_charge_kWh"][i]),
+            "expected_cost": float(result["expected_cost"][i]),
+            "net_demand_kWh": float(result["net_demand_kWh"][i]),
+            "effective_consumption_kWh": float(result["effective_consumption_kWh"][i]),
+            "effective_solar_kWh": float(result["effective_solar_kWh"][i]),
+            "net_cost": round(float(result["net_cost"][i]), 2),
+            "savings": round(float(result["savings"][i]), 2),
+        }
+
+    def context(self, result, consumption_kWh, solar_kWh, price_kWh):
+        # Fleet-wide struct-of-arrays context (price in p/kWh, as in the agents' dicts);
+        # context(...)[i] reads like today's per-site context dict
+        return PipelineContext(self.n_sites, {
+            **result,
+            "predicted_consumption_kWh": consumption_kWh,
+            "predicted_solar_kWh": solar_kWh,
+            "price_kWh": price_kWh,
+        })
+
+    def run(self, context):
+        forecast = context.get("forecast", {})
+        result = self.step(
+            forecast.get("predicted_consumption_kWh", 0),
+            forecast.get("predicted_solar_kWh", 0),
+            np.asarray(context.get("price_kWh", 0), dtype=np.float64) / PENCE_PER_POUND,  # p/kWh -> £/kWh
+        )
+        discharging = int(result["battery_action"].sum())
+        print(
+            f"[{self.name}] {self.n_sites} sites: {discharging} discharging, "
+            f"{self.n_sites - discharging} charging, total expected cost: {result['expected_cost'].sum():.2f}"
+        )
+        return result
@@ -1,103 +1,273 @@
 from adk import Agent
-import pandas as pd
-import openmeteo_requests
-import requests_cache
-from retry_requests import retry
-import datetime
+import time
 import random
+import numpy as np
+from utils.forecast_model import SiteState, get_forecast_model
 from utils.logger import get_logger
+from utils.offline import is_offline
+
+# pandas, the Open-Meteo SDK and the HTTP layer are imported on first use, so
+# importing the agent (and offline runs) don't pay for them
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+# Only the hourly variables the predictions use are requested and decoded
+FORECAST_VARIABLES = ("temperature_2m", "shortwave_radiation")
+# Sites are snapped to this grid (degrees) so neighbouring households share one fetch
+GRID_DEGREES = 0.05
+# Coordinates per multi-location Open-Meteo request
+BATCH_SIZE = 100
+# Hourly history (days) the learned forecaster's site state is caught up from
+STATE_HISTORY_DAYS = 8
+# When the newest hour in that state is older than this (the readings cache hasn't
+# been synced), its lag features are out of date and the heuristic is used instead
+STATE_MAX_AGE_S = 6 * 3600
+
+
+def parse_weather_responses(data):
+    # Open-Meteo flatbuffers body: one little-endian length-prefixed message per location
+    from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+    responses = []
+    pos = 0
+    while pos < len(data):
+        length = int.from_bytes(data[pos:pos + 4], byteorder="little")
+        responses.append(WeatherApiResponse.GetRootAs(data, pos + 4))
+        pos += length + 4
+    return responses
+
+
+class OpenMeteoClient:
+    # Open-Meteo requests over the shared pooled HTTP client (services.http_client)
+    def weather_api(self, url, params):
+        from services.http_client import fetch_bytes
+        return parse_weather_responses(fetch_bytes(url, dict(params, format="flatbuffers")))
+
+    def weather_api_many(self, url, params_list):
+        # Several requests fanned out concurrently; each item is a response list or an exception
+        from services.http_client import fetch_many
+        bodies = fetch_many([(url, dict(params, format="flatbuffers")) for params in params_list])
+        return [body if isinstance(body, Exception) else parse_weather_responses(body) for body in bodies]
+
+
+def decode_hourly(hourly, variables=FORECAST_VARIABLES):
+    # Column arrays straight from the flatbuffer: unix-second times plus one
+    # ValuesAsNumpy() buffer per variable, in the order they were requested
+    columns = {"time": np.arange(hourly.Time(), hourly.TimeEnd(), hourly.Interval(), dtype=np.int64)}
+    for i, name in enumerate(variables):
+        columns[name] = hourly.Variables(i).ValuesAsNumpy()
+    return columns
+
+
+def predict_energy(temperature, radiation):
+    # Vectorized heuristic for every hour at once:
+    # consumption rises 0.2 kWh per degree below 25°C, solar is 0.004 kWh per W/m²
+    temperature = np.asarray(temperature, dtype=np.float64)
+    radiation = np.maximum(0, np.asarray(radiation, dtype=np.float64))  # Ensure no negative radiation
+    consumption = np.round(np.where(temperature < 25, 10 + (25 - temperature) * 0.2, 10.0), 2)
+    solar = np.round(radiation * 0.004, 2)
+    return consumption, solar
+
 
 class ForecastAgent(Agent):
+    writes = ("forecast", "forecast_series")
+    timeout = 20
+
     def __init__(self, name="ForecastAgent", latitude=51.5085, longitude=-0.1257):
         super().__init__(name)
         self.latitude = latitude
         self.longitude = longitude
         self.logger = get_logger(name) # Initialize logger
 
+        # Whole-horizon forecast from the last fetch, reused until the hour changes
+        self.series = None
+        self.series_hour = None
 
-        # Setup Open-Meteo client with cache and retry
-        cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
-        self.client = openmeteo_requests.Client(session=retry(cache_session, retries=3, backoff_factor=0.2))
+        # Open-Meteo client on the shared connection pool (retries, timeouts, coalescing)
+        self.client = OpenMeteoClient()
+
+        # Lag features for the learned forecaster, updated hour by hour from the readings history
+        self.site_state = SiteState(1)
+        self.model_name = "heuristic"
+
+    def get_forecast_series(self):
+        # Full hourly horizon (7 days) as numpy columns, with predictions for every hour
+        if is_offline():
+            return None
 
-    def get_weather_forecast(self):
-        url = "https://api.open-meteo.com/v1/forecast"
         params = {
             "latitude": self.latitude,
             "longitude": self.longitude,
-            "hourly": [
-                "temperature_2m", "wind_speed_10m", "relative_humidity_2m",
-                "apparent_temperature", "cloud_cover", "wind_direction_10m",
-                "shortwave_radiation", "direct_radiation", "diffuse_radiation"
-            ],
+            "hourly": list(FORECAST_VARIABLES),
+            "past_days": 1,  # last day's radiation, for the forecaster's panel-size estimate
             "timezone": "Europe/London"
         }
 
+        start = time.perf_counter()
         try:
-            responses = self.client.weather_api(url, params=params)
-            hourly = responses[0].Hourly()
-
-            df = pd.DataFrame({
-                "time": pd.date_range(
-                    start=pd.to_datetime(hourly.Time(), unit="s", utc=True),
-                    end=pd.to_datetime(hourly.TimeEnd(), unit="s", utc=True),
-                    freq=pd.Timedelta(seconds=hourly.Interval()),
-                    inclusive="left"
-                ),
-                "temperature_2m": hourly.Variables(0).ValuesAsNumpy(),
-                "shortwave_radiation": hourly.Variables(6).ValuesAsNumpy()
-            })
-
-           
-            # Convert to local London time
-            df["time"] = df["time"].dt.tz_convert("Europe/London")
-
-            # Keep only data for the next hour
-            now = datetime.datetime.now(datetime.timezone.utc).astimezone()
-            df = df[(df["time"] >= now) & (df["time"] < now + datetime.timedelta(hours=1))]
-            df = df.reset_index(drop=True)
-
-            return df
+            responses = self.client.weather_api(FORECAST_URL, params=params)
+            series = decode_hourly(responses[0].Hourly())
         except Exception as e:
+            self.record_call("open-meteo", time.perf_counter() - start, ok=False)
             print(f"[{self.name}] Error fetching forecast: {e}")
             return None
+        self.record_call("open-meteo", time.perf_counter() - start)
 
-    def run(self, context):
-        df = self.get_weather_forecast()
+        series["predicted_consumption_kWh"], series["predicted_solar_kWh"] = self.predict(series)
+        return series
+
+    def update_site_state(self, series):
+        # Feed complete hours newer than the last one seen into the forecaster's state.
+        # Reads the local cache as it is; the daemon syncs it between ticks, main.py and
+        # the dashboard before theirs.
+        from services.energy_data import get_energy_series, hourly_kWh
+        history = get_energy_series(
+            days=STATE_HISTORY_DAYS, bucket="1h", fields=("consumption_kWh", "solar_generation_kWh"), sync=False
+        )
+        if history is None:
+            return
+        current_hour = int(time.time() // 3600) * 3600
+        hours = history["bucket_start"].astype(np.int64)
+        consumption, solar = hourly_kWh(history, "consumption_kWh"), hourly_kWh(history, "solar_generation_kWh")
+        for i in np.flatnonzero((hours < current_hour) & (hours > (self.site_state.last_time or 0))):
+            j = np.searchsorted(series["time"], hours[i])
+            radiation = series["shortwave_radiation"][j] if j < len(series["time"]) and series["time"][j] == hours[i] else None
+            self.site_state.update(hours[i], consumption[i], solar[i], radiation)
+
+    def predict(self, series):
+        # Learned model once it's trained and has a day of this site's history; heuristic otherwise
+        model = get_forecast_model()
+        if model is not None:
+            try:
+                self.update_site_state(series)
+            except Exception as e:
+                self.logger.warning(f"Could not update forecaster history: {e}")
+            last_time = self.site_state.last_time
+            if self.site_state.warm[0] and last_time is not None and time.time() - last_time <= STATE_MAX_AGE_S:
+                self.model_name = "ridge"
+                consumption, solar = model.predict(
+                    self.site_state, series["time"], series["temperature_2m"][None], series["shortwave_radiation"][None]
+                )
+                return np.round(consumption[0], 2), np.round(solar[0], 2)
+        self.model_name = "heuristic"
+        return predict_energy(series["temperature_2m"], series["shortwave_radiation"])
+
+    def current_series(self, now=None):
+        # Later ticks in the same hour are answered from the in-memory series
+        now = time.time() if now is None else now
+        hour = int(now // 3600)
+        hit = self.series is not None and self.series_hour == hour
+        self.record_cache("forecast_series", hit)
+        if not hit:
+            series = self.get_forecast_series()
+            if series is not None:
+                self.series, self.series_hour = series, hour
+            elif self.series_hour != hour:
+                self.series = None
+        return self.series
+
+    def get_weather_forecast(self):
+        # Next-hour rows as a DataFrame (kept for callers that want the old shape)
+        import pandas as pd
+        series = self.current_series()
+        if series is None:
+            return None
+        start = np.searchsorted(series["time"], time.time())
+        df = pd.DataFrame({name: values[start:start + 1] for name, values in series.items()})
+        df["time"] = pd.to_datetime(df["time"], unit="s", utc=True).dt.tz_convert("Europe/London")
+        return df
+
+    def get_weather_forecast_batch(self, sites, grid=GRID_DEGREES, chunk_size=BATCH_SIZE, variables=FORECAST_VARIABLES):
+        # sites: {site_id: (latitude, longitude)}
+        # Returns (frame, site_locations): one columnar frame indexed by (location, time)
+        # for every distinct grid cell, and a Series mapping site_id -> location.
+        import pandas as pd
+        site_ids = list(sites)
+        coords = np.array([sites[site_id] for site_id in site_ids], dtype=np.float64).reshape(-1, 2)
+        snapped = np.round(coords / grid) * grid
+        cells, location_of_site = np.unique(snapped, axis=0, return_inverse=True)
+        site_locations = pd.Series(location_of_site.ravel(), index=site_ids, name="location")
 
-        if df is not None and not df.empty:
-            next_hour = df.iloc[0]
-            temperature = next_hour["temperature_2m"]
-            radiation = max(0, next_hour["shortwave_radiation"])  # Ensure no negative radiation
+        columns = {"location": [], "time": []}
+        columns.update({name: [] for name in variables})
+        starts = range(0, len(cells), chunk_size)
+        params_list = [
+            {
+                "latitude": ",".join(f"{lat:.4f}" for lat in cells[start:start + chunk_size, 0]),
+                "longitude": ",".join(f"{lon:.4f}" for lon in cells[start:start + chunk_size, 1]),
+                "hourly": list(variables),
+                "timezone": "Europe/London",
+            }
+            for start in starts
+        ]
+        # All chunks are requested concurrently over the shared pool
+        for start, responses in zip(starts, self.client.weather_api_many(FORECAST_URL, params_list)):
+            if isinstance(responses, Exception):
+                # Those locations get no rows; site_forecast() returns None for their sites
+                self.logger.warning(f"Error fetching forecast batch at location {start}: {responses}")
+                continue
 
-            # Round and convert to float here, then store
-            if temperature < 25:
-                predicted_consumption_kWh = round(10 + (25 - temperature) * 0.2, 2)
-            else:
-                predicted_consumption_kWh = 10.0  # already float
+            # Responses come back in the same order as the requested coordinates
+            for offset, response in enumerate(responses):
+                decoded = decode_hourly(response.Hourly(), variables)
+                columns["location"].append(np.full(len(decoded["time"]), start + offset, dtype=np.int32))
+                for name, values in decoded.items():
+                    columns[name].append(values)
 
-            predicted_consumption_kWh = float(predicted_consumption_kWh)
+        if not columns["time"]:
+            return None, site_locations
 
-            predicted_solar_kWh = float(round(radiation * 0.004, 2))  # Round here
+        data = {name: np.concatenate(parts) for name, parts in columns.items()}
+        data["time"] = pd.to_datetime(data["time"], unit="s", utc=True).tz_convert("Europe/London")
+        frame = pd.DataFrame(data).set_index(["location", "time"])
+        self.logger.info(f"Fetched {len(cells)} grid locations for {len(site_ids)} sites in "
+                         f"{-(-len(cells) // chunk_size)} requests")
+        return frame, site_locations
 
+    def site_forecast(self, frame, site_locations, site_id):
+        # One site's hourly forecast out of a batch frame; None when its location's request failed
+        if frame is None:
+            return None
+        try:
+            return frame.loc[site_locations[site_id]]
+        except KeyError:
+            return None
+
+    def run(self, context):
+        now = time.time()
+        series = self.current_series(now)
+        # First forecast hour starting at or after now (the "next hour")
+        start = int(np.searchsorted(series["time"], now)) if series is not None else 0
+
+        if series is not None and start < len(series["time"]):
+            radiation = max(0, float(series["shortwave_radiation"][start]))
+            predicted_consumption_kWh = float(series["predicted_consumption_kWh"][start])
+            predicted_solar_kWh = float(series["predicted_solar_kWh"][start])
+            forecast_series = {
+                "start": int(series["time"][start]),
+                "interval_s": 3600,
+                "predicted_consumption_kWh": series["predicted_consumption_kWh"][start:].tolist(),
+                "predicted_solar_kWh": series["predicted_solar_kWh"][start:].tolist(),
+            }
         else:
             # fallback with rounded floats
             predicted_consumption_kWh = float(round(random.uniform(10, 15), 2))
             predicted_solar_kWh = float(round(random.uniform(3, 6), 2))
             radiation = "N/A"
+            forecast_series = None
 
         prediction = {
             "predicted_consumption_kWh": predicted_consumption_kWh,
             "predicted_solar_kWh": predicted_solar_kWh,
         }
 
-       # After calculating rounded predicted values:
-
-# Use rounded predicted values directly in logs:
+        radiation_str = f"{radiation:.2f}" if radiation != "N/A" else radiation
         self.logger.info(
-            f"Radiation: {radiation:.2f} W/m² → Solar Forecast: {predicted_solar_kWh:.2f} kWh"
+            f"Radiation: {radiation_str} W/m² → Solar Forecast: {predicted_solar_kWh:.2f} kWh"
         )
-        self.logger.info(f"Weather forecast data:\n{df.head() if df is not None else 'No data available'}")
-        self.logger.info(f"Predicted consumption: {predicted_consumption_kWh:.2f} kWh")
+        if forecast_series is not None:
+            self.logger.info(f"Forecast horizon: {len(forecast_series['predicted_solar_kWh'])} hours")
+        else:
+            self.logger.info("Weather forecast data: No data available")
+        self.logger.info(f"Predicted consumption: {predicted_consumption_kWh:.2f} kWh ({self.model_name})")
 
         # Format floats in the dictionary explicitly for logging:
         forecast_log_str = (
@@ -106,8 +276,5 @@ class ForecastAgent(Agent):
         )
         self.logger.info(f"Forecast: {forecast_log_str}")
         self.logger.info(f"[{self.name}] Forecast completed successfully.")
-        # Return the prediction as a dictionary
-        
 
-        return {"forecast": prediction}
-    
+        return {"forecast": prediction, "forecast_series": forecast_series}
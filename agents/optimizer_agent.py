@@ -1,67 +1,209 @@
 from adk import Agent
+import os
+import time
+import numpy as np
+from services.battery_state import get_battery_state_store
+from utils import battery
+from utils.battery import DECISIONS, ACTIONS, PENCE_PER_POUND
+from utils.battery_scheduler import BatteryScheduler
+
+SLOT_MINUTES = 30  # Octopus Agile half-hour slots
+# The site this process optimizes; the daemon publishes results under it and the dashboard reads them
+SITE_ID = int(os.environ.get("GREENGRID_SITE_ID", 0))
+MODES = ("greedy", "schedule")
+
 
 class OptimizerAgent(Agent):
-    def __init__(self, name="OptimizerAgent"):
+    reads = ("forecast", "price_kWh", "price_curve_kWh", "forecast_series")
+    writes = (
+        "decision", "battery_action", "battery_charge_kWh", "expected_cost",
+        "net_demand_kWh", "effective_consumption_kWh", "effective_solar_kWh",
+        "net_cost", "savings", "schedule",
+    )
+
+    def __init__(self, name="OptimizerAgent", mode="greedy", horizon_slots=48, site_id=SITE_ID, state_store=None):
         super().__init__(name)
-        # Initialize battery state (could be dynamic)
-        self.battery_capacity_kWh = 20
-        self.battery_current_charge = 10
-        self.battery_charge_efficiency = 0.9
-        self.battery_discharge_efficiency = 0.9
+        # "greedy": one-hour decision against price_threshold
+        # "schedule": receding-horizon plan over the next horizon_slots half-hours
+        if mode not in MODES:
+            raise ValueError(f"Unknown optimizer mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.horizon_slots = horizon_slots
+        # Battery state of charge lives in the shared state store, so it survives
+        # restarts and every instance (daemon, dashboard) sees the same value
+        self.site_id = site_id
+        self.state_store = state_store or get_battery_state_store()
+        self.battery_capacity_kWh = battery.BATTERY_CAPACITY_KWH
+        self.battery_charge_efficiency = battery.CHARGE_EFFICIENCY
+        self.battery_discharge_efficiency = battery.DISCHARGE_EFFICIENCY
+        # Battery decision threshold in £/kWh (example, can be dynamic)
+        self.price_threshold = battery.PRICE_THRESHOLD
+        self.scheduler = None
+        self.horizon_end = None  # absolute slot the schedule plans up to
+
+    @property
+    def battery_current_charge(self):
+        # A site the store has never seen starts half full
+        return self.state_store.soc(self.site_id, default=self.battery_capacity_kWh / 2)
+
+    @battery_current_charge.setter
+    def battery_current_charge(self, charge_kWh):
+        self.state_store.set(self.site_id, charge_kWh, self.battery_capacity_kWh)
+
+    def _step_charge(self, step):
+        # step(charge_kWh) -> (new_charge_kWh, outcome), applied as one atomic update of the
+        # site's record so two processes optimizing the same site can't both spend the same charge
+        outcome = []
+
+        def change(record):
+            new_charge, result = step(self.battery_capacity_kWh / 2 if record is None else record["soc_kWh"])
+            outcome.append(result)
+            return new_charge, self.battery_capacity_kWh
+
+        charge = self.state_store.update(self.site_id, change)
+        return charge, outcome[0]
 
     def run(self, context):
+        if self.mode == "schedule":
+            return self.run_schedule(context)
+
         forecast = context.get("forecast", {})
-        price = context.get("price_kWh", 0)
+        # PricingAgent reports p/kWh; the battery simulation works in £/kWh
+        grid_price = context.get("price_kWh", 0) / PENCE_PER_POUND
+
+        user_consumption = forecast.get("predicted_consumption_kWh", 0)
+        simulated_solar_kWh = forecast.get("predicted_solar_kWh", 0)
+
+        def step(charge):
+            result = battery.simulate(
+                user_consumption,
+                simulated_solar_kWh,
+                grid_price,
+                charge,
+                battery_capacity_kWh=self.battery_capacity_kWh,
+                charge_efficiency=self.battery_charge_efficiency,
+                discharge_efficiency=self.battery_discharge_efficiency,
+                price_threshold=self.price_threshold,
+            )
+            return float(result["battery_charge_kWh"]), result
+
+        # Update battery state
+        charge, result = self._step_charge(step)
+
+        decision = str(DECISIONS[result["decision"]])
+        battery_action = str(ACTIONS[result["battery_action"]])
+        expected_cost = round(float(result["expected_cost"]), 2)
+
+        print(f"[{self.name}] Decision: {decision}, Battery action: {battery_action}, Expected cost: {expected_cost}")
+        print(f"[{self.name}] Battery charge level: {charge:.2f} kWh")
+
+        return {
+            "decision": decision,
+            "battery_action": battery_action,
+            "battery_charge_kWh": charge,
+            "expected_cost": expected_cost,
+            "net_demand_kWh": float(result["net_demand_kWh"]),
+            "effective_consumption_kWh": float(result["effective_consumption_kWh"]),
+            "effective_solar_kWh": float(result["effective_solar_kWh"]),
+            "net_cost": round(float(result["net_cost"]), 2),
+            "savings": round(float(result["savings"]), 2),
+        }
 
-        predicted_consumption = forecast.get("predicted_consumption_kWh", 0)
-        predicted_solar = forecast.get("predicted_solar_kWh", 0)
-        user_consumption = predicted_consumption
-        simulated_solar_kWh = predicted_solar
-        grid_price = price
+    def _horizon_length(self, start_slot):
+        # The horizon ends on a fixed slot rather than sliding with the clock, so
+        # consecutive ticks plan towards the same end and the scheduler reuses the
+        # cost-to-go of every slot whose inputs didn't change. It is pushed back out
+        # to horizon_slots once less than half of it is left.
+        remaining = self.horizon_end - start_slot if self.horizon_end is not None else 0
+        if not max(1, self.horizon_slots // 2) <= remaining <= self.horizon_slots:
+            self.horizon_end = start_slot + self.horizon_slots
+        return self.horizon_end - start_slot
 
-        # Battery decision threshold (example, can be dynamic)
-        price_threshold = 0.15  # currency units per kWh
+    def _horizon_inputs(self, context, start_slot, n):
+        # Per-slot prices (£/kWh), consumption and solar for slots start_slot..start_slot+n.
+        # Falls back to repeating the current price / one-hour forecast when no
+        # price curve or forecast series is in the context.
+        slots_per_hour = 60 // SLOT_MINUTES
 
-        # Decide battery action based on price and solar/consumption forecast
-        if grid_price > price_threshold and self.battery_current_charge > 0:
-            battery_action = "discharge"
-            battery_change = min(self.battery_current_charge, user_consumption) * self.battery_discharge_efficiency
+        prices = context.get("price_curve_kWh")
+        if prices is None or len(prices) == 0:
+            prices = [context.get("price_kWh", 0)]
+        prices = np.asarray(prices, dtype=np.float64)[:n] / PENCE_PER_POUND
+
+        series = context.get("forecast_series")
+        if series:
+            # Hourly kWh -> per-slot kWh, by the hour each slot falls in, so a slot gets the
+            # same inputs on every tick; slots before the series starts use its first hour
+            slot_times = np.arange(start_slot, start_slot + n) * SLOT_MINUTES * 60
+            hours = np.maximum((slot_times - series["start"]) // series.get("interval_s", 3600), 0)
+            hours = hours[hours < len(series["predicted_consumption_kWh"])]
+            consumption = np.asarray(series["predicted_consumption_kWh"], dtype=np.float64)[hours] / slots_per_hour
+            solar = np.asarray(series["predicted_solar_kWh"], dtype=np.float64)[hours] / slots_per_hour
         else:
-            battery_action = "charge"
-            battery_change = min(self.battery_capacity_kWh - self.battery_current_charge, simulated_solar_kWh) * self.battery_charge_efficiency
+            forecast = context.get("forecast", {})
+            consumption = np.array([forecast.get("predicted_consumption_kWh", 0) / slots_per_hour])
+            solar = np.array([forecast.get("predicted_solar_kWh", 0) / slots_per_hour])
 
-        # Update battery state
-        if battery_action == "charge":
-            self.battery_current_charge += battery_change
-            effective_solar = simulated_solar_kWh - battery_change
-            effective_consumption = user_consumption
-        else:  # discharge
-            self.battery_current_charge -= battery_change
-            effective_consumption = user_consumption - battery_change
-            effective_solar = simulated_solar_kWh
+        # Pad the shorter inputs with their last value so everything covers n slots
+        def fit(values):
+            if len(values) >= n:
+                return values[:n]
+            return np.concatenate([values, np.full(n - len(values), values[-1] if len(values) else 0.0)])
 
-        # Calculate net demand after battery impact
-        net_demand = max(0, effective_consumption - effective_solar)
+        return fit(prices), fit(consumption), fit(solar)
+
+    def run_schedule(self, context):
+        if self.scheduler is None:
+            self.scheduler = BatteryScheduler(
+                battery_capacity_kWh=self.battery_capacity_kWh,
+                charge_efficiency=self.battery_charge_efficiency,
+                discharge_efficiency=self.battery_discharge_efficiency,
+                slot_hours=SLOT_MINUTES / 60,
+                feed_in_price=battery.FEED_IN_PRICE,
+            )
+
+        start_slot = int(time.time() // (SLOT_MINUTES * 60))
+        prices, consumption, solar = self._horizon_inputs(context, start_slot, self._horizon_length(start_slot))
+
+        def step(charge):
+            plan = self.scheduler.plan(prices, consumption, solar, charge, start_slot=start_slot)
+            return float(plan["soc_kWh"][1]), plan
 
-        # Make a high-level decision string
-        if simulated_solar_kWh > user_consumption:
-            decision = "store surplus" if battery_action == "charge" else "use battery"
-        elif simulated_solar_kWh > 0:
-            decision = "use solar, buy rest"
+        # Apply the first slot of the plan; the rest is replanned next tick
+        charge, plan = self._step_charge(step)
+        battery_change = float(plan["battery_change_kWh"][0])
+        discharge = battery_change < 0
+        battery_action = str(ACTIONS[int(discharge)])
+
+        user_consumption = float(consumption[0])
+        simulated_solar_kWh = float(solar[0])
+        if discharge:
+            effective_consumption = user_consumption + battery_change * self.battery_discharge_efficiency
+            effective_solar = simulated_solar_kWh
         else:
-            decision = "buy energy"
+            effective_solar = simulated_solar_kWh - battery_change / self.battery_charge_efficiency
+            effective_consumption = user_consumption
+        net_demand = max(0, effective_consumption - effective_solar)
 
-        expected_cost = round(net_demand * grid_price, 2)
+        decision = str(DECISIONS[battery.decide(simulated_solar_kWh, user_consumption, discharge)])
+        expected_cost = round(net_demand * float(prices[0]), 2)
 
+        print(f"[{self.name}] Planned {len(prices)} slots, horizon cost: {plan['total_cost']:.2f}")
         print(f"[{self.name}] Decision: {decision}, Battery action: {battery_action}, Expected cost: {expected_cost}")
-        print(f"[{self.name}] Battery charge level: {self.battery_current_charge:.2f} kWh")
 
         return {
             "decision": decision,
             "battery_action": battery_action,
-            "battery_charge_kWh": self.battery_current_charge,
+            "battery_charge_kWh": charge,
             "expected_cost": expected_cost,
             "net_demand_kWh": net_demand,
             "effective_consumption_kWh": effective_consumption,
-            "effective_solar_kWh": effective_solar
+            "effective_solar_kWh": effective_solar,
+            "net_cost": round(float(plan["cost"][0]), 2),
+            "schedule": {
+                "slot_minutes": SLOT_MINUTES,
+                "soc_kWh": [round(float(x), 2) for x in plan["soc_kWh"]],
+                "battery_change_kWh": [round(float(x), 2) for x in plan["battery_change_kWh"]],
+                "total_cost": round(plan["total_cost"], 2),
+            },
         }
@@ -1,37 +1,41 @@
 
 # agents/pricing_agent.py
 from adk import Agent
-import pandas as pd
-import requests
+from datetime import datetime, timezone
+from services.tariff import get_tariff_store, PRODUCT_CODE, REGION
+
+# Fallback when no tariff data is available, p/kWh
+FALLBACK_PRICE = 18.0
 
 class PricingAgent(Agent):
-    def __init__(self, name="PricingAgent"):
+    writes = ("price_kWh", "price_curve_kWh")
+    timeout = 20
+
+    def __init__(self, name="PricingAgent", product=PRODUCT_CODE, region=REGION, horizon_slots=48, store=None):
         super().__init__(name)
+        self.product = product
+        self.region = region
+        self.horizon_slots = horizon_slots
+        self.store = store or get_tariff_store()
 
     def get_current_price(self):
-        url = r"https://api.octopus.energy/v1/products/AGILE-18-02-21/electricity-tariffs/E-1R-AGILE-18-02-21-L/standard-unit-rates/"
-        response = requests.get(url)
-        data = response.json()
-        if "results" in data and data["results"]:
-            price = data["results"][0]["value_inc_vat"]  # pence per kWh
-            return price
-        return None
+        # Price of the slot we're in now (pence per kWh)
+        return self.store.price_at(product=self.product, region=self.region)
 
     def run(self, context):
-        # Get current UTC time rounded to the hour
-        now_utc = pd.Timestamp.now(tz="UTC").floor("h")
+        now = datetime.now(timezone.utc)
 
-        # Fetch the current price
+        # Fetch the current price and the published curve from now on
+        fetches = self.store.stats["fetches"]
         price_kWh = self.get_current_price()
+        curve = self.store.price_curve(now.timestamp(), self.horizon_slots, self.product, self.region)
+        self.record_cache("tariff", hit=self.store.stats["fetches"] == fetches)
 
         if price_kWh is None:
             print(f"[{self.name}] ⚠️ No current price available. Using fallback price.")
-            price_kWh = 0.18
+            price_kWh = FALLBACK_PRICE
 
-        print(f"[{self.name}] Current price: {price_kWh} p/kWh at {now_utc}")
+        print(f"[{self.name}] Current price: {price_kWh} p/kWh at {now.replace(minute=now.minute // 30 * 30, second=0, microsecond=0)}")
 
         # Return the price in the context dictionary
-        return {"price_kWh": price_kWh}
-
-
-
+        return {"price_kWh": price_kWh, "price_curve_kWh": curve.tolist() or None}
@@ -1,26 +1,72 @@
 from adk import Agent
-from services.energy_data import insert_energy_record
-from datetime import datetime
+from services.energy_data import make_energy_record
+from services.ingestion import get_ingestion_writer
+from datetime import datetime, timezone
 
 class SensorAgent(Agent):
-    def __init__(self, name="SensorAgent"):
+    writes = ("sensor_data",)
+
+    def __init__(self, name="SensorAgent", writer=None, stream=None):
         super().__init__(name)
+        self.writer = writer
+        # services.sensor_stream.SensorStream; None keeps the single demo reading per tick
+        self.stream = stream
 
     def run(self, context):
+        writer = self.writer or get_ingestion_writer()
+        if self.stream is not None:
+            return {"sensor_data": self.read_stream(writer)}
+
         data = {
             "consumption_kWh": 12.5,
             "solar_generation_kWh": 4.2,
-            "timestamp": datetime.utcnow().isoformat() + "Z"
+            "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
         }
         print(f"[{self.name}] Collected sensor data: {data}")
 
-        # Insert data into BigQuery using energy_data service
-        insert_energy_record(
+        # Queue the reading for the background BigQuery writer (batched load jobs)
+        writer.put(make_energy_record(
             timestamp=data["timestamp"],
             consumption_kWh=data["consumption_kWh"],
             solar_generation_kWh=data["solar_generation_kWh"]
-        )
+        ))
 
         return {"sensor_data": data}
+
+    def read_stream(self, writer):
+        # Non-blocking: take the stream's current window instead of waiting for the meter
+        snapshot = self.stream.snapshot()
+        if snapshot is None:
+            print(f"[{self.name}] No readings from the meter stream yet")
+            return {
+                "consumption_kWh": 0.0,
+                "solar_generation_kWh": 0.0,
+                "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+                "window_readings": 0,
+            }
+
+        # One row per completed interval goes to storage, not one per reading
+        for interval in self.stream.pop_intervals():
+            writer.put(make_energy_record(
+                timestamp=interval["start"],
+                consumption_kWh=interval["consumption_kWh"],
+                solar_generation_kWh=interval["solar_generation_kWh"]
+            ))
+
+        last = snapshot["last_interval"] or {
+            "consumption_kWh": snapshot["interval_consumption_kWh"],
+            "solar_generation_kWh": snapshot["interval_solar_generation_kWh"],
+        }
+        data = {
+            "consumption_kWh": last["consumption_kWh"],
+            "solar_generation_kWh": last["solar_generation_kWh"],
+            "timestamp": snapshot["timestamp"],
+            "consumption_kW": snapshot["consumption_kW"],
+            "solar_kW": snapshot["solar_kW"],
+            "window_readings": snapshot["window_readings"],
+            "rate_hz": snapshot["rate_hz"],
+        }
+        print(f"[{self.name}] Collected sensor data: {data}")
+        return data
 # Register the agent
-#Agent.register(SensorAgent)
\ No newline at end of file
+#Agent.register(SensorAgent)
@@ -0,0 +1,88 @@
+# benchmarks/bench_backtest.py
+# Run from the repo root: python -m benchmarks.bench_backtest
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from utils import battery
+from utils.backtest import load_inputs, parameter_grid, run_backtest
+
+START = 1_704_067_200  # 2024-01-01 00:00 UTC
+SLOTS = 365 * 48  # a year of half-hour slots
+TARGET_S = 10.0
+
+
+def synthetic_year(rng):
+    # Agile-like prices (cheap nights, 16:00-19:00 peak), a household's load and rooftop solar
+    times = START + np.arange(SLOTS, dtype=np.int64) * 1800
+    hour = (times % 86400) / 3600
+    day = np.arange(SLOTS) // 48
+    season = np.cos(2 * np.pi * day / 365)  # 1 in winter, -1 in summer
+    price = 18 + 4 * season + 8 * np.sin(np.pi * (hour - 6) / 14).clip(0) + 15 * ((hour >= 16) & (hour < 19))
+    price = price + rng.normal(0, 2, SLOTS)
+    consumption = (0.15 + 0.2 * np.exp(-((hour - 8) ** 2) / 2) + 0.35 * np.exp(-((hour - 19) ** 2) / 4)) \
+        * (1 + 0.3 * season) * rng.lognormal(0, 0.2, SLOTS)
+    daylight = np.sin(np.pi * (hour - 6 - season) / (12 - 2 * season)).clip(0)
+    solar = 1.8 * daylight * (1 - 0.5 * season) * rng.uniform(0.3, 1.0, SLOTS)
+    return times, price, consumption, solar
+
+
+def write_csv(path, times, price, consumption, solar):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("timestamp,price_p_kWh,consumption_kWh,solar_kWh\n")
+        for row in zip(times.astype("datetime64[s]").astype(str), price, consumption, solar):
+            f.write(f"{row[0]}Z,{row[1]:.4f},{row[2]:.4f},{row[3]:.4f}\n")
+
+
+def check_against_simulate(inputs, n_slots=2 * 7 * 48):
+    # The engine must reproduce utils.battery.simulate stepped slot by slot
+    grid = parameter_grid([0.10, 0.20, 0.30], [0, 5, 13.5], [0.85, 0.95], [0.9])
+    sliced = {name: values[:n_slots] for name, values in inputs.items()}
+    result = run_backtest(sliced, grid, workers=1)
+    charge = grid["battery_capacity_kWh"] * 0.5
+    cost = np.zeros(len(charge))
+    for c, s, p in zip(sliced["consumption_kWh"], sliced["solar_kWh"], sliced["price_p_kWh"]):
+        step = battery.simulate(
+            c, s, p / battery.PENCE_PER_POUND, charge,
+            battery_capacity_kWh=grid["battery_capacity_kWh"], charge_efficiency=grid["charge_efficiency"],
+            discharge_efficiency=grid["discharge_efficiency"], price_threshold=grid["price_threshold"],
+        )
+        charge = step["battery_charge_kWh"]
+        cost += step["net_cost"]
+    assert np.allclose(result["total_cost"], cost), np.abs(result["total_cost"] - cost).max()
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.csv")
+        write_csv(path, *synthetic_year(rng))
+        start = time.perf_counter()
+        inputs = load_inputs(path)
+        print(f"loaded {len(inputs['time']):,} slots from CSV in {time.perf_counter() - start:.2f} s")
+
+    check_against_simulate(inputs)
+    print("matches utils.battery.simulate slot by slot")
+
+    # 25 thresholds x 10 capacities x 8 x 5 efficiencies = 10,000 combinations
+    grid = parameter_grid(
+        np.linspace(0.10, 0.40, 25), np.linspace(2.5, 25, 10),
+        np.linspace(0.80, 0.98, 8), np.linspace(0.80, 0.98, 5),
+    )
+    n = len(grid["price_threshold"])
+    for workers in sorted({1, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        results = run_backtest(inputs, grid, workers=workers)
+        elapsed = time.perf_counter() - start
+        print(f"{n:,} combinations x {SLOTS:,} slots, {workers} worker(s): {elapsed:.2f} s "
+              f"({n * SLOTS / elapsed / 1e6:.0f}M slot-steps/s, target < {TARGET_S:.0f} s)")
+
+    i = int(np.argmax(results["savings"]))
+    print(f"no-battery cost £{results['baseline_cost']:.2f}; best: threshold £{grid['price_threshold'][i]:.3f}/kWh, "
+          f"{grid['battery_capacity_kWh'][i]:g} kWh -> cost £{results['total_cost'][i]:.2f}, "
+          f"savings £{results['savings'][i]:.2f}, {results['cycles'][i]:.0f} cycles")
+    default = run_backtest(inputs, parameter_grid(), workers=1)
+    print(f"today's defaults (£{battery.PRICE_THRESHOLD}/kWh, {battery.BATTERY_CAPACITY_KWH} kWh): "
+          f"savings £{default['savings'][0]:.2f}, {default['cycles'][0]:.0f} cycles")
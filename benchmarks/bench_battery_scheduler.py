@@ -0,0 +1,56 @@
+# benchmarks/bench_battery_scheduler.py
+# Run from the repo root: python -m benchmarks.bench_battery_scheduler
+import time
+
+import numpy as np
+
+from utils.battery_scheduler import BatteryScheduler
+
+HORIZON = 48
+HOUSEHOLDS = 200
+TARGET_MS = 10.0
+
+
+def make_inputs(rng, n_slots):
+    hours = np.arange(n_slots) / 2
+    prices = 15 + 10 * np.sin((hours - 6) / 24 * 2 * np.pi) + rng.normal(0, 2, n_slots)
+    consumption = rng.uniform(0.2, 1.2, n_slots)
+    solar = np.clip(np.sin((hours - 6) / 12 * np.pi), 0, None) * rng.uniform(0.5, 2.0)
+    return prices, consumption, solar
+
+
+def bench_cold(rng):
+    times = []
+    for _ in range(HOUSEHOLDS):
+        scheduler = BatteryScheduler(terminal_price=15)
+        prices, consumption, solar = make_inputs(rng, HORIZON)
+        start = time.perf_counter()
+        scheduler.plan(prices, consumption, solar, soc_kWh=rng.uniform(0, 20), start_slot=0)
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000
+
+
+def bench_receding(rng):
+    # One household replanned every slot for a day; the tail is unchanged between
+    # Agile publications, so most replans reuse the cached cost-to-go.
+    scheduler = BatteryScheduler(terminal_price=15)
+    prices, consumption, solar = make_inputs(rng, HORIZON * 2)
+    soc = 10.0
+    times = []
+    for slot in range(HORIZON):
+        end = HORIZON if slot < HORIZON // 2 else HORIZON * 2  # new prices published halfway
+        start = time.perf_counter()
+        plan = scheduler.plan(prices[slot:end], consumption[slot:end], solar[slot:end], soc, start_slot=slot)
+        times.append(time.perf_counter() - start)
+        soc = plan["soc_kWh"][1]
+    return np.array(times) * 1000, scheduler.stats
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    cold = bench_cold(rng)
+    print(f"cold {HORIZON}-slot plan: p50 {np.percentile(cold, 50):.2f} ms, p99 {np.percentile(cold, 99):.2f} ms "
+          f"(target < {TARGET_MS} ms)")
+    warm, stats = bench_receding(rng)
+    print(f"receding replan: p50 {np.percentile(warm, 50):.2f} ms, p99 {np.percentile(warm, 99):.2f} ms")
+    print(f"scheduler stats: {stats}")
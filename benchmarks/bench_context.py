@@ -0,0 +1,103 @@
+# benchmarks/bench_context.py
+# Run from the repo root: python -m benchmarks.bench_context
+import gc
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pyarrow as pa
+
+from adk.context import PipelineContext
+from agents.fleet_optimizer_agent import FleetOptimizerAgent
+
+SIZES = [100_000, 1_000_000]
+
+
+def fleet_step(n_sites, rng):
+    consumption = rng.uniform(5, 20, n_sites)
+    solar = rng.uniform(0, 8, n_sites)
+    price = rng.uniform(5, 35, n_sites)  # p/kWh
+    fleet = FleetOptimizerAgent(n_sites, battery_current_charge=rng.uniform(0, 5, n_sites))
+    return fleet, fleet.step(consumption, solar, price / 100), consumption, solar, price
+
+
+def as_dicts(fleet, result, consumption, solar, price, timestamp):
+    # Today's representation: one nested dict per household
+    return [
+        {
+            "sensor_data": {"consumption_kWh": 12.5, "solar_generation_kWh": 4.2, "timestamp": timestamp},
+            "forecast": {"predicted_consumption_kWh": float(consumption[i]), "predicted_solar_kWh": float(solar[i])},
+            "price_kWh": float(price[i]),
+            **fleet.site_result(result, i),
+        }
+        for i in range(fleet.n_sites)
+    ]
+
+
+def as_context(fleet, result, consumption, solar, price, timestamp):
+    ctx = fleet.context(result, consumption, solar, price)
+    ctx.update({"consumption_kWh": 12.5, "solar_generation_kWh": 4.2, "timestamp": np.datetime64(timestamp.rstrip("Z"), "ns")})
+    return ctx
+
+
+def measure(build, *args):
+    # Build time without tracing, then memory held with tracemalloc, then the
+    # cost of a full GC pass while the result is alive
+    gc.collect()
+    start = time.perf_counter()
+    build(*args)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    built = build(*args)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    gc.collect()
+    gc_ms = (time.perf_counter() - start) * 1000
+    return built, elapsed, memory, gc_ms
+
+
+def bench_arrow(ctx):
+    start = time.perf_counter()
+    table = ctx.to_arrow()
+    to_arrow_ms = (time.perf_counter() - start) * 1000
+    shared = all(
+        table.column(field).chunk(0).buffers()[1].address == column.ctypes.data
+        for field, column in ctx.columns.items() if column.dtype.kind == "f"
+    )
+    sink = pa.BufferOutputStream()
+    start = time.perf_counter()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    ipc_ms = (time.perf_counter() - start) * 1000
+    return to_arrow_ms, shared, ipc_ms, sink.getvalue().size
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    PipelineContext(1).to_arrow()  # load pyarrow before timing
+    timestamp = datetime.now(timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+    for n_sites in SIZES:
+        inputs = fleet_step(n_sites, rng)
+        print(f"{n_sites:>9,} households")
+        dicts, dict_s, dict_bytes, dict_gc = measure(as_dicts, *inputs, timestamp)
+        print(f"  dicts:   build {dict_s * 1000:8.1f} ms, {dict_bytes / 1e6:8.1f} MB allocated, gc.collect {dict_gc:7.1f} ms")
+        sample = {int(i): dicts[i] for i in rng.integers(0, n_sites, 1_000)}
+        del dicts
+        ctx, ctx_s, ctx_bytes, ctx_gc = measure(as_context, *inputs, timestamp)
+        print(f"  context: build {ctx_s * 1000:8.1f} ms, {ctx_bytes / 1e6:8.1f} MB allocated, gc.collect {ctx_gc:7.1f} ms")
+
+        # The dict view must agree with today's dicts
+        for i, expected in sample.items():
+            view = ctx[i]
+            assert view["forecast"]["predicted_consumption_kWh"] == expected["forecast"]["predicted_consumption_kWh"]
+            assert view["decision"] == expected["decision"] and view["battery_action"] == expected["battery_action"]
+            assert view["expected_cost"] == expected["expected_cost"]
+
+        to_arrow_ms, shared, ipc_ms, ipc_bytes = bench_arrow(ctx)
+        print(f"  to_arrow {to_arrow_ms:.2f} ms (float buffers shared: {shared}), "
+              f"IPC stream {ipc_ms:.1f} ms, {ipc_bytes / 1e6:.1f} MB")
+        restored = PipelineContext.from_arrow(ctx.to_arrow())
+        assert all(np.array_equal(restored.columns[f], c, equal_nan=c.dtype.kind == "f") for f, c in ctx.columns.items())
@@ -0,0 +1,88 @@
+# benchmarks/bench_fleet_optimizer.py
+# Run from the repo root: python -m benchmarks.bench_fleet_optimizer
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from agents.fleet_optimizer_agent import FleetOptimizerAgent
+from agents.optimizer_agent import OptimizerAgent
+from services.battery_state import BatteryStateStore
+
+SIZES = [1_000, 100_000, 1_000_000]
+REPEATS = 5
+
+
+def make_inputs(n_sites, rng):
+    return {
+        "battery_capacity_kWh": rng.uniform(5, 30, n_sites),
+        "battery_current_charge": rng.uniform(0, 5, n_sites),
+        "consumption_kWh": rng.uniform(5, 20, n_sites),
+        "solar_kWh": rng.uniform(0, 8, n_sites),
+        "price_kWh": rng.uniform(0.05, 0.35, n_sites),  # £/kWh
+    }
+
+
+def check_against_scalar(n_checks=2_000, seed=1):
+    # Every site must match what today's scalar OptimizerAgent would decide
+    rng = np.random.default_rng(seed)
+    inputs = make_inputs(n_checks, rng)
+    fleet = FleetOptimizerAgent(
+        n_checks,
+        battery_capacity_kWh=inputs["battery_capacity_kWh"],
+        battery_current_charge=inputs["battery_current_charge"],
+    )
+    result = fleet.step(inputs["consumption_kWh"], inputs["solar_kWh"], inputs["price_kWh"])
+
+    # A scratch battery state store, so the check doesn't touch the real one
+    tmp = tempfile.TemporaryDirectory()
+    store = BatteryStateStore(os.path.join(tmp.name, "battery_state.bin"))
+    for i in range(n_checks):
+        scalar = OptimizerAgent(site_id=i, state_store=store)
+        scalar.battery_capacity_kWh = float(inputs["battery_capacity_kWh"][i])
+        scalar.battery_current_charge = float(inputs["battery_current_charge"][i])
+        ctx = {
+            "forecast": {
+                "predicted_consumption_kWh": float(inputs["consumption_kWh"][i]),
+                "predicted_solar_kWh": float(inputs["solar_kWh"][i]),
+            },
+            # OptimizerAgent reads p/kWh from the context
+            "price_kWh": float(inputs["price_kWh"][i]) * 100,
+        }
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = scalar.run(ctx)
+        got = fleet.site_result(result, i)
+        for key, value in expected.items():
+            if isinstance(value, str):
+                assert got[key] == value, (i, key, got[key], value)
+            else:
+                assert abs(got[key] - value) < 1e-9, (i, key, got[key], value)
+    tmp.cleanup()
+    print(f"scalar parity: {n_checks} sites match OptimizerAgent")
+
+
+def bench(n_sites, rng):
+    inputs = make_inputs(n_sites, rng)
+    fleet = FleetOptimizerAgent(
+        n_sites,
+        battery_capacity_kWh=inputs["battery_capacity_kWh"],
+        battery_current_charge=inputs["battery_current_charge"],
+    )
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fleet.step(inputs["consumption_kWh"], inputs["solar_kWh"], inputs["price_kWh"])
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    check_against_scalar()
+    rng = np.random.default_rng(0)
+    print(f"{'sites':>10} {'best step (ms)':>15} {'sites/s':>15}")
+    for n in SIZES:
+        seconds = bench(n, rng)
+        print(f"{n:>10} {seconds * 1000:>15.2f} {n / seconds:>15,.0f}")
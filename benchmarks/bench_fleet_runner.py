@@ -0,0 +1,95 @@
+# benchmarks/bench_fleet_runner.py
+# Run from the repo root: python -m benchmarks.bench_fleet_runner [max_workers]
+#
+# Scaling report for the sharded fleet runner: one tick over the fleet with
+# 1..max_workers processes (default: every core), for the greedy optimizer on a
+# large fleet and the receding-horizon scheduler on a smaller one. Efficiency is
+# T1 / (k * Tk); 1.0 is perfect scaling.
+import os
+import sys
+import time
+
+import numpy as np
+
+from agents.fleet_optimizer_agent import FleetOptimizerAgent
+from agents.forecast_agent import predict_energy
+from services.fleet_runner import FleetRunner
+from utils.battery import PENCE_PER_POUND
+
+NOW = 1_718_452_800  # 2024-06-15 12:00 UTC
+LOCATIONS = 500
+HOURS = 48
+
+
+def synthetic_inputs(rng, n_sites):
+    # A weather grid of LOCATIONS cells, two days of Agile-like prices and a fleet spread over the cells
+    times = NOW - 3600 + np.arange(HOURS, dtype=np.int64) * 3600
+    hour = (times % 86400) / 3600
+    weather = {
+        "time": times,
+        "temperature_2m": 15 + 5 * np.sin(np.pi * (hour - 9) / 12) + rng.normal(0, 2, (LOCATIONS, 1)),
+        "shortwave_radiation": 800 * np.sin(np.pi * (hour - 6) / 12).clip(0) * rng.uniform(0.3, 1.0, (LOCATIONS, 1)),
+    }
+    valid_from = NOW - 1800 + np.arange(2 * HOURS, dtype=np.int64) * 1800
+    slot_hour = (valid_from % 86400) / 3600
+    tariff = {
+        "valid_from": valid_from,
+        "prices": 18 + 8 * np.sin(np.pi * (slot_hour - 6) / 14).clip(0) + 15 * ((slot_hour >= 16) & (slot_hour < 19)),
+    }
+    sites = {
+        "location": rng.integers(0, LOCATIONS, n_sites),
+        "battery_capacity_kWh": rng.choice([5.0, 10.0, 13.5, 20.0], n_sites),
+    }
+    return sites, weather, tariff
+
+
+def check_against_fleet_optimizer(rng):
+    # Greedy mode must reproduce FleetOptimizerAgent on the same forecast and price
+    sites, weather, tariff = synthetic_inputs(rng, 5_000)
+    with FleetRunner(sites, weather, tariff, workers=2, mode="greedy") as runner:
+        for now in (NOW, NOW + 1800):
+            ctx = runner.run_tick(now)
+            hour = np.searchsorted(weather["time"], now, side="right") - 1
+            price = tariff["prices"][np.searchsorted(tariff["valid_from"], now, side="right") - 1]
+            consumption, solar = predict_energy(weather["temperature_2m"][sites["location"], hour],
+                                                weather["shortwave_radiation"][sites["location"], hour])
+            if now == NOW:
+                agent = FleetOptimizerAgent(len(sites["location"]), sites["battery_capacity_kWh"],
+                                            sites["battery_capacity_kWh"] / 2)
+            expected = agent.step(consumption, solar, price / PENCE_PER_POUND)
+            for field, values in expected.items():
+                if field in ctx.columns:
+                    assert np.allclose(ctx.columns[field], values), field
+        # Results are read in place from shared memory and handed to Arrow without a copy
+        table = ctx.to_arrow()
+        assert table.num_rows == len(sites["location"])
+
+
+def scaling(label, sites, weather, tariff, mode, max_workers, ticks=3):
+    n = len(sites["location"])
+    print(f"{label}: {n:,} sites")
+    base = None
+    for workers in range(1, max_workers + 1):
+        with FleetRunner(sites, weather, tariff, workers=workers, mode=mode) as runner:
+            runner.run_tick(NOW)  # starts the workers and attaches the shared blocks
+            start = time.perf_counter()
+            for k in range(ticks):
+                runner.run_tick(NOW + 1800 * (k + 1))
+            elapsed = (time.perf_counter() - start) / ticks
+            shards = runner.last_shard_seconds
+        base = base or elapsed
+        print(f"  {workers:2d} worker(s): {elapsed * 1000:8.1f} ms/tick, {n / elapsed:10,.0f} sites/s, "
+              f"speedup {base / elapsed:4.2f}x, efficiency {base / (workers * elapsed):4.2f} "
+              f"({len(shards)} shards, slowest {max(shards) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1
+    rng = np.random.default_rng(0)
+    check_against_fleet_optimizer(rng)
+    print("greedy mode matches FleetOptimizerAgent; results export to Arrow in place")
+    if max_workers == 1:
+        print("(1 core available: pass a worker count to see scaling on a larger machine)")
+
+    scaling("greedy", *synthetic_inputs(rng, 1_000_000), mode="greedy", max_workers=max_workers)
+    scaling("schedule (48-slot horizon)", *synthetic_inputs(rng, 2_000), mode="schedule", max_workers=max_workers)
@@ -0,0 +1,116 @@
+# benchmarks/bench_forecaster.py
+# Run from the repo root: python -m benchmarks.bench_forecaster
+#
+# Backtest on synthetic hourly history for a fleet of households: train the
+# ridge forecaster on the first TRAIN_DAYS, then walk forward one day at a
+# time, forecasting the next 24 hours from midnight with the state as of
+# midnight. Compared with the current heuristic (agents.forecast_agent.predict_energy)
+# and a same-hour-yesterday baseline.
+import time
+
+import numpy as np
+
+from agents.forecast_agent import predict_energy
+from utils.forecast_model import ForecastModel, SiteState, replay
+
+SITES = 200
+TRAIN_DAYS = 60
+TEST_DAYS = 14
+START = 1_704_067_200  # 2024-01-01 00:00 UTC
+THROUGHPUT_SITES = 10_000
+THROUGHPUT_HOURS = 168
+
+
+def synthetic_weather(rng, n_sites, n_hours):
+    hours = np.arange(n_hours)
+    hour_of_day = hours % 24
+    daily_temperature = 8 + np.cumsum(rng.normal(0, 0.8, n_hours // 24 + 1))[hours // 24]
+    temperature = daily_temperature + 4 * np.sin(2 * np.pi * (hour_of_day - 9) / 24)
+    clouds = np.clip(np.convolve(rng.uniform(0.2, 1.0, n_hours + 5), np.ones(6) / 6, "valid")[:n_hours], 0, 1)
+    radiation = 700 * np.clip(np.sin(np.pi * (hour_of_day - 6) / 12), 0, None) * clouds
+    # Sites are close enough to share weather, with a little local noise
+    temperature = temperature + rng.normal(0, 0.5, (n_sites, n_hours))
+    radiation = np.clip(radiation * rng.uniform(0.9, 1.1, (n_sites, n_hours)), 0, None)
+    return temperature, radiation
+
+
+def synthetic_energy(rng, times, temperature, radiation):
+    n_sites, n_hours = temperature.shape
+    hour_of_day = (times // 3600) % 24
+    weekend = ((times // 86400 + 3) % 7) >= 5
+    scale = rng.uniform(0.5, 2.0, (n_sites, 1))
+    panel_kW = rng.choice([0.0, 2.0, 3.5, 5.0], (n_sites, 1))
+    routine = 0.25 + 0.35 * np.exp(-((hour_of_day - 8) ** 2) / 3) + 0.6 * np.exp(-((hour_of_day - 19) ** 2) / 5)
+    consumption = scale * (routine + 0.15 * weekend + 0.04 * np.maximum(0, 15.5 - temperature))
+    consumption = np.clip(consumption * rng.lognormal(0, 0.15, (n_sites, n_hours)), 0.05, None)
+    solar = np.clip(panel_kW * radiation / 1000 * 0.85 * rng.normal(1, 0.08, (n_sites, n_hours)), 0, None)
+    return consumption, solar
+
+
+def mae(predicted, actual):
+    return np.abs(predicted - actual).mean(axis=(0, 1))
+
+
+def backtest(model, state, times, consumption, solar, temperature, radiation, first_hour):
+    predictions = {"ridge": [], "heuristic": [], "yesterday": []}
+    actuals = []
+    for day_start in range(first_hour, len(times), 24):
+        day = slice(day_start, day_start + 24)
+        c, s = model.predict(state, times[day], temperature[:, day], radiation[:, day])
+        predictions["ridge"].append(np.stack([c, s], axis=-1))
+        hc, hs = predict_energy(temperature[:, day], radiation[:, day])
+        predictions["heuristic"].append(np.stack([hc, hs], axis=-1))
+        hour = (times[day] // 3600) % 24
+        predictions["yesterday"].append(state.last_day[:, hour])
+        actuals.append(np.stack([consumption[:, day], solar[:, day]], axis=-1))
+        for j in range(day_start, min(day_start + 24, len(times))):
+            state.update(times[j], consumption[:, j], solar[:, j], radiation[:, j])
+    actual = np.concatenate(actuals, axis=1)
+    return {name: mae(np.concatenate(parts, axis=1), actual) for name, parts in predictions.items()}, actual
+
+
+def bench_throughput(model, rng):
+    state = SiteState(THROUGHPUT_SITES)
+    times = START + np.arange(48) * 3600
+    temperature, radiation = synthetic_weather(rng, THROUGHPUT_SITES, 48)
+    consumption, solar = synthetic_energy(rng, times, temperature, radiation)
+    start = time.perf_counter()
+    for j in range(48):
+        state.update(times[j], consumption[:, j], solar[:, j], radiation[:, j])
+    update_s = (time.perf_counter() - start) / 48
+
+    times = times[-1] + 3600 + np.arange(THROUGHPUT_HOURS) * 3600
+    temperature, radiation = synthetic_weather(rng, THROUGHPUT_SITES, THROUGHPUT_HOURS)
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        model.predict(state, times, temperature, radiation)
+        best = min(best, time.perf_counter() - start)
+    return update_s, best
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    n_hours = (TRAIN_DAYS + TEST_DAYS) * 24
+    times = START + np.arange(n_hours, dtype=np.int64) * 3600
+    temperature, radiation = synthetic_weather(rng, SITES, n_hours)
+    consumption, solar = synthetic_energy(rng, times, temperature, radiation)
+    train = slice(0, TRAIN_DAYS * 24)
+
+    start = time.perf_counter()
+    X, Y, state = replay(times[train], consumption[:, train], solar[:, train], temperature[:, train], radiation[:, train])
+    model = ForecastModel.fit(X, Y)
+    print(f"trained on {len(X):,} site-hours in {time.perf_counter() - start:.2f} s")
+
+    scores, actual = backtest(model, state, times, consumption, solar, temperature, radiation, TRAIN_DAYS * 24)
+    mean = actual.mean(axis=(0, 1))
+    print(f"day-ahead backtest over {TEST_DAYS} days x {SITES} sites "
+          f"(mean consumption {mean[0]:.2f} kWh/h, solar {mean[1]:.2f} kWh/h):")
+    for name, (c_mae, s_mae) in scores.items():
+        print(f"  {name:<10} MAE consumption {c_mae:7.3f} kWh, solar {s_mae:7.3f} kWh")
+
+    update_s, predict_s = bench_throughput(model, rng)
+    cells = THROUGHPUT_SITES * THROUGHPUT_HOURS
+    print(f"state update: {update_s * 1000:.2f} ms per hour for {THROUGHPUT_SITES:,} sites")
+    print(f"batched inference: {THROUGHPUT_SITES:,} sites x {THROUGHPUT_HOURS} h in {predict_s * 1000:.0f} ms "
+          f"({cells / predict_s / 1e6:.1f}M site-hours/s)")
@@ -0,0 +1,67 @@
+# benchmarks/bench_import_time.py
+# Run from the repo root: python -m benchmarks.bench_import_time
+# Measures cold import cost of the pipeline with `python -X importtime` and checks
+# that an offline tick never loads the cloud / heavy client libraries.
+import os
+import subprocess
+import sys
+
+IMPORT_BUDGET_MS = 300
+ROOT_MODULE = "agents.coordinator_agent"
+# Must not be imported by an offline import + tick
+HEAVY_MODULES = ("google.cloud", "google.generativeai", "pandas", "aiohttp", "openmeteo_sdk", "grpc")
+RUNS = 5
+
+
+def offline_env():
+    return dict(os.environ, GREENGRID_OFFLINE="1", GREENGRID_INGEST_SINK="local")
+
+
+def import_time_ms():
+    # Cumulative microseconds of the root module, from the -X importtime report
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {ROOT_MODULE}"],
+        capture_output=True, text=True, env=offline_env(), check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            modules.append((int(cumulative) / 1000, name.strip()))
+    total = next(ms for ms, name in modules if name == ROOT_MODULE)
+    return total, sorted(modules, reverse=True)
+
+
+def loaded_heavy_modules():
+    code = (
+        "import sys\n"
+        f"from {ROOT_MODULE} import CoordinatorAgent\n"
+        "c = CoordinatorAgent()\n"
+        "c.attach_report(c.run({}), timeout=5)\n"
+        f"print('HEAVY:' + ','.join(m for m in sys.modules if m.startswith({HEAVY_MODULES!r})))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            env=offline_env(), check=True)
+    line = next(line for line in result.stdout.splitlines() if line.startswith("HEAVY:"))
+    return [m for m in line[len("HEAVY:"):].split(",") if m]
+
+
+if __name__ == "__main__":
+    totals = []
+    for _ in range(RUNS):
+        total, modules = import_time_ms()
+        totals.append(total)
+    best = min(totals)
+    print(f"import {ROOT_MODULE}: best {best:.1f} ms, median {sorted(totals)[RUNS // 2]:.1f} ms "
+          f"(budget {IMPORT_BUDGET_MS} ms)")
+    print("slowest imports (cumulative ms):")
+    for ms, name in modules[1:11]:
+        print(f"  {ms:8.1f}  {name}")
+
+    heavy = loaded_heavy_modules()
+    print(f"heavy modules loaded by an offline tick: {heavy or 'none'}")
+
+    if best > IMPORT_BUDGET_MS or heavy:
+        sys.exit(1)
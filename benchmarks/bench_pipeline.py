@@ -0,0 +1,325 @@
+# benchmarks/bench_pipeline.py
+# Run from the repo root: python -m benchmarks.bench_pipeline [--fixtures DIR] [--latency SPEC]
+#
+# The full agent pipeline against replayed external services (services.replay):
+# Open-Meteo, Octopus, BigQuery and Gemini answer from fixtures after an
+# injected latency, so runs are reproducible and need no network or credentials.
+#
+#   single site: per-agent and end-to-end tick latency, cold (nothing cached, as
+#                in a new process) and warm, plus time until the Gemini report lands
+#   fleet:       forecast -> pricing -> optimizer -> advisor throughput at FLEET_SIZES
+#   memory:      tracemalloc peak, gen-0 GC runs (allocation churn) and blocks
+#                still allocated afterwards, per cold tick, warm tick and fleet run
+#
+# Without --fixtures the fixtures are synthesized first: the same workloads run
+# once in record mode against SyntheticServices, which answer the way the real
+# APIs do (Open-Meteo flatbuffers, Octopus unit-rate pages, BigQuery rows, Gemini
+# text/JSON) for data generated around the current time. --fixtures replays a
+# directory recorded from the real services with GREENGRID_REPLAY=record for the
+# single-site pipeline; the fleet section always uses synthesized fixtures.
+import argparse
+import contextlib
+import gc
+import io
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from services.replay import Recorder, RecordedModel, parse_latency, set_recorder
+from tests import synthetic
+
+# Typical latencies seen from a UK host, in ms
+DEFAULT_LATENCY = "http=150,bigquery=800,gemini=1200"
+JITTER = 0.1
+COLD_TICKS = 5
+WARM_TICKS = 50
+FLEET_SIZES = (1_000, 10_000, 100_000)
+HISTORY_DAYS = 14
+GEMINI_MODEL = "gemini-2.0-flash"
+
+
+class SyntheticServices(synthetic.SyntheticServices):
+    # Answers the pipeline's external calls with plausible data around `now`
+    def respond(self, kind, route, request):
+        if kind == "http":
+            if "open-meteo" in route:
+                return self.open_meteo(request)
+            return self.octopus(request)
+        if kind == "bigquery":
+            return self.bigquery(route, request)
+        return self.gemini(request)
+
+    def history(self):
+        # Hourly meter rows for the last HISTORY_DAYS, oldest first
+        end = int(self.now // 3600) * 3600
+        times = np.arange(end - HISTORY_DAYS * 86400, end, 3600)
+        hour = (times % 86400) / 3600
+        consumption = 0.3 + 0.4 * np.exp(-((hour - 8) ** 2) / 3) + 0.7 * np.exp(-((hour - 19) ** 2) / 5)
+        solar = 3.0 * np.sin(np.pi * (hour - 6) / 12).clip(0) * 0.6
+        return [
+            {"timestamp": datetime.fromtimestamp(t, timezone.utc), "consumption_kWh": round(float(c), 3),
+             "solar_generation_kWh": round(float(s), 3), "predicted_consumption_kWh": None,
+             "predicted_solar_kWh": None, "price_kWh": None, "expected_cost": None, "decision": None}
+            for t, c, s in zip(times.tolist(), consumption, solar)
+        ]
+
+    def bigquery(self, route, parameters):
+        parameters = {name: value for name, _, value in parameters} if isinstance(parameters, list) else {}
+        if "@since" in route:
+            return [row for row in self.history() if row["timestamp"] > parameters["since"]]
+        if "@limit" in route:
+            return self.history()[::-1][:parameters["limit"]]
+        return None  # loads and anything else the pipeline doesn't read back
+
+    def gemini(self, request):
+        prompt = request["prompt"]
+        if request.get("generation_config"):
+            cases = re.findall(r'- id (\d+): decision "([^"]*)", estimated cost \$([\d.]+)', prompt)
+            text = json.dumps([{"id": int(i), "report": self.report(decision, cost)} for i, decision, cost in cases])
+        else:
+            decision, cost = re.search(r'decision "([^"]*)" and an estimated cost of \$([\d.]+)', prompt).groups()
+            text = self.report(decision, cost)
+        return {"text": text, "prompt_token_count": len(prompt) // 4, "candidates_token_count": len(text) // 4}
+
+    @staticmethod
+    def report(decision, cost):
+        return (f"Your system recommends you {decision.lower()} this hour. That keeps the expected cost "
+                f"to about ${cost}, because it uses the cheapest energy available right now.")
+
+
+class SyntheticRecorder(Recorder):
+    # Record mode with SyntheticServices standing in for the live call
+    def __init__(self, directory, services):
+        super().__init__("record", directory)
+        self.services = services
+
+    def call(self, kind, route, request, live, write=False):
+        return super().call(kind, route, request, lambda: self.services.respond(kind, route, request), write)
+
+    async def call_async(self, kind, route, request, live):
+        async def respond():
+            return self.services.respond(kind, route, request)
+
+        return await super().call_async(kind, route, request, respond)
+
+
+@contextlib.contextmanager
+def quiet():
+    # The agents narrate every tick; keep the report readable
+    logging.disable(logging.WARNING)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def memory(fn):
+    # (peak traced MB, gen-0 GC runs, blocks still allocated afterwards) for one call
+    gc.collect()
+    runs = gc.get_stats()[0]["collections"]
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    gc_runs = gc.get_stats()[0]["collections"] - runs
+    gc.collect()
+    return peak / 1e6, gc_runs, sys.getallocatedblocks() - blocks
+
+
+def train_forecaster(path):
+    # A small ridge model, so ForecastAgent takes the learned path (and reads BigQuery history)
+    from benchmarks.bench_forecaster import START, synthetic_energy, synthetic_weather
+    from utils.forecast_model import ForecastModel, replay
+
+    rng = np.random.default_rng(0)
+    times = START + np.arange(14 * 24, dtype=np.int64) * 3600
+    temperature, radiation = synthetic_weather(rng, 20, len(times))
+    consumption, solar = synthetic_energy(rng, times, temperature, radiation)
+    X, Y, _ = replay(times, consumption, solar, temperature, radiation)
+    ForecastModel.fit(X, Y).save(path)
+
+
+# -- single-site pipeline ----------------------------------------------------
+
+def fresh_coordinator(tmp, i, recorder=None):
+    # A coordinator with nothing cached: empty tariff, energy history and forecast caches.
+    # With a recorder, its Gemini calls go through it (record mode never imports genai)
+    from agents.coordinator_agent import CoordinatorAgent
+    from services import energy_cache
+    from services.energy_data import fetch_energy_rows_since
+    from services.tariff import TariffStore
+
+    energy_cache._cache = energy_cache.EnergyCache(os.path.join(tmp, f"energy-{i}.sqlite"),
+                                                   fetch=fetch_energy_rows_since)
+    coordinator = CoordinatorAgent()
+    coordinator.pricing.store = TariffStore()
+    if recorder is not None:
+        coordinator.advisor.model = RecordedModel(recorder, GEMINI_MODEL)
+        coordinator.advisor._model_checked = True
+    return coordinator
+
+
+def tick(coordinator):
+    start = time.perf_counter()
+    ctx = coordinator.run({})
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    coordinator.attach_report(ctx, timeout=60)
+    return ctx, elapsed, time.perf_counter() - start
+
+
+def bench_pipeline(tmp):
+    cold, warm = [], []
+    for i in range(COLD_TICKS):
+        coordinator = fresh_coordinator(tmp, f"cold-{i}")
+        cold.append(tick(coordinator))
+    for _ in range(WARM_TICKS):
+        warm.append(tick(coordinator))
+    cold_memory = memory(lambda: tick(fresh_coordinator(tmp, "cold-traced")))
+    warm_memory = memory(lambda: tick(coordinator))
+    return cold, warm, cold_memory, warm_memory
+
+
+def report_pipeline(cold, warm, cold_memory, warm_memory):
+    agents = list(cold[0][0]["timings_ms"])
+    print(f"single site, {COLD_TICKS} cold / {WARM_TICKS} warm ticks (ms):")
+    print(f"  {'':<16} {'cold p50':>9} {'cold max':>9} {'warm p50':>9} {'warm p99':>9}")
+    rows = [(name, [t[0]["timings_ms"][name] for t in cold], [t[0]["timings_ms"][name] for t in warm])
+            for name in agents]
+    rows.append(("end to end", [t[1] * 1000 for t in cold], [t[1] * 1000 for t in warm]))
+    rows.append(("report ready", [(t[1] + t[2]) * 1000 for t in cold], [(t[1] + t[2]) * 1000 for t in warm]))
+    for name, c, w in rows:
+        print(f"  {name:<16} {np.percentile(c, 50):9.1f} {np.max(c):9.1f} "
+              f"{np.percentile(w, 50):9.1f} {np.percentile(w, 99):9.1f}")
+    print(f"  warm throughput: {WARM_TICKS / sum(t[1] for t in warm):,.0f} ticks/s")
+    for label, (peak, gc_runs, blocks) in (("cold tick", cold_memory), ("warm tick", warm_memory)):
+        print(f"  {label}: peak {peak:.1f} MB traced, {gc_runs} gen-0 GC runs, {blocks:+,} blocks retained")
+
+
+# -- fleet ---------------------------------------------------------------------
+
+def fleet_run(n_sites, now, recorder=None):
+    # One fleet tick end to end; returns {stage: seconds}. recorder: as in fresh_coordinator
+    import pandas as pd
+
+    from agents.advisor_agent import AdvisorAgent
+    from agents.forecast_agent import ForecastAgent
+    from services.fleet_runner import FleetRunner
+    from services.tariff import TariffStore
+
+    rng = np.random.default_rng(n_sites)
+    coords = np.column_stack([rng.uniform(50.5, 53.5, n_sites), rng.uniform(-3.0, 0.5, n_sites)])
+    sites = dict(enumerate(map(tuple, coords.tolist())))
+    stages = {}
+
+    start = time.perf_counter()
+    frame, site_locations = ForecastAgent().get_weather_forecast_batch(sites)
+    stages["forecast"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    curve = TariffStore().get_curve(now=now)
+    stages["pricing"] = time.perf_counter() - start
+
+    n_locations = int(site_locations.max()) + 1
+    hours = len(frame) // n_locations
+    times = frame.index.get_level_values("time")[:hours]
+    weather = {
+        "time": np.asarray((times - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1), dtype=np.int64),
+        "temperature_2m": frame["temperature_2m"].to_numpy().reshape(n_locations, hours),
+        "shortwave_radiation": frame["shortwave_radiation"].to_numpy().reshape(n_locations, hours),
+    }
+    fleet = {"location": site_locations.to_numpy(), "battery_capacity_kWh": rng.choice([5.0, 10.0, 13.5], n_sites)}
+    with FleetRunner(fleet, weather, {"valid_from": curve.valid_from, "prices": curve.prices}) as runner:
+        start = time.perf_counter()
+        ctx = runner.run_tick(now)
+        stages["optimizer"] = time.perf_counter() - start
+        households = {i: {"decision": decision, "expected_cost": cost}
+                      for i, (decision, cost) in enumerate(zip(ctx.labels("decision").tolist(),
+                                                               ctx.columns["expected_cost"].tolist()))}
+
+    advisor = AdvisorAgent(model=recorder and RecordedModel(recorder, GEMINI_MODEL))
+    start = time.perf_counter()
+    advisor.run_batch(households)
+    stages["advisor"] = time.perf_counter() - start
+    stages["llm calls"] = advisor.batch_stats["llm_calls"]
+    return stages
+
+
+def report_fleet(results):
+    print("fleet tick (ms), forecast -> pricing -> optimizer -> advisor:")
+    print(f"  {'sites':>8} {'forecast':>9} {'pricing':>8} {'optimizer':>9} {'advisor':>8} {'total':>8} "
+          f"{'sites/s':>10} {'LLM calls':>9} {'peak MB':>8} {'GC runs':>8}")
+    for n_sites, stages, (peak, gc_runs, _) in results:
+        total = sum(stages[name] for name in ("forecast", "pricing", "optimizer", "advisor"))
+        print(f"  {n_sites:>8,} {stages['forecast'] * 1000:9.1f} {stages['pricing'] * 1000:8.1f} "
+              f"{stages['optimizer'] * 1000:9.1f} {stages['advisor'] * 1000:8.1f} {total * 1000:8.1f} "
+              f"{n_sites / total:10,.0f} {stages['llm calls']:9} {peak:8.1f} {gc_runs:8}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", help="replay the single-site pipeline from this recorded fixture directory")
+    parser.add_argument("--latency", default=DEFAULT_LATENCY,
+                        help='injected latency: "recorded", ms for every call, or "http=150,bigquery=800,gemini=1200"')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Module-level paths are read at import, so set them before the agents load
+        os.environ.pop("GREENGRID_OFFLINE", None)
+        os.environ.pop("GREENGRID_INGEST_SINK", None)
+        os.environ["GREENGRID_BATTERY_STATE"] = os.path.join(tmp, "battery.bin")
+        os.environ["GREENGRID_ENERGY_CACHE"] = os.path.join(tmp, "energy.sqlite")
+        os.environ["GREENGRID_FORECAST_MODEL"] = os.path.join(tmp, "forecast_model.npz")
+        train_forecaster(os.environ["GREENGRID_FORECAST_MODEL"])
+
+        now = time.time()
+        latency = parse_latency(args.latency)
+        fixtures = args.fixtures or os.path.join(tmp, "fixtures")
+        fleet_fixtures = os.path.join(tmp, "fleet_fixtures")
+        services = SyntheticServices(now)
+
+        with quiet():
+            if not args.fixtures:
+                recorder = SyntheticRecorder(fixtures, services)
+                set_recorder(recorder)
+                tick(fresh_coordinator(tmp, "record", recorder))
+            recorder = SyntheticRecorder(fleet_fixtures, services)
+            set_recorder(recorder)
+            for n_sites in FLEET_SIZES:
+                fleet_run(n_sites, now, recorder)
+
+        print(f"replaying with injected latency {args.latency} (±{JITTER:.0%})"
+              + (f" from {args.fixtures}" if args.fixtures else " from synthesized fixtures"))
+        replay = Recorder("replay", fixtures, latency=latency, jitter=JITTER)
+        set_recorder(replay)
+        with quiet():
+            results = bench_pipeline(tmp)
+        report_pipeline(*results)
+        pipeline_stats = dict(replay.stats)
+
+        replay = Recorder("replay", fleet_fixtures, latency=latency, jitter=JITTER)
+        set_recorder(replay)
+        results = []
+        with quiet():
+            for n_sites in FLEET_SIZES:
+                stages = fleet_run(n_sites, now)
+                results.append((n_sites, stages, memory(lambda: fleet_run(n_sites, now))))
+        report_fleet(results)
+        print(f"fixtures served: pipeline {pipeline_stats}, fleet {replay.stats}")
+        set_recorder(None)
+
+
+if __name__ == "__main__":
+    main()
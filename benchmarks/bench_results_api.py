@@ -0,0 +1,144 @@
+# benchmarks/bench_results_api.py
+# Run from the repo root: python -m benchmarks.bench_results_api
+#
+# Load test for the results API. An offline daemon.py runs in a subprocess
+# and ticks every TICK_S seconds. Keep-alive clients then hammer it with
+# full-body and conditional (If-None-Match -> 304) GETs, and LONG_POLLERS
+# clients park on ?wait= until the next tick. Reports requests/s, tail
+# latency, fan-out time, and how many pipeline runs served all of it.
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+TICK_S = 3.0
+CONNECTIONS = 200
+DURATION_S = 5.0
+LONG_POLLERS = 2_000
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def get(reader, writer, path, etag=None):
+    # One keep-alive HTTP/1.1 GET; returns (status, headers, body)
+    request = f"GET {path} HTTP/1.1\r\nHost: bench\r\n"
+    if etag:
+        request += f"If-None-Match: {etag}\r\n"
+    writer.write((request + "\r\n").encode())
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode().split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = {k.lower(): v.strip() for k, v in (line.split(":", 1) for line in lines[1:] if ":" in line)}
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers, body
+
+
+async def hammer(port, path, conditional, deadline, latencies, statuses):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    etag = None
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        status, headers, _ = await get(reader, writer, path, etag if conditional else None)
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+        etag = headers.get("etag", etag)
+    writer.close()
+
+
+async def load(port, path, conditional):
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    deadline = start + DURATION_S
+    await asyncio.gather(*(hammer(port, path, conditional, deadline, latencies, statuses)
+                           for _ in range(CONNECTIONS)))
+    return len(latencies) / (time.perf_counter() - start), np.array(latencies), statuses
+
+
+async def long_poll(port, path, etag, received):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    status, _, body = await get(reader, writer, f"{path}?wait=30", etag)
+    received.append((time.time(), status, json.loads(body) if status == 200 else None))
+    writer.close()
+
+
+async def fan_out(port, path):
+    # Every poller holds the current ETag, so all of them wait for the same next tick
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    _, headers, _ = await get(reader, writer, path)
+    writer.close()
+    received = []
+    tasks = [asyncio.create_task(long_poll(port, path, headers["etag"], received)) for _ in range(LONG_POLLERS)]
+    await asyncio.gather(*tasks)
+    return received
+
+
+async def wait_for_first_tick(port, path, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            await asyncio.sleep(0.2)
+            continue
+        status, _, _ = await get(reader, writer, f"{path}?wait=10")
+        writer.close()
+        if status == 200:
+            return
+    raise RuntimeError("daemon published no result")
+
+
+def healthz(port):
+    import urllib.request
+
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz") as response:
+        return json.loads(response.read())
+
+
+async def main():
+    port = free_port()
+    path = "/results/0"
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, GREENGRID_OFFLINE="1", GREENGRID_BATTERY_STATE=os.path.join(tmp, "battery.bin"))
+        daemon = subprocess.Popen(
+            [sys.executable, "daemon.py", "--interval", str(TICK_S), "--health-port", "0",
+             "--results-port", str(port)],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            await wait_for_first_tick(port, path)
+            ticks_before = healthz(port)["ticks"]
+            requests = 0
+            for label, conditional in (("full body", False), ("If-None-Match", True)):
+                rps, latencies, statuses = await load(port, path, conditional)
+                requests += len(latencies)
+                p50, p99, p999 = np.percentile(latencies, [50, 99, 99.9]) * 1000
+                print(f"{label:>14}: {CONNECTIONS} connections, {rps:8,.0f} req/s, "
+                      f"p50 {p50:.2f} ms, p99 {p99:.2f} ms, p99.9 {p999:.2f} ms, statuses {statuses}")
+
+            received = await fan_out(port, path)
+            requests += len(received)
+            ticks = {r[2]["tick"] for r in received if r[2]}
+            lag = np.array([r[0] - r[2]["published_at"] for r in received if r[2]]) * 1000
+            print(f"{'long poll':>14}: {LONG_POLLERS:,} waiting clients woken by tick(s) {sorted(ticks)}; "
+                  f"delivery after publish p50 {np.percentile(lag, 50):.0f} ms, max {lag.max():.0f} ms")
+
+            # Offline the report is ready at once, so each daemon tick publishes exactly one snapshot
+            runs = healthz(port)["ticks"] - ticks_before
+            print(f"{requests:,} requests served from {runs} pipeline run(s), one per {TICK_S:g} s tick")
+        finally:
+            daemon.terminate()
+            daemon.wait(30)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
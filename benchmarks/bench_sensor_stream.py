@@ -0,0 +1,85 @@
+# benchmarks/bench_sensor_stream.py
+# Run from the repo root: python -m benchmarks.bench_sensor_stream
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from services.sensor_stream import FileTailSource, SensorRing, SensorStream, SimulatedMeterSource
+
+TARGET_HZ = 10_000
+LIVE_SECONDS = 3.0
+
+
+def bench_ring(batch_size, n_readings=200_000):
+    # Raw ingest throughput of the ring + aggregates, no event loop
+    ring = SensorRing()
+    source = SimulatedMeterSource(rate_hz=TARGET_HZ, realtime=False, seed=0)
+    batch = source._readings(time.time(), n_readings)
+    start = time.perf_counter()
+    for i in range(0, n_readings, batch_size):
+        ring.extend(batch[i:i + batch_size])
+    return n_readings / (time.perf_counter() - start)
+
+
+def bench_allocations(batch_size=100, n_batches=5_000):
+    # Memory held by the ring must not grow with the number of readings
+    ring = SensorRing(capacity=65_536)
+    source = SimulatedMeterSource(rate_hz=TARGET_HZ, realtime=False, seed=0)
+    batches = source._readings(time.time(), batch_size * n_batches * 2).reshape(2, n_batches, batch_size, 3)
+    for batch in batches[0]:
+        ring.extend(batch)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for batch in batches[1]:
+        ring.extend(batch)
+    ring.snapshot()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+
+def bench_live():
+    # Simulated meter at TARGET_HZ in real time while an agent polls snapshots
+    stream = SensorStream(SimulatedMeterSource(rate_hz=TARGET_HZ, batch_interval=0.01, seed=0)).start()
+    latencies = []
+    deadline = time.perf_counter() + LIVE_SECONDS
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        snapshot = stream.snapshot()
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.001)
+    stream.stop()
+    return snapshot, stream.ring.stats, np.array(latencies) * 1e6
+
+
+def bench_file_tail(n_readings=100_000):
+    source = SimulatedMeterSource(rate_hz=TARGET_HZ, realtime=False, seed=0)
+    batch = source._readings(time.time(), n_readings)
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+        for row in batch:
+            f.write(f"{row[0]:.4f},{row[1]:.4f},{row[2]:.4f}\n")
+    try:
+        stream = SensorStream(FileTailSource(f.name, from_start=True)).start()
+        start = time.perf_counter()
+        while stream.ring.stats["readings"] < n_readings and time.perf_counter() - start < 30:
+            time.sleep(0.005)
+        elapsed = time.perf_counter() - start
+        stream.stop()
+        return stream.ring.stats["readings"] / elapsed
+    finally:
+        os.unlink(f.name)
+
+
+if __name__ == "__main__":
+    for batch_size in (1, 10, 100, 1_000):
+        rate = bench_ring(batch_size, n_readings=50_000 if batch_size == 1 else 200_000)
+        print(f"ring ingest, batch {batch_size:>5}: {rate:>12,.0f} readings/s")
+    print(f"ring memory growth over 500k readings: {bench_allocations()} bytes")
+    print(f"file tail ingest: {bench_file_tail():,.0f} readings/s")
+    snapshot, stats, latencies = bench_live()
+    print(f"live {TARGET_HZ:,} Hz for {LIVE_SECONDS:.0f}s: {stats['readings']:,} readings in "
+          f"{stats['batches']:,} batches, window rate {snapshot['rate_hz']:,.0f} Hz")
+    print(f"snapshot latency: p50 {np.percentile(latencies, 50):.1f} us, p99 {np.percentile(latencies, 99):.1f} us")
@@ -0,0 +1,286 @@
+# daemon.py
+# Long-running GreenGrid process: builds the CoordinatorAgent once and runs a
+# tick on every wall-clock boundary (Agile half-hours by default), so imports,
+# HTTP/BigQuery clients, caches and the optimizer's battery state stay warm.
+#
+#   python daemon.py [--interval 1800] [--health-port 8080] [--optimizer-mode schedule]
+#
+# Ticks never overlap. When boundaries pass while a tick is running (or while
+# the process was stalled), only the latest one is run, straight away; the
+# older ones are counted as skipped. The agents work from the wall clock (the
+# forecast hour, the current price slot, the battery's SOC step, the meter
+# reading), so re-running a past boundary would only repeat "now" and step
+# the battery twice. SIGTERM/SIGINT let the current tick
+# finish, then flush ingestion and exit. GET /healthz reports scheduler state,
+# GET /metrics the Prometheus metrics. Each tick's result is published on the
+# results API (services.results_api, --results-port) for dashboards to read.
+
+import argparse
+import json
+import os
+import signal
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from adk.metrics import REGISTRY
+from utils.logger import get_logger
+from utils.offline import is_offline
+
+logger = get_logger("Daemon")
+
+AGILE_SLOT_S = 1800
+REPORT_TIMEOUT_S = 60
+
+
+def _iso(t):
+    return datetime.fromtimestamp(t, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class TickScheduler:
+    def __init__(self, tick, interval_s=AGILE_SLOT_S, offset_s=0, max_ticks=None, clock=time.time):
+        # tick(scheduled_at) runs one pipeline tick for that boundary (unix seconds) and may
+        # return {"agents_s": ...}, the agents' own share of it, for overhead accounting
+        self.tick = tick
+        self.interval_s = interval_s
+        self.offset_s = offset_s
+        self.max_ticks = max_ticks
+        self.clock = clock
+        self.stats = {"ticks": 0, "errors": 0, "skipped": 0}
+        self.started_at = None
+        self.next_due = None
+        self.last_scheduled = None
+        self.last_finished = None
+        self.last_error = None
+        self.in_tick = False
+        self._stop = threading.Event()
+
+    def next_boundary(self, t):
+        # First boundary strictly after t
+        return ((t - self.offset_s) // self.interval_s + 1) * self.interval_s + self.offset_s
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set() or (self.max_ticks is not None and self.stats["ticks"] >= self.max_ticks)
+
+    def run_forever(self):
+        self.started_at = self.clock()
+        self.next_due = self.next_boundary(self.started_at)
+        logger.info(f"Scheduler started; first tick at {_iso(self.next_due)}, every {self.interval_s}s")
+        while not self.stopped:
+            delay = self.next_due - self.clock()
+            if delay > 0:
+                # Re-check after waking: stop() wakes us early, and clocks can jump
+                self._stop.wait(delay)
+                continue
+
+            # Boundaries that passed while we were busy are skipped, not replayed
+            missed = int((self.clock() - self.next_due) // self.interval_s)
+            latest = self.next_due + missed * self.interval_s
+            if missed:
+                self.stats["skipped"] += missed
+                REGISTRY.inc("daemon_ticks_skipped_total", missed)
+                logger.warning(f"Skipped {missed} missed tick(s) before {_iso(latest)}")
+            self._run_tick(latest)
+            self.next_due = latest + self.interval_s
+        logger.info("Scheduler stopped")
+
+    def _run_tick(self, scheduled_at):
+        self.in_tick = True
+        lag = self.clock() - scheduled_at
+        start = time.perf_counter()
+        ctx = None
+        try:
+            ctx = self.tick(scheduled_at)
+            self.last_error = None
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.last_error = repr(e)
+            REGISTRY.inc("daemon_tick_errors_total")
+            logger.error(f"Tick for {_iso(scheduled_at)} failed: {e}")
+        finally:
+            self.in_tick = False
+        elapsed = time.perf_counter() - start
+
+        self.stats["ticks"] += 1
+        self.last_scheduled = scheduled_at
+        self.last_finished = self.clock()
+        REGISTRY.observe("daemon_tick_seconds", elapsed)
+        REGISTRY.observe("daemon_wakeup_lag_seconds", max(0.0, lag))
+        if isinstance(ctx, dict) and "agents_s" in ctx:
+            REGISTRY.observe("daemon_tick_overhead_seconds", max(0.0, elapsed - ctx["agents_s"]))
+
+    def health(self):
+        now = self.clock()
+        # Healthy while ticks keep landing: the last one (or start-up) is no older than two intervals
+        reference = self.last_finished or self.started_at or now
+        if now - reference > 2 * self.interval_s + 60:
+            status = "stalled"
+        elif self.last_error:
+            status = "degraded"
+        else:
+            status = "ok"
+        return {
+            "status": status,
+            "in_tick": self.in_tick,
+            "last_tick": _iso(self.last_scheduled) if self.last_scheduled else None,
+            "last_error": self.last_error,
+            "next_tick": _iso(self.next_due) if self.next_due else None,
+            "interval_s": self.interval_s,
+            **self.stats,
+        }
+
+
+def coordinator_tick(coordinator, results=None):
+    # Tick callable for a CoordinatorAgent; the agents' share is the longest dependency
+    # chain of their run times, everything else in the tick is overhead.
+    # With a ResultsServer, each tick's result is published for readers, and
+    # republished once the advisor's report is ready.
+    site = coordinator.optimizer.site_id
+    # The readings history the forecaster's state is caught up from is synced here,
+    # after each tick, instead of inside ForecastAgent's run
+    syncing = threading.Lock()
+
+    def sync_history():
+        from services.energy_cache import get_energy_cache
+
+        try:
+            get_energy_cache().sync()
+        except Exception as e:
+            logger.warning(f"Energy history sync failed: {e}")
+        finally:
+            syncing.release()
+
+    def tick(scheduled_at):
+        ctx = coordinator.run({"scheduled_at": _iso(scheduled_at)})
+        timings = ctx.get("timings_ms", {})
+        logger.info(f"Tick {_iso(scheduled_at)}: {ctx.get('decision')} "
+                    f"(expected cost {ctx.get('expected_cost')}, {timings.get('tick')} ms)")
+        if results is not None:
+            results.publish(site, ctx, tick=_iso(scheduled_at), status=coordinator.status())
+            if ctx.get("report_status") == "pending":
+                threading.Thread(target=publish_report, args=(scheduled_at, dict(ctx)), daemon=True).start()
+        if not is_offline() and syncing.acquire(blocking=False):
+            threading.Thread(target=sync_history, name="HistorySync", daemon=True).start()
+        return {"agents_s": coordinator.graph.critical_path_ms(timings) / 1000}
+
+    def publish_report(scheduled_at, ctx):
+        coordinator.attach_report(ctx, timeout=REPORT_TIMEOUT_S)
+        if ctx.get("report_status") == "ready":
+            results.publish(site, ctx, tick=_iso(scheduled_at), status=coordinator.status())
+
+    return tick
+
+
+class HealthServer:
+    # /healthz (JSON; 503 once ticks have stalled) and /metrics (Prometheus text) on a background thread
+    def __init__(self, scheduler, port, host="0.0.0.0"):
+        scheduler_ref = scheduler
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/healthz":
+                    health = scheduler_ref.health()
+                    body = json.dumps(health).encode()
+                    self._reply(503 if health["status"] == "stalled" else 200, "application/json", body)
+                elif self.path == "/metrics":
+                    self._reply(200, "text/plain; version=0.0.4", REGISTRY.to_prometheus().encode())
+                else:
+                    self._reply(404, "text/plain", b"not found")
+
+            def _reply(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="HealthServer", daemon=True)
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def shutdown(coordinator):
+    # Release what the agents hold; queued readings are written before exit and
+    # the battery state is checkpointed
+    from services.ingestion import get_ingestion_writer
+
+    coordinator.graph.shutdown()
+    if coordinator.sensor.stream is not None:
+        coordinator.sensor.stream.stop()
+    get_ingestion_writer().flush()
+    coordinator.optimizer.state_store.checkpoint()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run GreenGrid ticks on wall-clock boundaries")
+    parser.add_argument("--interval", type=float, default=AGILE_SLOT_S, help="seconds between ticks")
+    parser.add_argument("--offset", type=float, default=0, help="seconds after each boundary to tick")
+    parser.add_argument("--health-port", type=int, default=int(os.environ.get("GREENGRID_HEALTH_PORT", 8080)),
+                        help="0 disables the health endpoint")
+    parser.add_argument("--results-port", type=int, default=int(os.environ.get("GREENGRID_RESULTS_PORT", 8081)),
+                        help="port of the results API for dashboards; 0 disables it")
+    parser.add_argument("--ticks", type=int, help="exit after this many ticks")
+    parser.add_argument("--optimizer-mode", choices=("greedy", "schedule"),
+                        default=os.environ.get("GREENGRID_OPTIMIZER_MODE"),
+                        help="greedy hourly decisions (default) or a receding-horizon schedule")
+    args = parser.parse_args(argv)
+
+    from agents.coordinator_agent import CoordinatorAgent
+
+    coordinator = CoordinatorAgent(optimizer_mode=args.optimizer_mode)
+    results = None
+    if args.results_port:
+        from services.results_api import ResultsServer
+
+        try:
+            results = ResultsServer(port=args.results_port).start()
+        except OSError as e:
+            parser.error(f"results API can't listen on port {args.results_port}: {e}")
+        logger.info(f"Results API on :{results.port}/results/{coordinator.optimizer.site_id}")
+    scheduler = TickScheduler(
+        coordinator_tick(coordinator, results), interval_s=args.interval, offset_s=args.offset,
+        max_ticks=args.ticks,
+    )
+    health = HealthServer(scheduler, args.health_port).start() if args.health_port else None
+    if health:
+        logger.info(f"Health endpoint on :{health.port}/healthz")
+
+    def handle_signal(signum, frame):
+        logger.info(f"Received signal {signum}; finishing the current tick")
+        scheduler.stop()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    try:
+        scheduler.run_forever()
+    finally:
+        if health:
+            health.stop()
+        if results:
+            results.stop()
+        shutdown(coordinator)
+    return scheduler
+
+
+if __name__ == "__main__":
+    main()
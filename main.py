@@ -2,10 +2,25 @@
 from agents.coordinator_agent import CoordinatorAgent
 
 if __name__ == '__main__':
+    # Bring the local readings cache up to date first: the forecaster's site state is
+    # caught up from it (offline, the cache has no BigQuery to sync from)
+    from services.energy_cache import get_energy_cache
+    try:
+        get_energy_cache().sync()
+    except Exception as e:
+        print(f"⚠️ Energy history sync failed: {e}")
     coordinator = CoordinatorAgent()
     result = coordinator.run({})
+    # The numeric result is ready immediately; wait for the advisor report before printing
+    coordinator.attach_report(result, timeout=60)
         # ✅ Round numeric values before printing
-    result["forecast"]["predicted_consumption_kWh"] = round(result["forecast"]["predicted_consumption_kWh"], 2)
-    result["forecast"]["predicted_solar_kWh"] = round(result["forecast"]["predicted_solar_kWh"], 2)
-    result["expected_cost"] = round(result["expected_cost"], 2)
+    # A failed or timed-out agent leaves its keys out (see coordinator.graph.last_errors)
+    forecast = result.get("forecast")
+    if forecast:
+        forecast["predicted_consumption_kWh"] = round(forecast["predicted_consumption_kWh"], 2)
+        forecast["predicted_solar_kWh"] = round(forecast["predicted_solar_kWh"], 2)
+    if "expected_cost" in result:
+        result["expected_cost"] = round(result["expected_cost"], 2)
+    if coordinator.graph.last_errors:
+        print("\n[GreenGrid.AI Errors]", coordinator.graph.last_errors)
     print("\n[GreenGrid.AI Result]", result)
\ No newline at end of file
@@ -0,0 +1,339 @@
+# services/battery_state.py
+# Durable per-site battery state shared by every process on the host.
+#
+# A flat file of fixed-width records (one per site ID) mapped into memory, so
+# reading or updating a site's state of charge is an O(1) memory access with no
+# database round trip:
+#
+#   header (64 bytes): magic, version, record size, record count
+#   record (32 bytes): seq, soc_kWh, capacity_kWh, updated_at
+#
+# seq is a per-record sequence lock: writers (serialized per record with a
+# byte-range file lock) make it odd, write the fields, then make it even again;
+# readers copy the record and retry if seq was odd or changed underneath them.
+# A record left odd means its writer died mid-update; on open it is restored
+# from the last checkpoint, a full copy written next to the file and renamed
+# into place, so a crash never leaves a half-written checkpoint either.
+# Checkpoints are taken by a background thread, never inside a write.
+#
+# Record IDs are per file: single-site agents use STATE_PATH, fleets
+# (services.fleet_runner) their own FLEET_STATE_PATH, so fleet site 0 and the
+# daemon's site 0 never share a record.
+
+import fcntl
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from utils.logger import get_logger
+
+logger = get_logger("BatteryState")
+
+STATE_PATH = os.environ.get("GREENGRID_BATTERY_STATE", ".battery_state.bin")
+FLEET_STATE_PATH = os.environ.get("GREENGRID_FLEET_BATTERY_STATE", ".fleet_battery_state.bin")
+MAGIC = b"GGBATT01"
+HEADER = np.dtype([("magic", "S8"), ("version", "<u4"), ("record_size", "<u4"), ("n_records", "<u8")])
+HEADER_SIZE = 64
+RECORD = np.dtype([("seq", "<u8"), ("soc_kWh", "<f8"), ("capacity_kWh", "<f8"), ("updated_at", "<f8")])
+VERSION = 1
+# Sites the file is sized for up front; it grows (doubling) past that
+INITIAL_RECORDS = 1024
+# Reader retries on an odd seq before checking for a dead writer
+SPINS_BEFORE_REPAIR = 10_000
+
+
+def _as_dict(record):
+    if record["seq"] == 0:
+        return None
+    return {"soc_kWh": float(record["soc_kWh"]), "capacity_kWh": float(record["capacity_kWh"]),
+            "updated_at": float(record["updated_at"])}
+
+
+class BatteryStateStore:
+    def __init__(self, path=STATE_PATH, n_records=INITIAL_RECORDS, checkpoint_interval_s=300):
+        self.path = path
+        self.checkpoint_path = f"{path}.ckpt"
+        self.checkpoint_interval_s = checkpoint_interval_s
+        # fcntl locks are per process; this one serializes the threads inside it
+        self._lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        self._dirty = False
+        self._checkpointer = None  # (pid, thread): a forked child starts its own
+        self._closed = threading.Event()
+        if not self._valid(path):
+            self._restore_or_create(n_records)
+        self._fd = os.open(path, os.O_RDWR)
+        self._map()
+        self._recover()
+
+    # -- file layout -------------------------------------------------------
+
+    @staticmethod
+    def _valid(path):
+        try:
+            header = np.fromfile(path, dtype=HEADER, count=1)
+        except (OSError, ValueError):
+            return False
+        if len(header) != 1 or header["magic"][0] != MAGIC or header["record_size"][0] != RECORD.itemsize:
+            return False
+        return os.path.getsize(path) >= HEADER_SIZE + int(header["n_records"][0]) * RECORD.itemsize
+
+    def _restore_or_create(self, n_records):
+        if self._valid(self.checkpoint_path):
+            logger.warning(f"{self.path} is missing or damaged; restoring the last checkpoint")
+            with open(self.checkpoint_path, "rb") as f:
+                self._write_atomic(self.path, f.read())
+            return
+        header = np.zeros(1, dtype=HEADER)
+        header[0] = (MAGIC, VERSION, RECORD.itemsize, n_records)
+        blob = header.tobytes().ljust(HEADER_SIZE, b"\0") + bytes(n_records * RECORD.itemsize)
+        self._write_atomic(self.path, blob)
+
+    @staticmethod
+    def _write_atomic(path, blob):
+        tmp = f"{path}.tmp.{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    def _map(self):
+        header = np.memmap(self.path, dtype=HEADER, mode="r+", shape=(1,))
+        self._header = header
+        self.records = np.memmap(self.path, dtype=RECORD, mode="r+", offset=HEADER_SIZE,
+                                 shape=(int(header["n_records"][0]),))
+
+    def _ensure(self, site):
+        # Remap if another process grew the file, grow it ourselves if still too small
+        if site < len(self.records):
+            return
+        if site < int(self._header["n_records"][0]):
+            self._map()
+            return
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, HEADER_SIZE, 0)
+        try:
+            n_records = int(self._header["n_records"][0])
+            if site >= n_records:
+                n_records = max(2 * n_records, site + 1)
+                os.ftruncate(self._fd, HEADER_SIZE + n_records * RECORD.itemsize)
+                self._header["n_records"][0] = n_records
+                self._header.flush()
+            self._map()
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, HEADER_SIZE, 0)
+
+    def _recover(self):
+        # Records left odd by a writer that died mid-update
+        for site in np.flatnonzero(self.records["seq"] % 2 == 1):
+            self._repair(int(site))
+        self.records.flush()
+
+    def _repair(self, site):
+        # Once we hold the record lock a live writer has finished, so an odd seq
+        # means a dead one; its record comes back from the checkpoint
+        with self._locked(site):
+            if self.records["seq"][site] % 2 == 1:
+                self._restore(site)
+
+    def _restore(self, site):
+        logger.warning(f"Battery record {site} was left mid-update; restoring it from the checkpoint")
+        seq = self.records["seq"][site] + 1
+        saved = None
+        if self._valid(self.checkpoint_path):
+            checkpoint = np.memmap(self.checkpoint_path, dtype=RECORD, mode="r", offset=HEADER_SIZE)
+            if site < len(checkpoint) and checkpoint["seq"][site] > 0:
+                saved = checkpoint[site]
+        if saved is None:
+            # Never checkpointed: forget the site, readers fall back to their default
+            self.records[site] = (0, 0.0, 0.0, 0.0)
+        else:
+            self.records[site] = (seq, saved["soc_kWh"], saved["capacity_kWh"], saved["updated_at"])
+
+    @contextmanager
+    def _locked(self, site, count=1):
+        offset = HEADER_SIZE + site * RECORD.itemsize
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, count * RECORD.itemsize, offset)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, count * RECORD.itemsize, offset)
+
+    # -- records -----------------------------------------------------------
+
+    def get(self, site):
+        # {"soc_kWh", "capacity_kWh", "updated_at"} for the site, None if it was never written
+        if site >= len(self.records):
+            if site >= int(self._header["n_records"][0]):
+                return None
+            self._map()
+        records = self.records
+        spins = 0
+        while True:
+            seq = records["seq"][site]
+            if seq % 2 == 0:
+                record = records[site].copy()
+                if records["seq"][site] == seq:
+                    break
+            spins += 1
+            if spins % SPINS_BEFORE_REPAIR == 0:
+                self._repair(site)
+        return _as_dict(record)
+
+    def soc(self, site, default=None):
+        record = self.get(site)
+        return default if record is None else record["soc_kWh"]
+
+    def set(self, site, soc_kWh, capacity_kWh=None):
+        self.update(site, lambda record: (soc_kWh, capacity_kWh if capacity_kWh is not None
+                                          else (record or {}).get("capacity_kWh", 0.0)))
+
+    def update(self, site, change):
+        # Atomic read-modify-write: change(record or None) -> (soc_kWh, capacity_kWh)
+        self._ensure(site)
+        with self._locked(site):
+            records = self.records
+            if records["seq"][site] % 2 == 1:
+                self._restore(site)
+            soc_kWh, capacity_kWh = change(_as_dict(records[site]))
+            seq = records["seq"][site]
+            records["seq"][site] = seq + 1
+            records["soc_kWh"][site] = soc_kWh
+            records["capacity_kWh"][site] = capacity_kWh
+            records["updated_at"][site] = time.time()
+            records["seq"][site] = seq + 2
+        self._written()
+        return soc_kWh
+
+    def soc_many(self, sites, default=np.nan):
+        # Vectorized read for a fleet; not sequence-checked, so a site being written
+        # at that instant may read its old or new value
+        sites = np.asarray(sites, dtype=np.int64)
+        if len(sites) and sites.max() >= len(self.records):
+            self._map()
+        soc = np.full(len(sites), default, dtype=np.float64)
+        known = sites < len(self.records)
+        records = self.records[sites[known]]
+        soc[known] = np.where(records["seq"] > 0, records["soc_kWh"], default)
+        return soc
+
+    def set_many(self, sites, soc_kWh, capacity_kWh):
+        # Vectorized write for a fleet: one range lock over the sites instead of one per record
+        sites = np.asarray(sites, dtype=np.int64)
+        if not len(sites):
+            return
+        self._ensure(int(sites.max()))
+        lo, hi = int(sites.min()), int(sites.max()) + 1
+        with self._locked(lo, hi - lo):
+            records = self.records
+            seq = records["seq"][sites] | 1  # odd (or torn) -> odd
+            records["seq"][sites] = seq
+            records["soc_kWh"][sites] = soc_kWh
+            records["capacity_kWh"][sites] = capacity_kWh
+            records["updated_at"][sites] = time.time()
+            records["seq"][sites] = seq + 1
+        self._written()
+
+    # -- durability --------------------------------------------------------
+
+    def _written(self):
+        # Writes only mark the store dirty; the checkpoint thread (started on the
+        # first write in this process) picks that up every checkpoint_interval_s
+        self._dirty = True
+        with self._lock:
+            if self._checkpointer is None or self._checkpointer[0] != os.getpid():
+                thread = threading.Thread(target=self._checkpoint_loop, name="BatteryCheckpoint", daemon=True)
+                self._checkpointer = (os.getpid(), thread)
+                thread.start()
+
+    def _checkpoint_loop(self):
+        while not self._closed.wait(self.checkpoint_interval_s):
+            if self._dirty:
+                try:
+                    self.checkpoint()
+                except Exception as e:
+                    logger.warning(f"Battery state checkpoint failed: {e}")
+
+    def checkpoint(self):
+        # Consistent copy of every record, fsynced and renamed over the previous checkpoint
+        with self._checkpoint_lock:
+            self._dirty = False
+            records = np.array(self.records)
+            for site in np.flatnonzero(records["seq"] % 2 == 1):
+                # Mid-update while copying: take the settled value instead
+                record = self.get(site)
+                records[site] = (records["seq"][site] + 1, record["soc_kWh"], record["capacity_kWh"],
+                                 record["updated_at"]) if record else (0, 0.0, 0.0, 0.0)
+            header = np.array(self._header)
+            header["n_records"] = len(records)
+            self._write_atomic(self.checkpoint_path, header.tobytes().ljust(HEADER_SIZE, b"\0") + records.tobytes())
+
+    def flush(self):
+        self.records.flush()
+
+    def close(self):
+        self._closed.set()
+        if self._checkpointer is not None and self._checkpointer[0] == os.getpid():
+            self._checkpointer[1].join()
+        self.flush()
+        self.checkpoint()
+        os.close(self._fd)
+
+
+class ReadOnlyStateStore:
+    # A store's records without write access, for processes that only preview the
+    # pipeline (the dashboard's local fallback): update() works out the new state
+    # of charge from the stored record and returns it, but nothing is written
+    def __init__(self, store):
+        self.store = store
+        self.path = store.path
+
+    def get(self, site):
+        return self.store.get(site)
+
+    def soc(self, site, default=None):
+        return self.store.soc(site, default)
+
+    def soc_many(self, sites, default=np.nan):
+        return self.store.soc_many(sites, default)
+
+    def set(self, site, soc_kWh, capacity_kWh=None):
+        pass
+
+    def update(self, site, change):
+        return change(self.store.get(site))[0]
+
+    def set_many(self, sites, soc_kWh, capacity_kWh):
+        pass
+
+    def checkpoint(self):
+        pass
+
+    def flush(self):
+        pass
+
+
+_stores = {}
+_store_lock = threading.Lock()
+
+
+def get_battery_state_store(path=STATE_PATH):
+    # One mapping per file per process
+    with _store_lock:
+        if path not in _stores:
+            _stores[path] = BatteryStateStore(path)
+        return _stores[path]
+
+
+def get_fleet_state_store():
+    # Battery state for FleetRunner sites, kept apart from the single-site store
+    return get_battery_state_store(FLEET_STATE_PATH)
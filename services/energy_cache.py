@@ -0,0 +1,193 @@
+# services/energy_cache.py
+# Local, incrementally synced copy of the BigQuery energy_readings table.
+#
+# Rows live in a SQLite file (WAL mode) so every dashboard session and worker
+# process on the host shares one cache. A sync only pulls rows newer than the
+# newest cached timestamp (less an overlap window, for rows that reach BigQuery
+# late), and at most once per min_sync_interval across all sessions; reads are
+# served locally with just the requested columns.
+
+import hashlib
+import os
+import sqlite3
+import numpy as np
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+CACHE_PATH = os.environ.get("GREENGRID_ENERGY_CACHE", ".energy_cache.sqlite")
+COLUMNS = (
+    "timestamp", "consumption_kWh", "solar_generation_kWh", "predicted_consumption_kWh",
+    "predicted_solar_kWh", "price_kWh", "expected_cost", "decision",
+)
+# How far back the first sync reaches
+BACKFILL_DAYS = 365
+# Each sync re-reads this much before the newest cached row: batched, spilled and
+# replayed ingestion (services.ingestion) lands rows in BigQuery after newer ones.
+# Re-read rows are dropped by their row_key.
+SYNC_OVERLAP_S = 24 * 3600
+
+
+def _to_epoch(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    return float(value)
+
+
+def _row_key(values):
+    # Identity of a reading row; the table has no ID, so it's the row's content
+    return hashlib.blake2b(repr(values).encode(), digest_size=12).hexdigest()
+
+
+class EnergyCache:
+    def __init__(self, path=CACHE_PATH, fetch=None, min_sync_interval=60, overlap_s=SYNC_OVERLAP_S):
+        # fetch(since: datetime, columns) -> iterable of row dicts newer than since
+        self.path = path
+        self.fetch = fetch
+        self.min_sync_interval = min_sync_interval
+        self.overlap_s = overlap_s
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(readings)")]
+            if columns and "row_key" not in columns:
+                # Cache from before row keys: rebuild it from BigQuery
+                conn.execute("DROP TABLE readings")
+                conn.execute("DELETE FROM meta WHERE key = 'last_sync'")
+            value_columns = ", ".join(
+                f"{name} {'TEXT' if name == 'decision' else 'REAL'}" for name in COLUMNS[1:]
+            )
+            conn.execute(f"CREATE TABLE IF NOT EXISTS readings "
+                         f"(timestamp REAL NOT NULL, {value_columns}, row_key TEXT NOT NULL UNIQUE)")
+            conn.execute("CREATE INDEX IF NOT EXISTS readings_timestamp ON readings (timestamp)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL)")
+
+    def _connect(self):
+        # One connection per thread; Streamlit serves sessions from several threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def last_timestamp(self):
+        row = self._connect().execute("SELECT MAX(timestamp) FROM readings").fetchone()
+        return row[0]
+
+    def _set_last_sync(self, conn, value):
+        if value is None:
+            conn.execute("DELETE FROM meta WHERE key = 'last_sync'")
+        else:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_sync', ?)", (value,))
+
+    def sync(self, force=False):
+        if self.fetch is None:
+            return 0
+        conn = self._connect()
+        # Claim the sync under the write lock: concurrent sessions see the claimed
+        # sync time and skip. The lock is released for the (slow) fetch and only
+        # taken again for the insert.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'last_sync'").fetchone()
+            if not force and row and time.time() - row[0] < self.min_sync_interval:
+                conn.rollback()
+                return 0
+            previous = row[0] if row else None
+            self._set_last_sync(conn, time.time())
+            last = self.last_timestamp()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        since = (datetime.fromtimestamp(last - self.overlap_s, timezone.utc) if last is not None
+                 else datetime.now(timezone.utc) - timedelta(days=BACKFILL_DAYS))
+        try:
+            rows = []
+            for r in self.fetch(since, COLUMNS):
+                values = tuple([_to_epoch(r["timestamp"])] + [r.get(name) for name in COLUMNS[1:]])
+                rows.append(values + (_row_key(values),))
+        except Exception:
+            # Give the claim back so the next caller retries straight away
+            with conn:
+                self._set_last_sync(conn, previous)
+            raise
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            placeholders = ", ".join("?" for _ in range(len(COLUMNS) + 1))
+            before = conn.total_changes
+            conn.executemany(f"INSERT OR IGNORE INTO readings ({', '.join(COLUMNS)}, row_key) "
+                             f"VALUES ({placeholders})", rows)
+            added = conn.total_changes - before
+            self._set_last_sync(conn, time.time())
+            conn.commit()
+            return added
+        except Exception:
+            conn.rollback()
+            raise
+
+    def query(self, days=30, limit=100, columns=None):
+        columns = [c for c in (columns or COLUMNS) if c in COLUMNS]
+        if "timestamp" not in columns:
+            columns = ["timestamp"] + columns
+        start = time.time() - days * 86400
+        cursor = self._connect().execute(
+            f"SELECT {', '.join(columns)} FROM readings WHERE timestamp >= ? ORDER BY timestamp DESC LIMIT ?",
+            (start, limit),
+        )
+        rows = []
+        for values in cursor:
+            row = dict(zip(columns, values))
+            row["timestamp"] = datetime.fromtimestamp(row["timestamp"], timezone.utc)
+            rows.append(row)
+        return rows
+
+    def aggregate(self, days, bucket_seconds, fields):
+        # GROUP BY fixed-width time buckets inside SQLite; returns numpy columns
+        start = time.time() - days * 86400
+        selects = ["CAST(timestamp / ? AS INTEGER) * ? AS bucket", "COUNT(*)"]
+        for name in fields:
+            selects += [f"SUM({name})", f"AVG({name})", f"MIN({name})", f"MAX({name})"]
+        rows = self._connect().execute(
+            f"SELECT {', '.join(selects)} FROM readings WHERE timestamp >= ? GROUP BY bucket ORDER BY bucket",
+            (bucket_seconds, bucket_seconds, start),
+        ).fetchall()
+        return _series_columns(rows, fields)
+
+
+def _series_columns(rows, fields):
+    # (bucket_epoch, count, sum/mean/min/max per field) rows -> dict of numpy arrays
+    values = np.array(rows, dtype=np.float64).reshape(len(rows), 2 + 4 * len(fields))
+    series = {
+        "bucket_start": values[:, 0].astype("datetime64[s]"),
+        "count": values[:, 1].astype(np.int64),
+    }
+    for i, name in enumerate(fields):
+        base = 2 + 4 * i
+        for j, stat in enumerate(("sum", "mean", "min", "max")):
+            series[f"{name}_{stat}"] = values[:, base + j]
+    return series
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_energy_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            from utils.offline import is_offline
+            if is_offline():
+                # Serve whatever is already cached; never reach BigQuery
+                _cache = EnergyCache()
+            else:
+                from services.energy_data import fetch_energy_rows_since
+                _cache = EnergyCache(fetch=fetch_energy_rows_since)
+        return _cache
@@ -1,5 +1,5 @@
-from google.cloud import bigquery
 import os
+import threading
 from datetime import datetime, timedelta, timezone
 
 # Set service account key file
@@ -12,11 +12,28 @@ DATASET_ID = "energy_data"
 TABLE_ID = "energy_readings"
 TABLE_REF = f"{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}"
 
-# BigQuery client
-client = bigquery.Client(project=PROJECT_ID)
+# BigQuery client, built on first use so importing this module stays cheap
+# (and works without credentials)
+_client = None
+_client_lock = threading.Lock()
 
-# ✅ Insert data using load_table_from_json (BigQuery free-tier friendly)
-def insert_energy_record(
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            from google.cloud import bigquery
+            _client = bigquery.Client(project=PROJECT_ID)
+        return _client
+
+
+def __getattr__(name):
+    # Keeps `from services.energy_data import client` working
+    if name == "client":
+        return get_client()
+    raise AttributeError(name)
+
+def make_energy_record(
     timestamp,
     consumption_kWh,
     solar_generation_kWh,
@@ -26,49 +43,172 @@ def insert_energy_record(
     expected_cost=None,
     decision=None,
 ):
+    # Ensure timestamp is ISO 8601 string (required by BigQuery JSON load)
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.astimezone(timezone.utc).isoformat()
+
+    return {
+        "timestamp": timestamp,
+        "consumption_kWh": consumption_kWh,
+        "solar_generation_kWh": solar_generation_kWh,
+        "predicted_consumption_kWh": predicted_consumption_kWh,
+        "predicted_solar_kWh": predicted_solar_kWh,
+        "price_kWh": price_kWh,
+        "expected_cost": expected_cost,
+        "decision": decision or "No decision"
+    }
+
+
+# ✅ Load a batch of rows in one load job; raises if the job fails
+def load_energy_records(rows):
+    from services.replay import get_recorder
+
+    recorder = get_recorder()
+    if recorder is not None:
+        # Replay never writes; recording still performs the real load
+        recorder.call("bigquery", f"load {TABLE_REF}", {"rows": len(rows)}, lambda: _load(rows), write=True)
+    else:
+        _load(rows)
+
+
+def _load(rows):
+    job = get_client().load_table_from_json(rows, TABLE_REF)
+    job.result()  # Wait for the job to complete
+    if job.errors:
+        raise RuntimeError(f"BigQuery load error: {job.errors}")
+
+
+# Parameterized query -> list of row dicts. parameters: [(name, type, value), ...].
+# Under GREENGRID_REPLAY the rows are recorded, or served from a fixture.
+def _query(query, parameters=()):
+    def live():
+        from google.cloud import bigquery
+
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ScalarQueryParameter(name, kind, value) for name, kind, value in parameters
+        ])
+        return [dict(row) for row in get_client().query(query, job_config=job_config).result()]
+
+    from services.replay import get_recorder
+
+    recorder = get_recorder()
+    if recorder is None:
+        return live()
+    route = " ".join(query.split())
+    return recorder.call("bigquery", route, [list(p) for p in parameters], live)
+
+
+# ✅ Insert data using load_table_from_json (BigQuery free-tier friendly)
+def insert_energy_record(*args, **kwargs):
     try:
-        # Ensure timestamp is ISO 8601 string (required by BigQuery JSON load)
-        if isinstance(timestamp, datetime):
-            timestamp = timestamp.astimezone(timezone.utc).isoformat()
-
-        rows_to_insert = [{
-            "timestamp": timestamp,
-            "consumption_kWh": consumption_kWh,
-            "solar_generation_kWh": solar_generation_kWh,
-            "predicted_consumption_kWh": predicted_consumption_kWh,
-            "predicted_solar_kWh": predicted_solar_kWh,
-            "price_kWh": price_kWh,
-            "expected_cost": expected_cost,
-            "decision": decision or "No decision"
-        }]
-
-        job = client.load_table_from_json(rows_to_insert, TABLE_REF)
-        job.result()  # Wait for the job to complete
-
-        if job.errors:
-            print(f"❌ BigQuery load error: {job.errors}")
-        else:
-            print("✅ Data loaded into BigQuery successfully.")
+        load_energy_records([make_energy_record(*args, **kwargs)])
+        print("✅ Data loaded into BigQuery successfully.")
     except Exception as e:
         print(f"⚠️ Exception during insert: {e}")
 
 
+# ✅ Rows newer than `since`, oldest first (used to sync the local cache)
+def fetch_energy_rows_since(since, columns=None):
+    from services.replay import get_recorder
+    selected = ", ".join(columns) if columns else "*"
+    query = f"""
+        SELECT {selected}
+        FROM `{TABLE_REF}`
+        WHERE timestamp > @since
+        ORDER BY timestamp
+    """
+    rows = _query(query, [("since", "TIMESTAMP", since)])
+    recorder = get_recorder()
+    if recorder is not None and recorder.replaying:
+        # A replayed fixture may have been recorded for an earlier `since`
+        from services.energy_cache import _to_epoch
+        rows = [row for row in rows if _to_epoch(row["timestamp"]) > since.timestamp()]
+    return rows
+
+
+# Bucket widths for get_energy_series, smallest first
+BUCKETS = {"15min": 900, "1h": 3600, "1d": 86400}
+# Meter energy one stored reading covers: SensorAgent's single readings are hourly
+# figures, a streamed meter (services.sensor_stream) stores one row per 30-minute interval
+READING_INTERVAL_S = float(os.environ.get("GREENGRID_READING_INTERVAL_S")
+                           or (1800 if os.environ.get("GREENGRID_SENSOR_SOURCE") else 3600))
+SERIES_FIELDS = ("consumption_kWh", "solar_generation_kWh", "price_kWh", "expected_cost")
+
+
+def _aggregate_bigquery(days, bucket_seconds, fields):
+    # Same aggregation as EnergyCache.aggregate, pushed down to BigQuery
+    from services.energy_cache import _series_columns
+
+    selects = ["UNIX_SECONDS(TIMESTAMP_SECONDS(DIV(UNIX_SECONDS(timestamp), @bucket) * @bucket)) AS bucket", "COUNT(*)"]
+    for name in fields:
+        selects += [f"SUM({name})", f"AVG({name})", f"MIN({name})", f"MAX({name})"]
+    query = f"""
+        SELECT {', '.join(selects)}
+        FROM `{TABLE_REF}`
+        WHERE timestamp >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL @days DAY)
+        GROUP BY bucket
+        ORDER BY bucket
+    """
+    parameters = [("bucket", "INT64", bucket_seconds), ("days", "INT64", days)]
+    rows = [tuple(row.values()) for row in _query(query, parameters)]
+    return _series_columns(rows, fields)
+
+
+# ✅ Pre-bucketed history for charts: {"bucket_start", "count", "<field>_sum/mean/min/max"} numpy arrays
+# bucket is one of BUCKETS; None picks the finest one that stays within max_points.
+# sync=False serves what the local cache already holds, without a BigQuery round trip.
+def get_energy_series(days=30, bucket=None, fields=SERIES_FIELDS, max_points=3000, use_cache=True, sync=True):
+    if bucket is None:
+        bucket = next((name for name, seconds in BUCKETS.items() if days * 86400 / seconds <= max_points), "1d")
+    bucket_seconds = BUCKETS[bucket]
+
+    if use_cache:
+        try:
+            from services.energy_cache import get_energy_cache
+            cache = get_energy_cache()
+            if sync:
+                cache.sync()
+            return cache.aggregate(days, bucket_seconds, fields)
+        except Exception as e:
+            print(f"⚠️ Energy cache unavailable, aggregating in BigQuery: {e}")
+
+    try:
+        return _aggregate_bigquery(days, bucket_seconds, fields)
+    except Exception as e:
+        print(f"⚠️ Exception during BigQuery aggregation: {e}")
+        return None
+
+
+def hourly_kWh(series, field):
+    # Energy per hour from a "1h" get_energy_series: the mean reading scaled to an hour,
+    # so it doesn't depend on how many readings were written (missed or extra ticks)
+    return series[f"{field}_mean"] * (3600 / READING_INTERVAL_S)
+
+
 # ✅ Retrieve energy data for past `days` as list of dicts (for plotting)
-def get_energy_data(days=30, limit=100):
+# Served from the local incremental cache; only `columns` are returned when given.
+def get_energy_data(days=30, limit=100, columns=None, use_cache=True):
+    if use_cache:
+        try:
+            from services.energy_cache import get_energy_cache
+            cache = get_energy_cache()
+            cache.sync()
+            return cache.query(days=days, limit=limit, columns=columns)
+        except Exception as e:
+            print(f"⚠️ Energy cache unavailable, querying BigQuery directly: {e}")
+
     try:
         start_date = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
+        selected = ", ".join(columns) if columns else "*"
 
         query = f"""
-            SELECT *
+            SELECT {selected}
             FROM `{TABLE_REF}`
-            WHERE timestamp >= TIMESTAMP('{start_date}')
+            WHERE timestamp >= TIMESTAMP(@start_date)
             ORDER BY timestamp DESC
-            LIMIT {limit}
+            LIMIT @limit
         """
-        query_job = client.query(query)
-        results = query_job.result()
-
-        return [dict(row) for row in results]
+        return _query(query, [("start_date", "STRING", start_date), ("limit", "INT64", limit)])
     except Exception as e:
         print(f"⚠️ Exception during BigQuery query: {e}")
         return []
@@ -0,0 +1,281 @@
+# services/fleet_runner.py
+# Runs the sensor -> forecast -> optimizer chain for a fleet of sites across a
+# process pool, sidestepping the GIL for the CPU-bound parts.
+#
+# Shared inputs (tariff curve, weather grid, per-site static data) are copied
+# once into a shared-memory block that every worker maps read-only. Per-site
+# state (battery charge, latest meter readings) and the results live in a
+# second, writable block; each worker only writes its own shard's rows. The
+# parent reads the results in place as a PipelineContext, so nothing per site is
+# pickled and to_arrow() shares the same memory.
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from adk.context import COLUMNS, DTYPES, PipelineContext
+from agents.forecast_agent import predict_energy
+from agents.optimizer_agent import SLOT_MINUTES
+from agents.pricing_agent import FALLBACK_PRICE
+from services.battery_state import STATE_PATH
+from utils import battery
+from utils.battery import PENCE_PER_POUND
+
+ALIGNMENT = 64
+# Writable per-site state next to the PipelineContext result columns
+STATE_COLUMNS = ("battery_state_kWh", "meter_consumption_kWh", "meter_solar_kWh")
+OPTIMIZER_FIELDS = (
+    "decision", "battery_action", "battery_charge_kWh", "expected_cost", "net_demand_kWh",
+    "effective_consumption_kWh", "effective_solar_kWh", "net_cost", "savings",
+)
+
+
+class SharedArrays:
+    # Named NumPy arrays packed into one shared-memory block
+    def __init__(self, shm, layout, readonly=False, owner=False):
+        self.shm = shm
+        self.layout = layout
+        self.owner = owner
+        self.arrays = {}
+        for key, dtype, shape, offset in layout:
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            array.flags.writeable = not readonly
+            self.arrays[key] = array
+
+    @staticmethod
+    def _layout(specs):
+        layout, offset = [], 0
+        for key, dtype, shape in specs:
+            dtype = np.dtype(dtype)
+            layout.append((key, dtype.str, tuple(shape), offset))
+            size = int(np.prod(shape)) * dtype.itemsize
+            offset += -(-size // ALIGNMENT) * ALIGNMENT
+        return layout, max(offset, 1)
+
+    @classmethod
+    def create(cls, specs):
+        # specs: [(key, dtype, shape)]; the block is zero-filled
+        layout, size = cls._layout(specs)
+        return cls(shared_memory.SharedMemory(create=True, size=size), layout, owner=True)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        arrays = {key: np.asarray(value) for key, value in arrays.items()}
+        shared = cls.create([(key, value.dtype, value.shape) for key, value in arrays.items()])
+        for key, value in arrays.items():
+            shared.arrays[key][...] = value
+        return shared
+
+    @classmethod
+    def attach(cls, spec, readonly=False):
+        name, layout = spec
+        # Pool workers share the parent's resource tracker, so only the creator's unlink() counts
+        return cls(shared_memory.SharedMemory(name=name), layout, readonly=readonly)
+
+    @property
+    def spec(self):
+        return self.shm.name, self.layout
+
+    def close(self):
+        self.arrays = {}
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# Worker-side mappings, set up once per process by _attach
+_inputs = None
+_state = None
+_schedulers = {}
+_blocks = []
+
+
+def _attach(input_spec, state_spec):
+    global _inputs, _state
+    # The SharedArrays objects are kept alive: dropping one closes its mapping under the views
+    _blocks[:] = [SharedArrays.attach(input_spec, readonly=True), SharedArrays.attach(state_spec)]
+    _inputs, _state = (block.arrays for block in _blocks)
+
+
+def _price_curve(now, n_slots):
+    # p/kWh for the slot containing `now` and the following ones (last price repeated past the
+    # curve; the pricing agent's fallback price when no tariff is published at all)
+    valid_from, published = _inputs["tariff_valid_from"], _inputs["tariff_prices"]
+    i = max(0, int(np.searchsorted(valid_from, now, side="right")) - 1)
+    prices = published[i:i + n_slots]
+    if len(prices) < n_slots:
+        last = published[-1] if len(published) else FALLBACK_PRICE
+        prices = np.concatenate([prices, np.full(n_slots - len(prices), last)])
+    return prices
+
+
+def _run_shard(task):
+    lo, hi, now, mode, horizon_slots = task
+    start = time.perf_counter()
+    sites = slice(lo, hi)
+    out = _state
+
+    # Sensor: the latest meter readings for the shard, as written by the parent
+    out["timestamp"][sites] = np.datetime64(int(now), "s")
+    out["consumption_kWh"][sites] = out["meter_consumption_kWh"][sites]
+    out["solar_generation_kWh"][sites] = out["meter_solar_kWh"][sites]
+
+    # Forecast: the next hour at each site's weather cell
+    hours = _inputs["weather_time"]
+    hour = int(np.clip(np.searchsorted(hours, now, side="right") - 1, 0, len(hours) - 1))
+    location = _inputs["location"][sites]
+    temperature = _inputs["temperature_2m"][location, hour]
+    radiation = _inputs["shortwave_radiation"][location, hour]
+    consumption, solar = predict_energy(temperature, radiation)
+    out["predicted_consumption_kWh"][sites] = consumption
+    out["predicted_solar_kWh"][sites] = solar
+
+    # Optimizer
+    prices = _price_curve(now, horizon_slots)
+    out["price_kWh"][sites] = prices[0]  # p/kWh, as in the agents' context
+    capacity = _inputs["battery_capacity_kWh"][sites]
+    charge = out["battery_state_kWh"][sites]
+    if mode == "schedule":
+        _schedule_shard(sites, location, hour, prices, capacity, charge)
+    else:
+        # Same rule and rounding as FleetOptimizerAgent.step
+        result = battery.simulate(consumption, solar, prices[0] / PENCE_PER_POUND, charge,
+                                  battery_capacity_kWh=capacity)
+        result["expected_cost"] = np.round(result["expected_cost"], 2)
+        for field in OPTIMIZER_FIELDS:
+            out[field][sites] = result[field]
+        out["battery_state_kWh"][sites] = result["battery_charge_kWh"]
+    return lo, hi, time.perf_counter() - start
+
+
+def _schedule_shard(sites, location, hour, prices, capacity, charge):
+    # Receding-horizon plan per site, applied like OptimizerAgent.run_schedule
+    from utils.battery_scheduler import BatteryScheduler
+
+    out = _state
+    n_slots = len(prices)
+    slots_per_hour = 60 // SLOT_MINUTES
+    hours = slice(hour, hour + -(-n_slots // slots_per_hour))
+    consumption, solar = predict_energy(_inputs["temperature_2m"][location, hours],
+                                        _inputs["shortwave_radiation"][location, hours])
+    # Hourly kWh -> per-slot kWh, padded with the last hour past the end of the weather grid
+    consumption = np.repeat(consumption, slots_per_hour, axis=1)[:, :n_slots] / slots_per_hour
+    solar = np.repeat(solar, slots_per_hour, axis=1)[:, :n_slots] / slots_per_hour
+    pad = ((0, 0), (0, n_slots - consumption.shape[1]))
+    consumption = np.pad(consumption, pad, mode="edge")
+    solar = np.pad(solar, pad, mode="edge")
+    prices = prices / PENCE_PER_POUND
+
+    change = np.empty(len(location))
+    net_cost = np.empty(len(location))
+    for k in range(len(location)):
+        # Sites with the same battery share a scheduler, and with it the cached
+        # cost-to-go whenever their horizon inputs match
+        scheduler = _schedulers.get(capacity[k])
+        if scheduler is None:
+            scheduler = _schedulers[capacity[k]] = BatteryScheduler(
+                battery_capacity_kWh=capacity[k], slot_hours=SLOT_MINUTES / 60, feed_in_price=battery.FEED_IN_PRICE,
+            )
+        plan = scheduler.plan(prices, consumption[k], solar[k], charge[k])
+        change[k] = plan["battery_change_kWh"][0]
+        net_cost[k] = plan["cost"][0]
+        out["battery_state_kWh"][sites.start + k] = plan["soc_kWh"][1]
+
+    discharge = change < 0
+    effective_consumption = np.where(discharge, consumption[:, 0] + change * battery.DISCHARGE_EFFICIENCY,
+                                     consumption[:, 0])
+    effective_solar = np.where(discharge, solar[:, 0], solar[:, 0] - change / battery.CHARGE_EFFICIENCY)
+    net_demand = np.maximum(0, effective_consumption - effective_solar)
+    out["decision"][sites] = battery.decide(solar[:, 0], consumption[:, 0], discharge)
+    out["battery_action"][sites] = discharge
+    out["battery_charge_kWh"][sites] = out["battery_state_kWh"][sites]
+    out["expected_cost"][sites] = np.round(net_demand * prices[0], 2)
+    out["net_demand_kWh"][sites] = net_demand
+    out["effective_consumption_kWh"][sites] = effective_consumption
+    out["effective_solar_kWh"][sites] = effective_solar
+    out["net_cost"][sites] = np.round(net_cost, 2)
+
+
+class FleetRunner:
+    """Sharded fleet ticks on a process pool.
+
+    sites:   {"location": int index into the weather grid,
+              "battery_capacity_kWh": float, optional "battery_charge_kWh": initial charge}
+    weather: {"time": (H,) unix seconds, "temperature_2m": (L, H), "shortwave_radiation": (L, H)}
+    tariff:  {"valid_from": (P,) unix seconds, "prices": (P,) p/kWh}
+    """
+
+    def __init__(self, sites, weather, tariff, workers=None, shard_size=None, mode="greedy", horizon_slots=48,
+                 state_store=None):
+        # state_store has to be a fleet store (services.battery_state.get_fleet_state_store):
+        # record i of the single-site one belongs to the daemon's site i
+        if state_store is not None and os.path.abspath(state_store.path) == os.path.abspath(STATE_PATH):
+            raise ValueError(f"fleet sites would overwrite the single-site battery state in {STATE_PATH}; "
+                             f"use get_fleet_state_store()")
+        n_sites = len(sites["location"])
+        self.n_sites = n_sites
+        self.mode = mode
+        self.horizon_slots = horizon_slots
+        self.workers = workers or os.cpu_count() or 1
+        # A few shards per worker so a slow shard doesn't leave the others idle
+        self.shard_size = shard_size or max(1, -(-n_sites // (self.workers * 4)))
+
+        capacity = np.broadcast_to(np.asarray(sites["battery_capacity_kWh"], dtype=np.float64), (n_sites,))
+        self.inputs = SharedArrays.from_arrays({
+            "location": np.asarray(sites["location"], dtype=np.int32),
+            "battery_capacity_kWh": capacity,
+            "weather_time": np.asarray(weather["time"], dtype=np.int64),
+            "temperature_2m": np.asarray(weather["temperature_2m"], dtype=np.float64),
+            "shortwave_radiation": np.asarray(weather["shortwave_radiation"], dtype=np.float64),
+            "tariff_valid_from": np.asarray(tariff["valid_from"], dtype=np.int64),
+            "tariff_prices": np.asarray(tariff["prices"], dtype=np.float64),
+        })
+        self.state = SharedArrays.create(
+            [(field, DTYPES[field], (n_sites,)) for field in COLUMNS]
+            + [(field, np.float64, (n_sites,)) for field in STATE_COLUMNS]
+        )
+        # Site i is record i of the battery state store, when one is given
+        self.state_store = state_store
+        charge = sites.get("battery_charge_kWh", capacity / 2)
+        if state_store is not None:
+            stored = state_store.soc_many(np.arange(n_sites))
+            charge = np.where(np.isnan(stored), charge, stored)
+        self.state.arrays["battery_state_kWh"][:] = charge
+        self.pool = ProcessPoolExecutor(
+            self.workers, initializer=_attach, initargs=(self.inputs.spec, self.state.spec)
+        )
+        self.last_shard_seconds = []
+
+    def set_readings(self, consumption_kWh, solar_kWh):
+        # Latest meter readings for every site, picked up by the next tick's sensor step
+        self.state.arrays["meter_consumption_kWh"][:] = consumption_kWh
+        self.state.arrays["meter_solar_kWh"][:] = solar_kWh
+
+    def run_tick(self, now=None):
+        # One tick over every shard; returns the results in place as a PipelineContext
+        now = time.time() if now is None else now
+        tasks = [(lo, min(lo + self.shard_size, self.n_sites), now, self.mode, self.horizon_slots)
+                 for lo in range(0, self.n_sites, self.shard_size)]
+        self.last_shard_seconds = [elapsed for _, _, elapsed in self.pool.map(_run_shard, tasks)]
+        if self.state_store is not None:
+            self.state_store.set_many(np.arange(self.n_sites), self.state.arrays["battery_state_kWh"],
+                                      self.inputs.arrays["battery_capacity_kWh"])
+        return self.context()
+
+    def context(self):
+        # Views on the shared result block, valid until close()
+        return PipelineContext(self.n_sites, {field: self.state.arrays[field] for field in COLUMNS})
+
+    def close(self):
+        self.pool.shutdown()
+        self.inputs.close()
+        self.state.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,82 @@
+# services/forecast_training.py
+# Trains the consumption/solar forecaster (utils.forecast_model) from the
+# energy_readings history and Open-Meteo weather for the same hours, and writes
+# the model artifact the ForecastAgent loads.
+#
+#   python -m services.forecast_training --days 60
+
+import argparse
+
+import numpy as np
+
+from services.energy_data import get_energy_series, hourly_kWh
+from utils.forecast_model import MODEL_PATH, ForecastModel, replay
+
+# Open-Meteo serves at most this much past weather from the forecast endpoint
+MAX_PAST_DAYS = 92
+
+
+def load_history(days):
+    # Hourly consumption/solar energy on a gap-free grid; hours without readings are NaN
+    series = get_energy_series(days=days, bucket="1h", fields=("consumption_kWh", "solar_generation_kWh"))
+    if series is None or not len(series["bucket_start"]):
+        raise RuntimeError("No energy history available to train on")
+    observed = series["bucket_start"].astype(np.int64)
+    times = np.arange(observed[0], observed[-1] + 3600, 3600, dtype=np.int64)
+    index = (observed - times[0]) // 3600
+    consumption = np.full(len(times), np.nan)
+    solar = np.full(len(times), np.nan)
+    consumption[index] = hourly_kWh(series, "consumption_kWh")
+    solar[index] = hourly_kWh(series, "solar_generation_kWh")
+    return times, consumption, solar
+
+
+def load_weather(times, latitude, longitude, days):
+    # Past hourly temperature/radiation from Open-Meteo, aligned onto `times`
+    from agents.forecast_agent import FORECAST_URL, FORECAST_VARIABLES, OpenMeteoClient, decode_hourly
+
+    params = {
+        "latitude": latitude,
+        "longitude": longitude,
+        "hourly": list(FORECAST_VARIABLES),
+        "past_days": min(days, MAX_PAST_DAYS),
+        "forecast_days": 1,
+        "timezone": "GMT",
+    }
+    weather = decode_hourly(OpenMeteoClient().weather_api(FORECAST_URL, params)[0].Hourly())
+    index = np.clip(np.searchsorted(weather["time"], times), 0, len(weather["time"]) - 1)
+    missing = weather["time"][index] != times
+    temperature = np.where(missing, np.nan, weather["temperature_2m"][index])
+    radiation = np.where(missing, np.nan, weather["shortwave_radiation"][index])
+    return temperature, radiation
+
+
+def train(days=60, alpha=1.0, path=MODEL_PATH, latitude=51.5085, longitude=-0.1257):
+    times, consumption, solar = load_history(days)
+    temperature, radiation = load_weather(times, latitude, longitude, days)
+    # Hours without weather can't be features; treat them like missing readings
+    no_weather = np.isnan(temperature) | np.isnan(radiation)
+    consumption[no_weather] = np.nan
+    solar[no_weather] = np.nan
+    temperature = np.nan_to_num(temperature)
+    radiation = np.nan_to_num(radiation)
+
+    X, Y, _ = replay(times, consumption[None], solar[None], temperature[None], radiation[None])
+    if not len(X):
+        raise RuntimeError("Not enough history to train on (need more than a day of hourly readings)")
+    model = ForecastModel.fit(X, Y, alpha=alpha, metadata={"days": days, "trained_until": int(times[-1])})
+    mae = np.abs(model.predict_features(X) - Y).mean(axis=0)
+    model.metadata.update(train_mae_consumption=round(float(mae[0]), 4), train_mae_solar=round(float(mae[1]), 4))
+    model.save(path)
+    print(f"✅ Trained forecaster on {len(X)} hours, in-sample MAE "
+          f"consumption {mae[0]:.3f} kWh, solar {mae[1]:.3f} kWh -> {path}")
+    return model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the GreenGrid consumption/solar forecaster")
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--alpha", type=float, default=1.0)
+    parser.add_argument("--output", default=MODEL_PATH)
+    args = parser.parse_args()
+    train(days=args.days, alpha=args.alpha, path=args.output)
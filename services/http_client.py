@@ -0,0 +1,178 @@
+# services/http_client.py
+# Shared asyncio HTTP layer for every external data source (Open-Meteo, Octopus).
+#
+# One aiohttp session with pooled keep-alive connections and a per-host
+# connection limit, timeouts, retries with full-jitter exponential backoff,
+# and coalescing: concurrent requests for the same URL + params share one
+# in-flight request. The event loop runs in a background thread so the
+# synchronous agents can call fetch_json / fetch_bytes, while fleet code can
+# fan out with gather() on the same loop without a thread per request.
+
+import asyncio
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from adk.metrics import REGISTRY
+from utils.logger import get_logger
+
+# Statuses worth retrying; everything else >= 400 fails immediately
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+logger = get_logger("HttpClient")
+
+
+class HttpError(Exception):
+    def __init__(self, url, status, body):
+        super().__init__(f"HTTP {status} for {url}: {body[:200]!r}")
+        self.url = url
+        self.status = status
+        self.body = body
+
+
+def _normalize_params(params):
+    # aiohttp wants str values; lists become comma-separated (Open-Meteo style)
+    normalized = {}
+    for key, value in (params or {}).items():
+        if isinstance(value, (list, tuple)):
+            value = ",".join(str(v) for v in value)
+        normalized[key] = str(value)
+    return normalized
+
+
+class AsyncHttpClient:
+    def __init__(self, limit=100, limit_per_host=10, timeout=10.0, retries=3, backoff=0.2, max_backoff=5.0):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._session = None
+        self._inflight = {}
+        self.stats = {"requests": 0, "coalesced": 0, "retries": 0, "errors": 0}
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=30,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def get(self, url, params=None):
+        params = _normalize_params(params)
+        key = (url, tuple(sorted(params.items())))
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._get_with_retry(url, params))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+            REGISTRY.inc("http_coalesced_total", host=urlsplit(url).hostname)
+        # shield: one caller being cancelled must not cancel the shared request
+        return await asyncio.shield(task)
+
+    async def _get_with_retry(self, url, params):
+        # Under GREENGRID_REPLAY the response is recorded, or served from a fixture
+        from services.replay import get_recorder
+
+        recorder = get_recorder()
+        if recorder is None:
+            return await self._fetch(url, params)
+        return await recorder.call_async("http", url, params, lambda: self._fetch(url, params))
+
+    async def _fetch(self, url, params):
+        session = self._get_session()
+        host = urlsplit(url).hostname
+        for attempt in range(self.retries + 1):
+            self.stats["requests"] += 1
+            start = time.perf_counter()
+            try:
+                async with session.get(url, params=params or None) as response:
+                    body = await response.read()
+                    REGISTRY.observe("http_request_seconds", time.perf_counter() - start, host=host)
+                    if response.status < 400:
+                        return body
+                    error = HttpError(url, response.status, body)
+                    if response.status not in RETRY_STATUSES:
+                        raise error
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+
+            if attempt == self.retries:
+                self.stats["errors"] += 1
+                REGISTRY.inc("http_errors_total", host=host)
+                raise error
+            self.stats["retries"] += 1
+            REGISTRY.inc("http_retries_total", host=host)
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+            logger.warning(f"Retrying {url} in {delay:.2f}s after: {error}")
+            await asyncio.sleep(delay)
+
+    async def get_json(self, url, params=None):
+        return json.loads(await self.get(url, params))
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class _LoopThread:
+    # Event loop running forever in a daemon thread
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="HttpClientLoop", daemon=True)
+        self.thread.start()
+
+
+_loop_thread = None
+_client = None
+_lock = threading.Lock()
+
+
+def get_http_client():
+    # (client, loop): the process-wide client and the loop it must be used on
+    global _loop_thread, _client
+    with _lock:
+        if _client is None:
+            _loop_thread = _LoopThread()
+            _client = AsyncHttpClient()
+        return _client, _loop_thread.loop
+
+
+def run_sync(coro, timeout=None):
+    # Run a coroutine on the shared loop from synchronous code
+    _, loop = get_http_client()
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+
+def fetch_bytes(url, params=None, timeout=None):
+    client, _ = get_http_client()
+    return run_sync(client.get(url, params), timeout)
+
+
+def fetch_json(url, params=None, timeout=None):
+    client, _ = get_http_client()
+    return run_sync(client.get_json(url, params), timeout)
+
+
+def fetch_many(requests, timeout=None):
+    # [(url, params), ...] -> bodies (or exceptions) in the same order, fetched concurrently
+    client, _ = get_http_client()
+
+    async def gather():
+        return await asyncio.gather(*(client.get(url, params) for url, params in requests), return_exceptions=True)
+
+    return run_sync(gather(), timeout)
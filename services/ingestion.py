@@ -0,0 +1,209 @@
+# services/ingestion.py
+# Background, batched writer for energy readings.
+#
+# Rows go into a bounded in-memory queue; a worker thread flushes them to a
+# sink as one batch when batch_size rows are waiting or flush_interval seconds
+# have passed. If the sink fails, the batch is spilled to a local JSON-lines
+# file and replayed ahead of the next successful flush.
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+from adk.metrics import REGISTRY
+from utils.logger import get_logger
+from utils.offline import is_offline
+
+logger = get_logger("Ingestion")
+
+# Queued by close() to wake a worker blocked on an empty queue
+_WAKE = object()
+
+
+class BigQuerySink:
+    # One load job per batch
+    def write(self, rows):
+        from services.energy_data import load_energy_records
+        load_energy_records(rows)
+
+
+class JsonlSink:
+    # Local stand-in for BigQuery: appends rows to a JSON-lines file
+    def __init__(self, path="energy_readings.jsonl"):
+        self.path = path
+
+    def write(self, rows):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+
+
+class MemorySink:
+    # Local stand-in that keeps rows in memory; set available=False to simulate an outage
+    def __init__(self):
+        self.rows = []
+        self.batches = 0
+        self.available = True
+
+    def write(self, rows):
+        if not self.available:
+            raise ConnectionError("sink unavailable")
+        self.rows.extend(rows)
+        self.batches += 1
+
+
+class IngestionWriter:
+    def __init__(self, sink, max_queue=10_000, batch_size=500, flush_interval=5.0,
+                 spill_path=".ingest_spill.jsonl"):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stats = {"queued": 0, "written": 0, "batches": 0, "spilled": 0, "replayed": 0}
+        self._flush_lock = threading.Lock()
+        # Guards appends to the spill file against _replay moving it aside
+        self._spill_lock = threading.Lock()
+        # put() runs on caller threads, everything else on the worker
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="IngestionWriter", daemon=True)
+        self._thread.start()
+
+    def put(self, row):
+        # Never blocks the caller: when the queue is full the row goes straight to the spill file
+        try:
+            self.queue.put_nowait(row)
+            self._count(queued=1)
+        except queue.Full:
+            self._spill([row])
+
+    def _drain(self, limit):
+        rows = []
+        while len(rows) < limit:
+            try:
+                row = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not _WAKE:
+                rows.append(row)
+        return rows
+
+    def _loop(self):
+        last_flush = time.monotonic()
+        batch = []
+        while not self._stop.is_set():
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                row = self.queue.get(timeout=timeout)
+                if row is not _WAKE:
+                    batch.append(row)
+                batch.extend(self._drain(self.batch_size - len(batch)))
+            except queue.Empty:
+                pass
+
+            if len(batch) >= self.batch_size or time.monotonic() - last_flush >= self.flush_interval:
+                self._write(batch)
+                batch = []
+                last_flush = time.monotonic()
+
+        # Anything picked up before stop was requested
+        if batch:
+            self._write(batch)
+
+    def _write(self, rows):
+        with self._flush_lock:
+            self._replay()
+            if not rows:
+                return
+            try:
+                self.sink.write(rows)
+                self._count(written=len(rows), batches=1)
+                REGISTRY.inc("ingestion_rows_written_total", len(rows))
+                REGISTRY.set_gauge("ingestion_queue_depth", self.queue.qsize())
+            except Exception as e:
+                logger.warning(f"Sink unavailable ({e}); spilling {len(rows)} rows to {self.spill_path}")
+                self._spill(rows)
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, delta in deltas.items():
+                self.stats[key] += delta
+
+    def _append(self, rows):
+        with self._spill_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+
+    def _spill(self, rows):
+        self._append(rows)
+        self._count(spilled=len(rows))
+        REGISTRY.inc("ingestion_rows_spilled_total", len(rows))
+
+    def _replay(self):
+        # Called with _flush_lock held; re-sends spilled rows once the sink is back.
+        # The spill file is moved aside first, so rows put() spills meanwhile
+        # start a fresh file instead of being removed along with the replayed ones.
+        # A leftover .replaying file is from a run that died mid-replay.
+        pending = f"{self.spill_path}.replaying"
+        if not os.path.exists(pending):
+            with self._spill_lock:
+                if not os.path.exists(self.spill_path):
+                    return
+                os.replace(self.spill_path, pending)
+        with open(pending, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        start = 0
+        try:
+            for start in range(0, len(rows), self.batch_size):
+                self.sink.write(rows[start:start + self.batch_size])
+                self._count(batches=1)
+        except Exception:
+            # Put back only what wasn't written
+            self._append(rows[start:])
+            os.remove(pending)
+            self._count(replayed=start)
+            return
+        os.remove(pending)
+        self._count(replayed=len(rows))
+        logger.info(f"Replayed {len(rows)} spilled rows")
+
+    def flush(self):
+        # Synchronously write everything queued so far
+        while True:
+            rows = self._drain(self.batch_size)
+            self._write(rows)
+            if not rows:
+                break
+
+    def close(self):
+        self._stop.set()
+        try:
+            self.queue.put_nowait(_WAKE)
+        except queue.Full:
+            pass  # the worker isn't waiting on an empty queue
+        self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_ingestion_writer():
+    # Process-wide writer, flushed on interpreter exit.
+    # GREENGRID_INGEST_SINK=local (or offline mode) writes to a local JSON-lines file instead of BigQuery.
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            if os.environ.get("GREENGRID_INGEST_SINK") == "local" or is_offline():
+                sink = JsonlSink()
+            else:
+                sink = BigQuerySink()
+            _writer = IngestionWriter(sink)
+            atexit.register(_writer.close)
+        return _writer
@@ -0,0 +1,265 @@
+# services/replay.py
+# Record/replay of the pipeline's external calls (Open-Meteo and Octopus over
+# HTTP, BigQuery, Gemini), for reproducible benchmarks without the network.
+#
+#   GREENGRID_REPLAY=record   call the real services and save every response
+#   GREENGRID_REPLAY=replay   serve saved responses; nothing leaves the process
+#   GREENGRID_FIXTURES        fixture directory (default "fixtures")
+#   GREENGRID_REPLAY_LATENCY  injected delay on replay: "recorded" (default, the
+#                             latency seen when recording), a number of ms for
+#                             every call, or per kind: "http=80,bigquery=400,gemini=1500"
+#   GREENGRID_REPLAY_JITTER   +/- fraction of random jitter on that delay (seeded)
+#   GREENGRID_REPLAY_STRICT=1 fail on a request that wasn't recorded, instead of
+#                             serving the latest recording of the same route
+#
+# A fixture is one JSON file per distinct request, fixtures/<kind>/<key>.json,
+# keyed by a hash of the request. The route (URL, query text or model name)
+# is the fallback for requests whose parameters change from run to run, like
+# a tariff period_from or a cache sync's "since".
+
+import base64
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from adk.metrics import REGISTRY
+from utils.logger import get_logger
+
+logger = get_logger("Replay")
+
+KINDS = ("http", "bigquery", "gemini")
+DEFAULT_FIXTURE_DIR = "fixtures"
+# Forecasts and tariffs are relative to when they were recorded; older
+# fixtures still replay, but the pipeline may fall back for hours they don't cover
+STALE_AFTER_S = 12 * 3600
+
+
+class FixtureMissing(KeyError):
+    pass
+
+
+def _canonical(request):
+    return json.dumps(request, sort_keys=True, default=str, separators=(",", ":"))
+
+
+def _digest(text):
+    return hashlib.blake2b(text.encode(), digest_size=10).hexdigest()
+
+
+def _encode(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {"bytes": base64.b64encode(bytes(value)).decode()}
+    return {"json": value}
+
+
+def _decode(response):
+    if "bytes" in response:
+        return base64.b64decode(response["bytes"])
+    return response["json"]
+
+
+def parse_latency(spec):
+    # "recorded" -> None (use recorded latency); "50" -> 50 ms for every kind;
+    # "http=80,gemini=1500" -> per kind, unlisted kinds use their recorded latency
+    spec = (spec or "recorded").strip()
+    if spec == "recorded":
+        return {}
+    if "=" not in spec:
+        return {kind: float(spec) / 1000 for kind in KINDS}
+    latency = {}
+    for part in spec.split(","):
+        kind, ms = part.split("=")
+        latency[kind.strip()] = float(ms) / 1000
+    return latency
+
+
+class Recorder:
+    def __init__(self, mode, directory=DEFAULT_FIXTURE_DIR, latency=None, jitter=0.0, strict=False, seed=0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"unknown replay mode {mode!r}")
+        self.mode = mode
+        self.directory = directory
+        # kind -> seconds; kinds not listed sleep for their recorded latency
+        self.latency = latency or {}
+        self.jitter = jitter
+        self.strict = strict
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._fixtures = {}  # (kind, key) -> entry
+        self._routes = {}    # (kind, route) -> latest entry
+        self.stats = {"recorded": 0, "replayed": 0, "route_fallbacks": 0, "missing": 0}
+        if mode == "replay":
+            self._load()
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    def _load(self):
+        for kind in KINDS:
+            folder = os.path.join(self.directory, kind)
+            if not os.path.isdir(folder):
+                continue
+            for name in sorted(os.listdir(folder)):
+                if name.endswith(".json"):
+                    with open(os.path.join(folder, name), encoding="utf-8") as f:
+                        self._index(json.load(f))
+        logger.info(f"Replaying {len(self._fixtures)} fixtures from {self.directory}")
+        if self._fixtures:
+            age = time.time() - min(entry["recorded_at"] for entry in self._fixtures.values())
+            if age > STALE_AFTER_S:
+                logger.warning(f"Oldest fixture was recorded {age / 3600:.0f} h ago; "
+                               f"time-dependent responses (forecasts, tariffs) may no longer cover now")
+
+    def _index(self, entry):
+        self._fixtures[(entry["kind"], entry["key"])] = entry
+        route = (entry["kind"], entry["route"])
+        latest = self._routes.get(route)
+        if latest is None or entry["recorded_at"] >= latest["recorded_at"]:
+            self._routes[route] = entry
+
+    def save(self, kind, route, request, response, elapsed_s):
+        key = _digest(_canonical({"route": route, "request": request}))
+        entry = {
+            "kind": kind, "route": route, "key": key, "request": request,
+            "response": _encode(response), "elapsed_s": round(elapsed_s, 6), "recorded_at": time.time(),
+        }
+        folder = os.path.join(self.directory, kind)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{key}.json")
+        tmp = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, default=str)
+        os.replace(tmp, path)
+        with self._lock:
+            self._index(json.loads(json.dumps(entry, default=str)))
+            self.stats["recorded"] += 1
+        REGISTRY.inc("replay_recorded_total", kind=kind)
+        return entry
+
+    def lookup(self, kind, route, request):
+        key = _digest(_canonical({"route": route, "request": request}))
+        with self._lock:
+            entry = self._fixtures.get((kind, key))
+            if entry is None and not self.strict:
+                entry = self._routes.get((kind, route))
+                if entry is not None:
+                    self.stats["route_fallbacks"] += 1
+            if entry is None:
+                self.stats["missing"] += 1
+                REGISTRY.inc("replay_missing_total", kind=kind)
+                raise FixtureMissing(f"no {kind} fixture for {route} in {self.directory}")
+            self.stats["replayed"] += 1
+        REGISTRY.inc("replay_served_total", kind=kind)
+        return entry
+
+    def delay(self, kind, entry=None):
+        seconds = self.latency.get(kind)
+        if seconds is None:
+            seconds = entry["elapsed_s"] if entry else 0.0
+        if self.jitter:
+            with self._lock:
+                seconds *= 1 + self._random.uniform(-self.jitter, self.jitter)
+        return max(0.0, seconds)
+
+    def call(self, kind, route, request, live, write=False):
+        # live() performs the real call. Writes (BigQuery loads) have nothing to
+        # replay; they only cost their injected latency.
+        if self.replaying:
+            if write:
+                with self._lock:
+                    entry = self._routes.get((kind, route))
+                time.sleep(self.delay(kind, entry))
+                return None
+            entry = self.lookup(kind, route, request)
+            time.sleep(self.delay(kind, entry))
+            return _decode(entry["response"])
+        start = time.perf_counter()
+        response = live()
+        self.save(kind, route, request, None if write else response, time.perf_counter() - start)
+        return response
+
+    async def call_async(self, kind, route, request, live):
+        # Same as call() for coroutines: live() returns an awaitable
+        import asyncio
+
+        if self.replaying:
+            entry = self.lookup(kind, route, request)
+            await asyncio.sleep(self.delay(kind, entry))
+            return _decode(entry["response"])
+        start = time.perf_counter()
+        response = await live()
+        self.save(kind, route, request, response, time.perf_counter() - start)
+        return response
+
+
+class RecordedModel:
+    # Gemini GenerativeModel stand-in that records or replays generate_content();
+    # model is the real model when recording, None when replaying
+    def __init__(self, recorder, model_name, model=None):
+        self.recorder = recorder
+        self.model_name = model_name
+        self.model = model
+
+    def generate_content(self, prompt, **kwargs):
+        def live():
+            response = self.model.generate_content(prompt, **kwargs)
+            usage = getattr(response, "usage_metadata", None)
+            return {
+                "text": response.text,
+                "prompt_token_count": getattr(usage, "prompt_token_count", 0) or 0,
+                "candidates_token_count": getattr(usage, "candidates_token_count", 0) or 0,
+            }
+
+        # Plain-text and JSON responses are separate routes, so a fallback keeps its shape
+        mime = (kwargs.get("generation_config") or {}).get("response_mime_type", "text/plain")
+        request = {"prompt": prompt, **kwargs}
+        return RecordedResponse(self.recorder.call("gemini", f"{self.model_name} {mime}", request, live))
+
+
+class RecordedResponse:
+    def __init__(self, data):
+        self.text = data["text"]
+        self.usage_metadata = _Usage(data.get("prompt_token_count", 0), data.get("candidates_token_count", 0))
+
+
+class _Usage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+_recorder = None
+_recorder_checked = False
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    # The process-wide Recorder from GREENGRID_REPLAY, or None when calls go straight out
+    global _recorder, _recorder_checked
+    if _recorder_checked:
+        return _recorder
+    with _recorder_lock:
+        if not _recorder_checked:
+            mode = os.environ.get("GREENGRID_REPLAY", "").lower()
+            if mode:
+                _recorder = Recorder(
+                    mode,
+                    directory=os.environ.get("GREENGRID_FIXTURES", DEFAULT_FIXTURE_DIR),
+                    latency=parse_latency(os.environ.get("GREENGRID_REPLAY_LATENCY")),
+                    jitter=float(os.environ.get("GREENGRID_REPLAY_JITTER", 0)),
+                    strict=os.environ.get("GREENGRID_REPLAY_STRICT", "").lower() in ("1", "true", "yes"),
+                )
+            _recorder_checked = True
+        return _recorder
+
+
+def set_recorder(recorder):
+    # Install a Recorder (or None) programmatically, e.g. from a benchmark
+    global _recorder, _recorder_checked
+    with _recorder_lock:
+        _recorder = recorder
+        _recorder_checked = True
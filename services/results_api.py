@@ -0,0 +1,214 @@
+# services/results_api.py
+# Read-only HTTP/JSON service for the latest pipeline result per site.
+#
+# The process that runs the pipeline (daemon.py) publishes each tick's result
+# once; it is serialized (and gzipped) a single time into an immutable snapshot
+# with a strong ETag. Every reader gets those bytes as-is, so thousands of
+# dashboards cost one pipeline run per tick plus a memory copy each:
+#
+#   GET /results/<site>                      latest snapshot (404 before the first tick)
+#   GET /results/<site>  If-None-Match: etag 304 while unchanged
+#   GET /results/<site>?wait=30              with If-None-Match: hold the request until
+#                                            the next tick (or 30 s, then 304)
+#   GET /healthz
+#
+# The server runs aiohttp on its own event loop thread; publish() is safe to
+# call from any thread.
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from aiohttp import web
+
+from adk.metrics import REGISTRY
+from utils.logger import get_logger
+
+logger = get_logger("ResultsApi")
+
+RESULTS_URL = os.environ.get("GREENGRID_RESULTS_URL", "http://127.0.0.1:8081")
+# Long polls are capped so idle connections can't pile up forever
+MAX_WAIT_S = 60.0
+# Bodies smaller than this aren't worth compressing
+GZIP_MIN_BYTES = 1024
+
+
+class Snapshot:
+    __slots__ = ("site", "tick", "etag", "body", "gzip_body", "published_at")
+
+    def __init__(self, site, tick, result, status=None):
+        self.site = site
+        self.tick = tick
+        self.published_at = time.time()
+        self.body = json.dumps(
+            {"site": site, "tick": tick, "published_at": self.published_at, "result": result, "status": status},
+            default=str, separators=(",", ":"),
+        ).encode()
+        self.etag = f'"{tick}-{hashlib.blake2b(self.body, digest_size=8).hexdigest()}"'
+        self.gzip_body = gzip.compress(self.body, compresslevel=6) if len(self.body) >= GZIP_MIN_BYTES else None
+
+
+class ResultsServer:
+    def __init__(self, host="127.0.0.1", port=8081, name="ResultsApi"):
+        self.host = host
+        self.port = port
+        self.name = name
+        self.snapshots = {}
+        self.ticks = 0
+        self._changed = {}  # site -> Future resolved by the next publish for that site
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None  # why the server thread failed to start
+
+    # -- publishing (any thread) -------------------------------------------
+
+    def publish(self, site, result, tick=None, status=None):
+        # Serialize once here, in the caller's thread; the loop only swaps the reference.
+        # status: the publisher's agent health (CoordinatorAgent.status()), shown by dashboards
+        self.ticks += 1
+        snapshot = Snapshot(str(site), self.ticks if tick is None else tick, result, status)
+        if self._loop is None:
+            self._swap(snapshot)
+        else:
+            self._loop.call_soon_threadsafe(self._swap, snapshot)
+        REGISTRY.inc("results_published_total")
+        return snapshot
+
+    def _swap(self, snapshot):
+        # On the loop thread (or before start), so handlers never see a half-updated dict
+        self.snapshots[snapshot.site] = snapshot
+        waiter = self._changed.pop(snapshot.site, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(snapshot)
+
+    # -- serving -----------------------------------------------------------
+
+    def _reply(self, request, snapshot):
+        headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+        if request.headers.get("If-None-Match") == snapshot.etag:
+            return web.Response(status=304, headers=headers)
+        if snapshot.gzip_body is not None and "gzip" in request.headers.get("Accept-Encoding", ""):
+            headers["Content-Encoding"] = "gzip"
+            return web.Response(body=snapshot.gzip_body, content_type="application/json", headers=headers)
+        return web.Response(body=snapshot.body, content_type="application/json", headers=headers)
+
+    async def _get_result(self, request):
+        site = request.match_info["site"]
+        snapshot = self.snapshots.get(site)
+        try:
+            wait = min(float(request.query.get("wait", 0)), MAX_WAIT_S)
+        except ValueError:
+            raise web.HTTPBadRequest(text="wait must be a number of seconds")
+
+        # Long poll: hold the request while the client already has the current snapshot
+        if wait > 0 and (snapshot is None or request.headers.get("If-None-Match") == snapshot.etag):
+            waiter = self._changed.get(site)
+            if waiter is None or waiter.done():
+                waiter = self._changed[site] = self._loop.create_future()
+            REGISTRY.inc("results_long_polls_total")
+            try:
+                # shield: one client timing out must not cancel the shared future
+                snapshot = await asyncio.wait_for(asyncio.shield(waiter), wait)
+            except asyncio.TimeoutError:
+                pass
+
+        if snapshot is None:
+            raise web.HTTPNotFound(text=f"no result published for site {site} yet")
+        REGISTRY.inc("results_requests_total")
+        return self._reply(request, snapshot)
+
+    async def _healthz(self, request):
+        return web.json_response({"status": "ok", "sites": len(self.snapshots), "ticks": self.ticks})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/results/{site}", self._get_result)
+        app.router.add_get("/healthz", self._healthz)
+        return app
+
+    def start(self, timeout=10.0):
+        # Raises if the server can't bind (e.g. the port is in use) or doesn't come up in time
+        if self._thread is None:
+            self._error = None
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._thread_main, name=self.name, daemon=True)
+            self._thread.start()
+            if not self._ready.wait(timeout):
+                self.stop()
+                raise TimeoutError(f"{self.name} did not start within {timeout:g}s")
+            if self._error is not None:
+                self._thread.join()
+                self._thread = None
+                raise self._error
+        return self
+
+    def _thread_main(self):
+        loop = self._loop = asyncio.new_event_loop()
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        try:
+            loop.run_until_complete(self._runner.setup())
+            loop.run_until_complete(web.TCPSite(self._runner, self.host, self.port, backlog=4096).start())
+            # Port 0 picks a free port; report the real one
+            self.port = self._runner.addresses[0][1]
+        except Exception as e:
+            self._error = e
+            self._loop = None
+            loop.run_until_complete(self._runner.cleanup())
+            loop.close()
+            return
+        finally:
+            self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(self._runner.cleanup())
+            loop.close()
+
+    def stop(self, timeout=5.0):
+        if self._thread is not None:
+            loop, self._loop = self._loop, None
+            if loop is not None:
+                loop.call_soon_threadsafe(loop.stop)
+            self._thread.join(timeout)
+            self._thread = None
+
+
+class ResultsClient:
+    # Conditional GETs against a ResultsServer; a 304 reuses the cached snapshot
+    def __init__(self, base_url=RESULTS_URL, timeout=5.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._cache = {}  # site -> (etag, decoded snapshot)
+
+    def latest(self, site=0, wait=0):
+        # {"site", "tick", "published_at", "result", "status"}, or None if nothing is published yet.
+        # wait > 0 blocks until a snapshot newer than the cached one arrives (or wait runs out)
+        from urllib.error import HTTPError
+        from urllib.request import Request, urlopen
+
+        site = str(site)
+        cached = self._cache.get(site)
+        url = f"{self.base_url}/results/{site}" + (f"?wait={wait}" if wait else "")
+        request = Request(url, headers={"Accept-Encoding": "gzip"})
+        if cached:
+            request.add_header("If-None-Match", cached[0])
+        try:
+            with urlopen(request, timeout=self.timeout + wait) as response:
+                body = response.read()
+                if response.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                snapshot = json.loads(body)
+                self._cache[site] = (response.headers["ETag"], snapshot)
+                return snapshot
+        except HTTPError as e:
+            if e.code == 304 and cached:
+                return cached[1]
+            if e.code == 404:
+                return None
+            raise
@@ -0,0 +1,423 @@
+# services/sensor_stream.py
+# Streaming meter ingestion.
+#
+# A source (simulator, file tail, TCP socket or MQTT) yields batches of
+# readings on an asyncio loop in a background thread. Each reading is
+# (unix timestamp, consumption kW, solar kW). Batches go into a fixed-size
+# numpy ring buffer that keeps incremental aggregates up to date:
+#   - rolling sums/means over the last `window_s` seconds
+#   - energy (kWh) in the current `interval_s` slot, aligned to the epoch
+#     (30 min by default, the same slots as the Agile tariff)
+# Every update costs O(batch) numpy work with no per-reading Python objects,
+# and snapshot() is O(1), so agents never block on the meter.
+#
+# Line based sources use "timestamp,consumption_kW,solar_kW" per line.
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+
+from adk.metrics import REGISTRY
+from utils.logger import get_logger
+
+logger = get_logger("SensorStream")
+
+FIELDS = 3  # timestamp, consumption_kW, solar_kW
+SECONDS_PER_HOUR = 3600.0
+
+
+def parse_lines(data):
+    # b"ts,c,s\nts,c,s\n" -> (n, 3) float array; malformed lines are skipped
+    # Flattening is only safe when every line has exactly FIELDS values: a short
+    # line followed by a long one would otherwise be spliced into wrong rows
+    buf = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(buf == ord("\n"))
+    if not data.endswith(b"\n"):
+        ends = np.append(ends, len(buf))
+    commas = np.concatenate(([0], np.cumsum(buf == ord(","))))[ends]
+    if len(ends) and (np.diff(commas, prepend=0) == FIELDS - 1).all():
+        try:
+            return np.array(data.replace(b"\n", b",").rstrip(b",").split(b","), dtype=float).reshape(-1, FIELDS)
+        except ValueError:
+            pass
+    rows = []
+    for line in data.splitlines():
+        try:
+            row = [float(v) for v in line.split(b",")]
+        except ValueError:
+            continue
+        if len(row) == FIELDS:
+            rows.append(row)
+    return np.array(rows, dtype=float).reshape(-1, FIELDS)
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class SensorRing:
+    # Fixed-capacity ring of readings with windowed and per-interval aggregates
+    def __init__(self, capacity=65_536, window_s=300.0, interval_s=1800.0, max_gap_s=60.0, keep_intervals=96):
+        self.capacity = capacity
+        self.window_s = window_s
+        self.interval_s = interval_s
+        # A gap longer than this (meter offline) is not integrated into energy
+        self.max_gap_s = max_gap_s
+        self.data = np.zeros((capacity, FIELDS))
+        self._lock = threading.Lock()
+        self._head = 0  # next write position
+        self._size = 0  # readings currently inside the window
+        self._sums = np.zeros(FIELDS - 1)
+        self._evicted_since_resync = 0
+        self._last_ts = None
+        self._interval = None  # start of the current interval
+        self._interval_kWh = np.zeros(FIELDS - 1)
+        self._completed = deque(maxlen=keep_intervals)
+        self.last_interval = None
+        self.stats = {"readings": 0, "batches": 0, "overwritten": 0, "out_of_order": 0}
+
+    def extend(self, batch):
+        # batch: (n, 3) array of timestamp, consumption_kW, solar_kW in time order
+        batch = np.asarray(batch, dtype=float)
+        if batch.ndim != 2 or batch.shape[1] != FIELDS or not len(batch):
+            return
+        with self._lock:
+            batch = self._integrate(batch)
+            self._write(batch[-self.capacity:])
+            self._evict_older_than(self._last_ts - self.window_s)
+            self.stats["readings"] += len(batch)
+            self.stats["batches"] += 1
+
+    def append(self, ts, consumption_kW, solar_kW):
+        self.extend(((ts, consumption_kW, solar_kW),))
+
+    def _integrate(self, batch):
+        ts = batch[:, 0]
+        # Readings must not go back in time; late ones are clamped onto the latest timestamp
+        floor = ts[0] if self._last_ts is None else self._last_ts
+        if ts[0] < floor or (np.diff(ts) < 0).any():
+            self.stats["out_of_order"] += 1
+            ts = np.maximum.accumulate(np.maximum(ts, floor))
+            batch = batch.copy()
+            batch[:, 0] = ts
+        dt = np.diff(ts, prepend=floor)
+        dt[dt > self.max_gap_s] = 0.0
+        # Energy since the previous reading at this reading's power
+        energy = batch[:, 1:] * (dt / SECONDS_PER_HOUR)[:, None]
+
+        slots = np.floor(ts / self.interval_s) * self.interval_s
+        if self._interval is None:
+            self._interval = slots[0]
+        starts = np.flatnonzero(np.diff(slots, prepend=self._interval))
+        if not len(starts):
+            self._interval_kWh += energy.sum(axis=0)
+        else:
+            # Close the running interval, then every interval completed inside this batch
+            self._interval_kWh += energy[:starts[0]].sum(axis=0)
+            self._close_interval()
+            ends = np.append(starts[1:], len(ts))
+            for lo, hi in zip(starts, ends):
+                self._interval = slots[lo]
+                self._interval_kWh = energy[lo:hi].sum(axis=0)
+                if hi < len(ts):
+                    self._close_interval()
+        self._last_ts = ts[-1]
+        return batch
+
+    def _close_interval(self):
+        self.last_interval = {
+            "start": _iso(self._interval),
+            "consumption_kWh": round(float(self._interval_kWh[0]), 6),
+            "solar_generation_kWh": round(float(self._interval_kWh[1]), 6),
+        }
+        self._completed.append(self.last_interval)
+        self._interval_kWh = np.zeros(FIELDS - 1)
+
+    def _write(self, batch):
+        n = len(batch)
+        # Readings about to be overwritten leave the window first
+        overflow = self._size + n - self.capacity
+        if overflow > 0:
+            self._evict(overflow)
+            self.stats["overwritten"] += overflow
+        first = min(n, self.capacity - self._head)
+        self.data[self._head:self._head + first] = batch[:first]
+        self.data[:n - first] = batch[first:]
+        self._head = (self._head + n) % self.capacity
+        self._size += n
+        self._sums += batch[:, 1:].sum(axis=0)
+
+    def _segments(self, count):
+        # The oldest `count` readings as at most two contiguous slices
+        tail = (self._head - self._size) % self.capacity
+        end = tail + count
+        if end <= self.capacity:
+            return (self.data[tail:end],)
+        return self.data[tail:], self.data[:end - self.capacity]
+
+    def _evict(self, count):
+        for segment in self._segments(count):
+            self._sums -= segment[:, 1:].sum(axis=0)
+        self._size -= count
+        self._evicted_since_resync += count
+        # Keep float drift from add/subtract in check: recompute exactly once per
+        # buffer's worth of evictions (amortised O(1) per reading)
+        if self._evicted_since_resync >= self.capacity:
+            self._sums = np.zeros(FIELDS - 1)
+            for segment in self._segments(self._size):
+                self._sums += segment[:, 1:].sum(axis=0)
+            self._evicted_since_resync = 0
+
+    def _evict_older_than(self, cutoff):
+        count = 0
+        for segment in self._segments(self._size):
+            k = int(np.searchsorted(segment[:, 0], cutoff, side="right"))
+            count += k
+            if k < len(segment):
+                break
+        if count:
+            self._evict(count)
+
+    def pop_intervals(self):
+        # Intervals completed since the last call, oldest first
+        with self._lock:
+            intervals = list(self._completed)
+            self._completed.clear()
+        return intervals
+
+    def window(self):
+        # Copy of the readings currently inside the window, oldest first
+        with self._lock:
+            segments = self._segments(self._size)
+            return np.concatenate(segments) if len(segments) > 1 else segments[0].copy()
+
+    def snapshot(self):
+        with self._lock:
+            if self._last_ts is None:
+                return None
+            size = self._size
+            tail = (self._head - size) % self.capacity
+            span = self._last_ts - self.data[tail, 0]
+            sums = self._sums / size if size else self._sums
+            return {
+                "timestamp": _iso(self._last_ts),
+                "window_s": self.window_s,
+                "window_readings": size,
+                "rate_hz": round(float((size - 1) / span), 2) if span > 0 else 0.0,
+                "consumption_kW": round(float(sums[0]), 6),
+                "solar_kW": round(float(sums[1]), 6),
+                "interval_start": _iso(self._interval),
+                "interval_consumption_kWh": round(float(self._interval_kWh[0]), 6),
+                "interval_solar_generation_kWh": round(float(self._interval_kWh[1]), 6),
+                "last_interval": self.last_interval,
+                "readings_total": self.stats["readings"],
+            }
+
+
+class SimulatedMeterSource:
+    # Local stand-in for a smart meter: `rate_hz` readings per second with a
+    # noisy base load and a daylight-shaped solar curve. realtime=False
+    # produces batches as fast as possible on a simulated clock (benchmarks).
+    def __init__(self, rate_hz=10.0, batch_interval=0.1, base_kW=0.6, peak_solar_kW=3.5,
+                 realtime=True, start=None, seed=None):
+        self.rate_hz = rate_hz
+        self.batch_interval = batch_interval
+        self.base_kW = base_kW
+        self.peak_solar_kW = peak_solar_kW
+        self.realtime = realtime
+        self.start = start
+        self.rng = np.random.default_rng(seed)
+
+    def _readings(self, t0, n):
+        batch = np.empty((n, FIELDS))
+        batch[:, 0] = t0 + np.arange(1, n + 1) / self.rate_hz
+        batch[:, 1] = self.base_kW + self.rng.gamma(2.0, 0.25, n)
+        hour = (batch[:, 0] % 86400) / 3600
+        daylight = np.clip(np.sin((hour - 6) / 12 * np.pi), 0, None)
+        batch[:, 2] = self.peak_solar_kW * daylight * self.rng.uniform(0.8, 1.0, n)
+        return batch
+
+    async def batches(self):
+        clock = self.start if self.start is not None else time.time()
+        per_batch = max(1, round(self.rate_hz * self.batch_interval))
+        owed = 0.0
+        while True:
+            if self.realtime:
+                await asyncio.sleep(self.batch_interval)
+                # Emit however many readings are due since the last batch
+                owed += (time.time() - clock) * self.rate_hz
+                n = int(owed)
+                owed -= n
+                if not n:
+                    continue
+            else:
+                n = per_batch
+                await asyncio.sleep(0)
+            batch = self._readings(clock, n)
+            clock = batch[-1, 0]
+            yield batch
+
+
+class _LineSource:
+    # Splits a byte stream into complete lines and parses them in batches
+    def __init__(self):
+        self._partial = b""
+
+    def _parse(self, chunk):
+        data = self._partial + chunk
+        cut = data.rfind(b"\n") + 1
+        self._partial = data[cut:]
+        return parse_lines(data[:cut]) if cut else None
+
+
+class FileTailSource(_LineSource):
+    # Follows a file that a meter gateway appends readings to
+    def __init__(self, path, poll_interval=0.05, from_start=False, chunk_size=1 << 20):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.from_start = from_start
+        self.chunk_size = chunk_size
+
+    async def batches(self):
+        with open(self.path, "rb") as f:
+            if not self.from_start:
+                f.seek(0, os.SEEK_END)
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                batch = self._parse(chunk)
+                if batch is not None and len(batch):
+                    yield batch
+
+
+class SocketSource(_LineSource):
+    # Reads newline-delimited readings from a TCP meter gateway
+    def __init__(self, host, port, chunk_size=1 << 16):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.chunk_size = chunk_size
+
+    async def batches(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            while True:
+                chunk = await reader.read(self.chunk_size)
+                if not chunk:
+                    raise ConnectionError(f"{self.host}:{self.port} closed the connection")
+                batch = self._parse(chunk)
+                if batch is not None and len(batch):
+                    yield batch
+        finally:
+            writer.close()
+
+
+class MqttSource:
+    # Subscribes to an MQTT topic; each message carries one or more reading lines.
+    # Needs the optional aiomqtt package.
+    def __init__(self, host, topic, port=1883):
+        self.host = host
+        self.topic = topic
+        self.port = port
+
+    async def batches(self):
+        import aiomqtt
+
+        async with aiomqtt.Client(self.host, self.port) as client:
+            await client.subscribe(self.topic)
+            async for message in client.messages:
+                batch = parse_lines(bytes(message.payload).rstrip(b"\n") + b"\n")
+                if len(batch):
+                    yield batch
+
+
+class SensorStream:
+    # Runs a source on its own event loop thread and feeds a SensorRing
+    RETRY_INTERVAL_S = 5.0
+
+    def __init__(self, source, ring=None, name="SensorStream"):
+        self.source = source
+        self.ring = ring or SensorRing()
+        self.name = name
+        self.errors = 0
+        self._loop = None
+        self._task = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._thread_main, name=self.name, daemon=True)
+            self._thread.start()
+            self._ready.wait()
+        return self
+
+    def _thread_main(self):
+        self._loop = asyncio.new_event_loop()
+        self._task = self._loop.create_task(self._consume())
+        self._ready.set()
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    async def _consume(self):
+        while True:
+            try:
+                async for batch in self.source.batches():
+                    self.ring.extend(batch)
+                    REGISTRY.inc("sensor_readings_total", len(batch), stream=self.name)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Sources reconnect after a pause (gateway restarts, broker outages)
+                self.errors += 1
+                REGISTRY.inc("sensor_source_errors_total", stream=self.name)
+                logger.warning(f"{self.name} source failed: {e}; retrying in {self.RETRY_INTERVAL_S}s")
+                await asyncio.sleep(self.RETRY_INTERVAL_S)
+
+    def snapshot(self):
+        return self.ring.snapshot()
+
+    def pop_intervals(self):
+        return self.ring.pop_intervals()
+
+    def stop(self, timeout=5.0):
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def source_from_spec(spec):
+    # "sim[:rate_hz]", "file:<path>", "tcp:<host>:<port>", "mqtt:<host>[:port]/<topic>"
+    kind, _, rest = spec.partition(":")
+    if kind == "sim":
+        return SimulatedMeterSource(rate_hz=float(rest or 10))
+    if kind == "file":
+        return FileTailSource(rest)
+    if kind == "tcp":
+        host, _, port = rest.rpartition(":")
+        return SocketSource(host, int(port))
+    if kind == "mqtt":
+        address, _, topic = rest.partition("/")
+        host, _, port = address.partition(":")
+        return MqttSource(host, topic, int(port or 1883))
+    raise ValueError(f"Unknown sensor source: {spec!r}")
+
+
+def stream_from_env():
+    # GREENGRID_SENSOR_SOURCE selects a streaming source for SensorAgent; unset keeps single readings
+    spec = os.environ.get("GREENGRID_SENSOR_SOURCE")
+    return SensorStream(source_from_spec(spec)).start() if spec else None
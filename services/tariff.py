@@ -0,0 +1,204 @@
+# services/tariff.py
+# Shared Octopus Agile tariff store.
+#
+# The whole published unit-rate window is fetched once (following pagination)
+# and kept per (product, region) as sorted numpy arrays, so "price at t" and
+# "next N slots" are binary searches. Octopus publishes the next day's Agile
+# prices once a day (around 16:00 UK time, sometimes later). A curve is fresh
+# while it covers the current slot and, from 16:00 on, reaches into tomorrow;
+# until the new prices show up the store retries every RETRY_INTERVAL_S.
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from utils.logger import get_logger
+from utils.offline import is_offline
+
+API_BASE = "https://api.octopus.energy/v1"
+PRODUCT_CODE = "AGILE-18-02-21"
+REGION = "L"
+UK = ZoneInfo("Europe/London")
+PUBLISH_HOUR_UK = 16
+# Don't go back upstream more often than this while the store is stale
+RETRY_INTERVAL_S = 300
+
+logger = get_logger("TariffStore")
+
+
+def unit_rates_url(product=PRODUCT_CODE, region=REGION):
+    return f"{API_BASE}/products/{product}/electricity-tariffs/E-1R-{product}-{region}/standard-unit-rates/"
+
+
+def coverage_needed(now):
+    # Unix time a fresh curve must reach past at `now`: the current slot, or from
+    # the daily publication hour on, the start of tomorrow (UK time)
+    local = datetime.fromtimestamp(now, UK)
+    if local.hour < PUBLISH_HOUR_UK:
+        return now
+    tomorrow = (local + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return tomorrow.timestamp()
+
+
+def _epoch(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+class TariffCurve:
+    def __init__(self, valid_from, valid_to, prices, fetched_at):
+        # Parallel arrays sorted by valid_from (unix seconds); prices in p/kWh inc. VAT
+        self.valid_from = np.asarray(valid_from, dtype=np.int64)
+        self.valid_to = np.asarray(valid_to, dtype=np.int64)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.fetched_at = fetched_at
+
+    @classmethod
+    def from_results(cls, results, fetched_at):
+        rows = sorted((_epoch(r["valid_from"]), _epoch(r["valid_to"]) if r.get("valid_to") else None,
+                       r["value_inc_vat"]) for r in results)
+        valid_from = [r[0] for r in rows]
+        # Open-ended rows run until the next one starts
+        valid_to = [r[1] if r[1] is not None else (rows[i + 1][0] if i + 1 < len(rows) else r[0] + 1800)
+                    for i, r in enumerate(rows)]
+        return cls(valid_from, valid_to, [r[2] for r in rows], fetched_at)
+
+    def _index(self, t):
+        i = int(np.searchsorted(self.valid_from, t, side="right")) - 1
+        if i < 0 or t >= self.valid_to[i]:
+            return None
+        return i
+
+    def price_at(self, t):
+        i = self._index(t)
+        return None if i is None else float(self.prices[i])
+
+    def curve(self, t, n_slots):
+        # Prices for the slot containing t and the following slots (up to n_slots)
+        i = self._index(t)
+        if i is None:
+            return np.empty(0)
+        return self.prices[i:i + n_slots]
+
+    @property
+    def end(self):
+        return int(self.valid_to[-1]) if len(self.valid_to) else 0
+
+    def to_json(self):
+        return {
+            "valid_from": self.valid_from.tolist(),
+            "valid_to": self.valid_to.tolist(),
+            "prices": self.prices.tolist(),
+            "fetched_at": self.fetched_at,
+        }
+
+
+class TariffStore:
+    def __init__(self, fetch=None, cache_dir=None, timeout=10, history_days=1):
+        # fetch(url, params, timeout) -> decoded JSON; the shared pooled client by default
+        self.fetch = fetch
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.history_days = history_days
+        self._curves = {}
+        self._last_attempt = {}
+        self._lock = threading.Lock()
+        self.stats = {"fetches": 0, "lookups": 0}
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, f"tariff-{key[0]}-{key[1]}.json")
+
+    def _load_disk(self, key):
+        if not self.cache_dir or not os.path.exists(self._cache_path(key)):
+            return None
+        with open(self._cache_path(key), encoding="utf-8") as f:
+            data = json.load(f)
+        return TariffCurve(data["valid_from"], data["valid_to"], data["prices"], data["fetched_at"])
+
+    def _save_disk(self, key, curve):
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = self._cache_path(key) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(curve.to_json(), f)
+        os.replace(tmp, self._cache_path(key))
+
+    def _fetch(self, product, region, now):
+        # One paginated pull of everything from history_days ago to the end of the published window
+        fetch = self.fetch
+        if fetch is None:
+            from services.http_client import fetch_json as fetch
+        period_from = datetime.fromtimestamp(now - self.history_days * 86400, UK).astimezone(ZoneInfo("UTC"))
+        url = unit_rates_url(product, region)
+        params = {"period_from": period_from.strftime("%Y-%m-%dT%H:%M:%SZ"), "page_size": 1500}
+        results = []
+        while url:
+            data = fetch(url, params, timeout=self.timeout)
+            results.extend(data.get("results", []))
+            url, params = data.get("next"), None  # "next" already carries the query string
+        self.stats["fetches"] += 1
+        return TariffCurve.from_results(results, fetched_at=now)
+
+    def _stale(self, curve, now):
+        return curve is None or curve.end <= coverage_needed(now)
+
+    def get_curve(self, product=PRODUCT_CODE, region=REGION, now=None):
+        # now: the wall clock freshness is judged by (not the time being looked up)
+        now = time.time() if now is None else now
+        key = (product, region)
+        curve = self._curves.get(key)
+        if not self._stale(curve, now):
+            return curve
+
+        with self._lock:
+            curve = self._curves.get(key)
+            if curve is None:
+                curve = self._load_disk(key)
+                if curve is not None:
+                    self._curves[key] = curve
+            if (not self._stale(curve, now) or is_offline()
+                    or now - self._last_attempt.get(key, 0) < RETRY_INTERVAL_S):
+                return curve
+
+            self._last_attempt[key] = now
+            try:
+                curve = self._fetch(product, region, now)
+                self._curves[key] = curve
+                self._save_disk(key, curve)
+                logger.info(f"Fetched {len(curve.prices)} {product}/{region} slots")
+            except Exception as e:
+                logger.warning(f"Tariff fetch failed for {product}/{region}: {e}")
+            return self._curves.get(key)
+
+    def price_at(self, t=None, product=PRODUCT_CODE, region=REGION, now=None):
+        # t: the time to price (now by default); now: the wall clock, for freshness
+        now = time.time() if now is None else now
+        t = now if t is None else t
+        self.stats["lookups"] += 1
+        curve = self.get_curve(product, region, now=now)
+        return None if curve is None else curve.price_at(t)
+
+    def price_curve(self, t=None, n_slots=48, product=PRODUCT_CODE, region=REGION, now=None):
+        now = time.time() if now is None else now
+        t = now if t is None else t
+        self.stats["lookups"] += 1
+        curve = self.get_curve(product, region, now=now)
+        return np.empty(0) if curve is None else curve.curve(t, n_slots)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_tariff_store():
+    # One store per process, shared by every PricingAgent / site
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TariffStore(cache_dir=os.environ.get("GREENGRID_TARIFF_CACHE_DIR"))
+        return _store
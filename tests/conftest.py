@@ -0,0 +1,72 @@
+# tests/conftest.py
+# Run from the repo root: python -m pytest -q
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from services.http_client import get_http_client
+from services.replay import set_recorder
+
+
+@pytest.fixture
+def online(monkeypatch):
+    # Calls go out over HTTP (to the test server), not to fallbacks or fixtures
+    monkeypatch.delenv("GREENGRID_OFFLINE", raising=False)
+    set_recorder(None)
+    yield
+    set_recorder(None)
+
+
+class LocalServer:
+    # An aiohttp app on 127.0.0.1, served from the shared client's event loop so
+    # the synchronous fetch_* helpers and agents can call it
+    def __init__(self, app):
+        self.app = app
+        self.hits = []
+        self._runner = None
+        self.url = None
+
+    def _run(self, coro):
+        _, loop = get_http_client()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(10)
+
+    async def _start(self):
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}"
+
+    def start(self):
+        self._run(self._start())
+        return self
+
+    def stop(self):
+        self._run(self._runner.cleanup())
+
+
+@pytest.fixture
+def serve():
+    # serve({"/path": handler}) -> a started LocalServer; every request is recorded in .hits
+    servers = []
+
+    def start(routes):
+        server = None
+
+        @web.middleware
+        async def record(request, handler):
+            server.hits.append((request.path, dict(request.query)))
+            return await handler(request)
+
+        app = web.Application(middlewares=[record])
+        for path, handler in routes.items():
+            app.router.add_get(path, handler)
+        server = LocalServer(app).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
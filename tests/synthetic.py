@@ -0,0 +1,88 @@
+# tests/synthetic.py
+# Synthetic Open-Meteo and Octopus responses around a given time, shaped the way
+# the real APIs answer (size-prefixed flatbuffers, newest-first unit-rate pages).
+# Served by local aiohttp apps in the tests; benchmarks.bench_pipeline extends
+# SyntheticServices with BigQuery and Gemini for its recorded fixtures.
+import json
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+UK = ZoneInfo("Europe/London")
+
+
+def flatbuffer_message(latitude, longitude, start, n_hours, variables):
+    # One size-prefixed WeatherApiResponse with an hourly block, the way Open-Meteo
+    # encodes format=flatbuffers; variables: [(Variable code, float32 values)]
+    import flatbuffers
+
+    builder = flatbuffers.Builder(1024 + 8 * n_hours * len(variables))
+    offsets = []
+    for code, values in variables:
+        vector = builder.CreateNumpyVector(np.asarray(values, dtype=np.float32))
+        builder.StartObject(4)  # VariableWithValues: variable, unit, value, values
+        builder.PrependUOffsetTRelativeSlot(3, vector, 0)
+        builder.PrependUint8Slot(0, code, 0)
+        offsets.append(builder.EndObject())
+    builder.StartVector(4, len(offsets), 4)
+    for offset in reversed(offsets):
+        builder.PrependUOffsetTRelative(offset)
+    vector = builder.EndVector()
+    builder.StartObject(4)  # VariablesWithTime: time, time_end, interval, variables
+    builder.PrependUOffsetTRelativeSlot(3, vector, 0)
+    builder.PrependInt64Slot(1, start + n_hours * 3600, 0)
+    builder.PrependInt64Slot(0, start, 0)
+    builder.PrependInt32Slot(2, 3600, 0)
+    hourly = builder.EndObject()
+    builder.StartObject(12)  # WeatherApiResponse: latitude, longitude, ..., hourly (slot 11)
+    builder.PrependUOffsetTRelativeSlot(11, hourly, 0)
+    builder.PrependFloat32Slot(1, longitude, 0)
+    builder.PrependFloat32Slot(0, latitude, 0)
+    builder.FinishSizePrefixed(builder.EndObject())
+    return bytes(builder.Output())
+
+
+class SyntheticServices:
+    # Plausible weather and Agile prices around `now` (unix seconds)
+    def __init__(self, now):
+        self.now = now
+
+    def open_meteo(self, params):
+        from openmeteo_sdk.Variable import Variable
+
+        codes = {"temperature_2m": Variable.temperature, "shortwave_radiation": Variable.shortwave_radiation}
+        start = int(self.now // 86400 - int(params.get("past_days", 0))) * 86400
+        n_hours = (7 + int(params.get("past_days", 0))) * 24
+        hour = np.arange(n_hours) % 24
+        body = b""
+        for lat, lon in zip(params["latitude"].split(","), params["longitude"].split(",")):
+            lat, lon = float(lat), float(lon)
+            clouds = 0.4 + 0.5 * np.abs(np.sin(np.arange(n_hours) / 7 + lat * 13 + lon * 7))
+            values = {
+                "temperature_2m": 14 - (lat - 51.5) * 2 + 5 * np.sin(np.pi * (hour - 9) / 12),
+                "shortwave_radiation": 750 * np.sin(np.pi * (hour - 6) / 12).clip(0) * clouds,
+            }
+            variables = [(codes[name], values[name]) for name in params["hourly"].split(",")]
+            body += flatbuffer_message(lat, lon, start, n_hours, variables)
+        return body
+
+    def octopus(self, params):
+        # One page of half-hourly Agile-style rates up to the end of the published day, newest first
+        local = datetime.fromtimestamp(self.now, UK)
+        end = local.replace(hour=23, minute=0, second=0, microsecond=0) + timedelta(days=1 if local.hour >= 16 else 0)
+        period_from = datetime.fromisoformat(params["period_from"].replace("Z", "+00:00"))
+        slot = period_from.astimezone(timezone.utc)
+        results = []
+        while slot < end.astimezone(timezone.utc):
+            hour = slot.astimezone(UK).hour + slot.minute / 60
+            price = 18 + 8 * max(0.0, np.sin(np.pi * (hour - 6) / 14)) + (15 if 16 <= hour < 19 else 0)
+            results.append({
+                "value_exc_vat": round(price / 1.05, 4), "value_inc_vat": round(price, 4),
+                "valid_from": slot.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "valid_to": (slot + timedelta(minutes=30)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "payment_method": None,
+            })
+            slot += timedelta(minutes=30)
+        return json.dumps({"count": len(results), "next": None, "previous": None,
+                           "results": results[::-1]}).encode()
@@ -0,0 +1,144 @@
+# tests/test_advisor_agent.py
+# AdvisorAgent with a stub model in place of Gemini
+import threading
+import time
+
+import pytest
+
+from agents import optimizer_agent
+from agents.advisor_agent import AdvisorAgent, template_report
+from agents.coordinator_agent import CoordinatorAgent
+from services.battery_state import BatteryStateStore
+
+# High enough that only the rate-limiting test waits for tokens
+UNLIMITED = 60_000
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    # generate_content() answers after `release` is set (immediately by default), or raises `error`
+    def __init__(self, error=None):
+        self.error = error
+        self.release = threading.Event()
+        self.release.set()
+        self.calls = []
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls.append(time.monotonic())
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return StubResponse(f"  Report #{len(self.calls)}  ")
+
+
+@pytest.fixture
+def coordinator(monkeypatch, tmp_path):
+    monkeypatch.setenv("GREENGRID_OFFLINE", "1")
+    store = BatteryStateStore(str(tmp_path / "battery_state.bin"))
+    monkeypatch.setattr(optimizer_agent, "get_battery_state_store", lambda: store)
+    coordinator = CoordinatorAgent()
+    yield coordinator
+    coordinator.graph.shutdown()
+
+
+def test_run_returns_template_while_report_is_pending():
+    model = StubModel()
+    model.release.clear()
+    advisor = AdvisorAgent(model=model, requests_per_minute=UNLIMITED)
+
+    result = advisor.run({"decision": "charge battery", "expected_cost": 1.234})
+
+    assert result == {"report": template_report("charge battery", 1.23), "report_status": "pending"}
+    model.release.set()
+    assert advisor.get_report("charge battery", 1.23, timeout=5) == ("Report #1", "ready")
+    # Now cached: later ticks get it straight away
+    assert advisor.run({"decision": "charge battery", "expected_cost": 1.23}) == {
+        "report": "Report #1", "report_status": "ready",
+    }
+    assert len(model.calls) == 1
+
+
+def test_concurrent_requests_share_one_generation():
+    model = StubModel()
+    model.release.clear()
+    advisor = AdvisorAgent(model=model, requests_per_minute=UNLIMITED)
+
+    futures = [advisor.submit("use solar", 0.5) for _ in range(3)]
+    model.release.set()
+
+    assert [future.result(5) for future in futures] == [("Report #1", "ready")] * 3
+    assert len(model.calls) == 1
+
+
+def test_attach_report_swaps_in_generated_report(coordinator):
+    model = StubModel()
+    model.release.clear()
+    coordinator.advisor = AdvisorAgent(model=model, requests_per_minute=UNLIMITED)
+    result = coordinator.advisor.run({"decision": "discharge battery", "expected_cost": 2.0})
+    result.update(decision="discharge battery", expected_cost=2.0)
+
+    model.release.set()
+    coordinator.attach_report(result, timeout=5)
+
+    assert result["report"] == "Report #1"
+    assert result["report_status"] == "ready"
+
+
+def test_attach_report_marks_template_fallback(coordinator):
+    model = StubModel(error=RuntimeError("quota exceeded"))
+    model.release.clear()
+    coordinator.advisor = AdvisorAgent(model=model, requests_per_minute=UNLIMITED)
+    result = coordinator.advisor.run({"decision": "buy from grid", "expected_cost": 3.0})
+    result.update(decision="buy from grid", expected_cost=3.0)
+
+    model.release.set()
+    coordinator.attach_report(result, timeout=5)
+
+    assert result["report"] == template_report("buy from grid", 3.0)
+    assert result["report_status"] == "template"
+
+
+def test_failed_generation_falls_back_to_template_and_is_not_cached():
+    model = StubModel(error=RuntimeError("service unavailable"))
+    advisor = AdvisorAgent(model=model, requests_per_minute=UNLIMITED)
+
+    assert advisor.get_report("use solar", 0.75, timeout=5) == (template_report("use solar", 0.75), "template")
+    # The next request tries the LLM again
+    model.error = None
+    assert advisor.get_report("use solar", 0.75, timeout=5) == ("Report #2", "ready")
+
+
+def test_no_model_offline_uses_template(monkeypatch):
+    monkeypatch.setenv("GREENGRID_OFFLINE", "1")
+    advisor = AdvisorAgent(wait_s=5)
+
+    assert advisor.run({"decision": "use solar", "expected_cost": 1.0}) == {
+        "report": template_report("use solar", 1.0), "report_status": "template",
+    }
+
+
+def test_llm_calls_are_rate_limited():
+    model = StubModel()
+    advisor = AdvisorAgent(model=model, requests_per_minute=600)  # one call every 0.1 s
+
+    for cost in (1.0, 2.0, 3.0):
+        advisor.get_report("use solar", cost, timeout=5)
+
+    gaps = [later - earlier for earlier, later in zip(model.calls, model.calls[1:])]
+    assert len(gaps) == 2
+    assert all(gap >= 0.09 for gap in gaps)
+
+
+def test_cached_reports_expire_after_ttl():
+    model = StubModel()
+    advisor = AdvisorAgent(model=model, requests_per_minute=UNLIMITED, cache_ttl=0.05)
+
+    assert advisor.get_report("use solar", 1.0, timeout=5) == ("Report #1", "ready")
+    assert advisor.get_report("use solar", 1.0, timeout=5) == ("Report #1", "ready")
+    time.sleep(0.1)
+    assert advisor.get_report("use solar", 1.0, timeout=5) == ("Report #2", "ready")
+    assert len(model.calls) == 2
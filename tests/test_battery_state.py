@@ -0,0 +1,69 @@
+# tests/test_battery_state.py
+import os
+import time
+
+import numpy as np
+import pytest
+
+from agents.optimizer_agent import OptimizerAgent
+from services import battery_state
+from services.battery_state import BatteryStateStore, ReadOnlyStateStore
+from services.fleet_runner import FleetRunner
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = BatteryStateStore(str(tmp_path / "battery_state.bin"), checkpoint_interval_s=0.05)
+    yield store
+    store.close()
+
+
+def test_writes_are_checkpointed_in_the_background(store):
+    store.set(3, 7.5, 20.0)
+    # The write returned without taking a checkpoint...
+    assert not os.path.exists(store.checkpoint_path)
+
+    # ...the checkpoint thread takes one shortly after
+    deadline = time.monotonic() + 5
+    while not os.path.exists(store.checkpoint_path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    checkpoint = np.memmap(store.checkpoint_path, dtype=battery_state.RECORD, mode="r",
+                           offset=battery_state.HEADER_SIZE)
+    assert checkpoint["soc_kWh"][3] == 7.5
+
+
+def test_close_checkpoints_pending_writes(tmp_path):
+    store = BatteryStateStore(str(tmp_path / "battery_state.bin"), checkpoint_interval_s=3600)
+    store.set(0, 4.0, 20.0)
+    store.close()
+
+    os.remove(store.path)
+    assert BatteryStateStore(store.path).soc(0) == 4.0
+
+
+def test_read_only_store_never_writes(store):
+    store.set(0, 10.0, 20.0)
+    optimizer = OptimizerAgent(state_store=ReadOnlyStateStore(store))
+
+    result = optimizer.run({
+        "forecast": {"predicted_consumption_kWh": 2.0, "predicted_solar_kWh": 8.0},
+        "price_kWh": 20.0,
+    })
+
+    # The preview moves the charge, but the stored state is untouched
+    assert result["battery_charge_kWh"] != 10.0
+    assert store.soc(0) == 10.0
+    assert optimizer.battery_current_charge == 10.0
+
+
+def test_fleet_refuses_the_single_site_store(tmp_path, monkeypatch):
+    path = str(tmp_path / "battery_state.bin")
+    monkeypatch.setattr("services.fleet_runner.STATE_PATH", path)
+    store = BatteryStateStore(path)
+    sites = {"location": np.zeros(2, dtype=np.int32), "battery_capacity_kWh": 20.0}
+    weather = {"time": np.zeros(1), "temperature_2m": np.zeros((1, 1)), "shortwave_radiation": np.zeros((1, 1))}
+    tariff = {"valid_from": np.zeros(1), "prices": np.full(1, 20.0)}
+
+    with pytest.raises(ValueError, match="get_fleet_state_store"):
+        FleetRunner(sites, weather, tariff, workers=1, state_store=store)
+    store.close()
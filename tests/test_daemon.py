@@ -0,0 +1,122 @@
+# tests/test_daemon.py
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from daemon import HealthServer, TickScheduler
+
+
+class FakeClock:
+    def __init__(self, t):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+class ClockEvent(threading.Event):
+    # The scheduler's stop event: waiting advances the fake clock instead of sleeping
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def wait(self, timeout=None):
+        if not self.is_set():
+            self.clock.t += timeout
+        return self.is_set()
+
+
+def fake_scheduler(clock, tick_s=0.0, **kwargs):
+    calls = []
+
+    def tick(scheduled_at):
+        calls.append((scheduled_at, clock.t))
+        clock.t += tick_s(len(calls)) if callable(tick_s) else tick_s
+
+    scheduler = TickScheduler(tick, clock=clock, **kwargs)
+    scheduler._stop = ClockEvent(clock)
+    return scheduler, calls
+
+
+def test_ticks_land_on_offset_boundaries():
+    clock = FakeClock(1000.3)
+    scheduler, calls = fake_scheduler(clock, tick_s=1.5, interval_s=10, offset_s=2, max_ticks=3)
+    assert scheduler.next_boundary(1002) == 1012
+    scheduler.run_forever()
+    assert calls == [(1002, 1002), (1012, 1012), (1022, 1022)]
+    assert scheduler.stats == {"ticks": 3, "errors": 0, "skipped": 0}
+    assert scheduler.next_due == 1032
+
+
+def test_boundaries_missed_during_a_long_tick_are_skipped():
+    clock = FakeClock(0.5)
+    # The first tick runs for 35 s: the 20 and 30 boundaries pass, 40 runs late
+    scheduler, calls = fake_scheduler(clock, tick_s=lambda n: 35 if n == 1 else 1, interval_s=10, max_ticks=3)
+    scheduler.run_forever()
+    assert calls == [(10, 10), (40, 45), (50, 50)]
+    assert scheduler.stats["skipped"] == 2
+
+
+def test_tick_errors_are_counted_and_reported():
+    def fail(scheduled_at):
+        raise RuntimeError("BigQuery down")
+
+    clock = FakeClock(0)
+    scheduler = TickScheduler(fail, interval_s=10, max_ticks=2, clock=clock)
+    scheduler._stop = ClockEvent(clock)
+    scheduler.run_forever()
+    assert scheduler.stats == {"ticks": 2, "errors": 2, "skipped": 0}
+    assert scheduler.last_error == "RuntimeError('BigQuery down')"
+    assert scheduler.health()["status"] == "degraded"
+
+
+def test_stop_wakes_a_sleeping_scheduler():
+    scheduler = TickScheduler(lambda scheduled_at: None, interval_s=3600)
+    thread = threading.Thread(target=scheduler.run_forever)
+    thread.start()
+    # Wait for it to be sleeping towards its first boundary
+    while scheduler.next_due is None:
+        threading.Event().wait(0.01)
+    scheduler.stop()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert scheduler.stats["ticks"] == 0
+
+
+def get_health(port):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=5) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+@pytest.fixture
+def health_server():
+    servers = []
+
+    def start(scheduler):
+        server = HealthServer(scheduler, 0, host="127.0.0.1").start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def test_healthz_returns_503_once_ticks_stall(health_server):
+    clock = FakeClock(0)
+    scheduler, _ = fake_scheduler(clock, interval_s=10, max_ticks=1)
+    scheduler.run_forever()
+    server = health_server(scheduler)
+    status, health = get_health(server.port)
+    assert (status, health["status"], health["ticks"]) == (200, "ok", 1)
+
+    # No tick for more than two intervals (+60 s grace)
+    clock.t += 2 * 10 + 61
+    status, health = get_health(server.port)
+    assert (status, health["status"]) == (503, "stalled")
@@ -0,0 +1,121 @@
+# tests/test_data_agents.py
+# ForecastAgent and PricingAgent end to end over HTTP: Open-Meteo flatbuffers and
+# paginated Octopus unit rates served by a local aiohttp app.
+import json
+import time
+
+import numpy as np
+from aiohttp import web
+
+from agents import forecast_agent
+from agents.forecast_agent import FORECAST_VARIABLES, ForecastAgent, predict_energy
+from agents.pricing_agent import PricingAgent
+from services import tariff
+from services.tariff import TariffStore
+from tests.synthetic import SyntheticServices
+
+
+def open_meteo(services):
+    async def handler(request):
+        return web.Response(body=services.open_meteo(dict(request.query)),
+                            content_type="application/octet-stream")
+
+    return handler
+
+
+def test_forecast_series_is_decoded_from_flatbuffers(online, serve, monkeypatch):
+    services = SyntheticServices(time.time())
+    server = serve({"/v1/forecast": open_meteo(services)})
+    monkeypatch.setattr(forecast_agent, "FORECAST_URL", f"{server.url}/v1/forecast")
+    monkeypatch.setattr(forecast_agent, "get_forecast_model", lambda: None)
+
+    series = ForecastAgent().get_forecast_series()
+
+    (_, query), = server.hits
+    assert query["format"] == "flatbuffers"
+    assert query["hourly"] == ",".join(FORECAST_VARIABLES)
+    # 7 days plus one past day, hourly, from midnight UTC a day ago
+    start = int(services.now // 86400 - 1) * 86400
+    assert series["time"][0] == start and len(series["time"]) == 8 * 24
+    assert np.all(np.diff(series["time"]) == 3600)
+    assert series["temperature_2m"].dtype == np.float32
+    consumption, solar = predict_energy(series["temperature_2m"], series["shortwave_radiation"])
+    np.testing.assert_array_equal(series["predicted_consumption_kWh"], consumption)
+    np.testing.assert_array_equal(series["predicted_solar_kWh"], solar)
+    assert solar.max() > 0
+
+
+def test_forecast_batch_shares_grid_cells(online, serve, monkeypatch):
+    server = serve({"/v1/forecast": open_meteo(SyntheticServices(time.time()))})
+    monkeypatch.setattr(forecast_agent, "FORECAST_URL", f"{server.url}/v1/forecast")
+    # Sites 0 and 1 snap to the same 0.05° cell; site 2 is elsewhere
+    sites = {0: (51.501, -0.121), 1: (51.499, -0.119), 2: (53.48, -2.24)}
+
+    frame, site_locations = ForecastAgent().get_weather_forecast_batch(sites, chunk_size=1)
+
+    # Two cells, one request each, fetched concurrently
+    assert len(server.hits) == 2
+    assert site_locations[0] == site_locations[1] != site_locations[2]
+    agent = ForecastAgent()
+    london, manchester = agent.site_forecast(frame, site_locations, 0), agent.site_forecast(frame, site_locations, 2)
+    assert len(london) == len(manchester) == 7 * 24
+    assert list(london.columns) == list(FORECAST_VARIABLES)
+    # The synthetic forecast is a little colder further north
+    assert manchester["temperature_2m"].mean() < london["temperature_2m"].mean()
+
+
+def test_pricing_agent_follows_octopus_pagination(online, serve, monkeypatch, tmp_path):
+    services = SyntheticServices(time.time())
+    pages = {}
+
+    async def unit_rates(request):
+        if "page" in request.query:
+            return web.json_response(pages[request.query["page"]])
+        data = json.loads(services.octopus(dict(request.query)))
+        half = len(data["results"]) // 2
+        pages["2"] = dict(data, results=data["results"][half:], next=None)
+        return web.json_response(dict(data, results=data["results"][:half], next=f"{request.url}&page=2"))
+
+    server = serve({f"/v1/products/{tariff.PRODUCT_CODE}/electricity-tariffs/"
+                    f"E-1R-{tariff.PRODUCT_CODE}-{tariff.REGION}/standard-unit-rates/": unit_rates})
+    monkeypatch.setattr(tariff, "API_BASE", f"{server.url}/v1")
+    store = TariffStore(cache_dir=str(tmp_path))
+
+    result = PricingAgent(store=store).run({})
+
+    assert len(server.hits) == 2
+    assert store.stats["fetches"] == 1
+    published = json.loads(services.octopus(server.hits[0][1]))["results"]
+    now = time.time()
+    slot = next(r for r in published if tariff._epoch(r["valid_from"]) <= now < tariff._epoch(r["valid_to"]))
+    assert result["price_kWh"] == slot["value_inc_vat"]
+    assert result["price_curve_kWh"][0] == slot["value_inc_vat"]
+    assert 0 < len(result["price_curve_kWh"]) <= 48
+    # The curve is cached on disk for the next process
+    assert (tmp_path / f"tariff-{tariff.PRODUCT_CODE}-{tariff.REGION}.json").exists()
+
+
+def test_failed_forecast_chunk_leaves_its_sites_without_a_forecast(online, serve, monkeypatch):
+    services = SyntheticServices(time.time())
+
+    async def handler(request):
+        if request.query["latitude"].startswith("53."):
+            return web.Response(status=400, body=b"invalid coordinates")
+        return await open_meteo(services)(request)
+
+    server = serve({"/v1/forecast": handler})
+    monkeypatch.setattr(forecast_agent, "FORECAST_URL", f"{server.url}/v1/forecast")
+    sites = {0: (51.501, -0.121), 1: (53.48, -2.24), 2: (51.45, -2.59)}
+    agent = ForecastAgent()
+
+    frame, site_locations = agent.get_weather_forecast_batch(sites, chunk_size=1)
+
+    assert len(server.hits) == 3
+    assert agent.site_forecast(frame, site_locations, 1) is None
+    assert len(agent.site_forecast(frame, site_locations, 0)) == len(agent.site_forecast(frame, site_locations, 2))
+
+    # Every chunk failing leaves no frame at all
+    monkeypatch.setattr(forecast_agent, "FORECAST_URL", f"{server.url}/missing")
+    frame, site_locations = agent.get_weather_forecast_batch(sites)
+    assert frame is None
+    assert agent.site_forecast(frame, site_locations, 0) is None
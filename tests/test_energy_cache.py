@@ -0,0 +1,88 @@
+# tests/test_energy_cache.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.energy_cache import EnergyCache
+
+
+class FakeBigQuery:
+    # Stands in for fetch_energy_rows_since: rows at or after `since`, in arrival order
+    def __init__(self):
+        self.rows = []
+        self.calls = []
+
+    def add(self, timestamp, consumption_kWh):
+        self.rows.append({"timestamp": timestamp, "consumption_kWh": consumption_kWh, "decision": "hold"})
+
+    def fetch(self, since, columns):
+        self.calls.append(since)
+        return [dict(row) for row in self.rows if row["timestamp"] >= since]
+
+
+@pytest.fixture
+def now():
+    return datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def cached_rows(cache):
+    return sorted((row["timestamp"], row["consumption_kWh"]) for row in cache.query(days=2, limit=1000))
+
+
+def test_late_rows_inside_the_overlap_are_picked_up_once(tmp_path, now):
+    bigquery = FakeBigQuery()
+    for hours in (3, 2, 1):
+        bigquery.add(now - timedelta(hours=hours), float(hours))
+    cache = EnergyCache(str(tmp_path / "cache.sqlite"), fetch=bigquery.fetch, overlap_s=6 * 3600)
+    assert cache.sync() == 3
+
+    # A replayed reading lands behind the newest cached row, plus a new one
+    bigquery.add(now - timedelta(minutes=90), 1.5)
+    bigquery.add(now, 0.0)
+    assert cache.sync(force=True) == 2
+    # Re-read from the newest cached row less the overlap
+    assert bigquery.calls[-1] == now - timedelta(hours=1) - timedelta(hours=6)
+    assert cached_rows(cache) == sorted(
+        (now - timedelta(hours=h), float(h)) for h in (3, 2, 1.5, 1, 0))
+
+    # Nothing new: every re-read row is already cached
+    assert cache.sync(force=True) == 0
+    assert len(cached_rows(cache)) == 5
+
+
+def test_late_rows_older_than_the_overlap_are_missed(tmp_path, now):
+    bigquery = FakeBigQuery()
+    bigquery.add(now, 1.0)
+    cache = EnergyCache(str(tmp_path / "cache.sqlite"), fetch=bigquery.fetch, overlap_s=3600)
+    cache.sync()
+    bigquery.add(now - timedelta(hours=2), 2.0)
+    assert cache.sync(force=True) == 0
+
+
+def test_min_sync_interval_is_shared_through_the_file(tmp_path, now):
+    bigquery = FakeBigQuery()
+    bigquery.add(now, 1.0)
+    path = str(tmp_path / "cache.sqlite")
+    first = EnergyCache(path, fetch=bigquery.fetch, min_sync_interval=60)
+    second = EnergyCache(path, fetch=bigquery.fetch, min_sync_interval=60)
+    assert first.sync() == 1
+    # The other instance (another session or process) sees the recent sync and skips
+    assert second.sync() == 0
+    assert first.sync() == 0
+    assert len(bigquery.calls) == 1
+    assert cached_rows(second) == [(now, 1.0)]
+    # force bypasses the interval
+    bigquery.add(now + timedelta(seconds=1), 2.0)
+    assert second.sync(force=True) == 1
+
+
+def test_failed_fetch_gives_the_sync_claim_back(tmp_path, now):
+    def failing(since, columns):
+        raise OSError("BigQuery unavailable")
+
+    path = str(tmp_path / "cache.sqlite")
+    with pytest.raises(OSError):
+        EnergyCache(path, fetch=failing).sync()
+    bigquery = FakeBigQuery()
+    bigquery.add(now, 1.0)
+    assert EnergyCache(path, fetch=bigquery.fetch).sync() == 1
@@ -0,0 +1,67 @@
+# tests/test_energy_data.py
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from services import energy_cache
+from services.energy_cache import EnergyCache
+from services.energy_data import get_energy_series, hourly_kWh
+
+
+@pytest.fixture
+def hour():
+    # Start of the hour two hours ago, so every reading falls inside days=1
+    return (int(time.time()) // 3600 - 2) * 3600
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch, hour):
+    def utc(ts):
+        return datetime.fromtimestamp(ts, timezone.utc)
+
+    rows = [
+        {"timestamp": utc(hour), "consumption_kWh": 1.0, "solar_generation_kWh": 0.0},
+        {"timestamp": utc(hour + 900), "consumption_kWh": 3.0, "solar_generation_kWh": 0.5},
+        {"timestamp": utc(hour + 1800), "consumption_kWh": 2.0, "solar_generation_kWh": 1.0},
+        {"timestamp": utc(hour + 3600 + 60), "consumption_kWh": 4.0, "solar_generation_kWh": 2.0},
+        # Outside a one day range
+        {"timestamp": utc(hour - 3 * 86400), "consumption_kWh": 100.0, "solar_generation_kWh": 100.0},
+    ]
+    cache = EnergyCache(str(tmp_path / "cache.sqlite"), fetch=lambda since, columns: rows)
+    monkeypatch.setattr(energy_cache, "get_energy_cache", lambda: cache)
+    return cache
+
+
+def test_hourly_buckets(cache, hour):
+    series = get_energy_series(days=1, bucket="1h", fields=("consumption_kWh", "solar_generation_kWh"))
+    assert series["bucket_start"].tolist() == [
+        datetime.fromtimestamp(hour, timezone.utc).replace(tzinfo=None),
+        datetime.fromtimestamp(hour + 3600, timezone.utc).replace(tzinfo=None),
+    ]
+    assert series["count"].tolist() == [3, 1]
+    assert series["consumption_kWh_sum"].tolist() == [6.0, 4.0]
+    assert series["consumption_kWh_mean"].tolist() == [2.0, 4.0]
+    assert series["consumption_kWh_min"].tolist() == [1.0, 4.0]
+    assert series["consumption_kWh_max"].tolist() == [3.0, 4.0]
+    assert series["solar_generation_kWh_sum"].tolist() == [1.5, 2.0]
+    # Means are per reading, scaled to an hour of energy (hourly readings by default)
+    assert np.allclose(hourly_kWh(series, "consumption_kWh"), [2.0, 4.0])
+
+
+def test_default_bucket_stays_within_max_points(cache, hour):
+    # One day in 15 min buckets is 96 points
+    series = get_energy_series(days=1, fields=("consumption_kWh",))
+    assert series["count"].tolist() == [1, 1, 1, 1]
+    assert series["consumption_kWh_sum"].tolist() == [1.0, 3.0, 2.0, 4.0]
+    # A wider range with fewer points allowed falls back to daily buckets
+    series = get_energy_series(days=30, max_points=100, fields=("consumption_kWh",), sync=False)
+    assert series["count"].sum() == 5
+    assert (series["bucket_start"].astype(np.int64) % 86400 == 0).all()
+
+
+def test_empty_range(cache):
+    series = get_energy_series(days=1, bucket="1h", fields=("price_kWh",), sync=False)
+    assert series["count"].tolist() == []
+    assert series["price_kWh_sum"].shape == (0,)
@@ -0,0 +1,45 @@
+# tests/test_fleet_runner.py
+import numpy as np
+import pytest
+
+from agents.pricing_agent import FALLBACK_PRICE
+from services import fleet_runner
+from services.fleet_runner import FleetRunner
+
+SLOT = 1800
+T0 = 1_800_000_000
+
+
+def tariff_inputs(prices):
+    return {
+        "tariff_valid_from": T0 + np.arange(len(prices), dtype=np.int64) * SLOT,
+        "tariff_prices": np.asarray(prices, dtype=np.float64),
+    }
+
+
+@pytest.mark.parametrize("now, expected", [
+    (T0 + 10, [10.0, 11.0, 12.0, 12.0]),
+    (T0 + SLOT + 10, [11.0, 12.0, 12.0, 12.0]),
+    # Before the curve starts: its first slot, then on from there
+    (T0 - 10 * SLOT, [10.0, 11.0, 12.0, 12.0]),
+    # Past the end of the published curve: the last published price
+    (T0 + 50 * SLOT, [12.0] * 4),
+])
+def test_price_curve_is_padded_with_the_last_price(monkeypatch, now, expected):
+    monkeypatch.setattr(fleet_runner, "_inputs", tariff_inputs([10.0, 11.0, 12.0]))
+    assert fleet_runner._price_curve(now, 4).tolist() == expected
+
+
+def test_price_curve_without_a_tariff_uses_the_fallback_price(monkeypatch):
+    monkeypatch.setattr(fleet_runner, "_inputs", tariff_inputs([]))
+    assert fleet_runner._price_curve(T0, 3).tolist() == [FALLBACK_PRICE] * 3
+
+
+def test_fleet_tick_with_an_empty_tariff():
+    sites = {"location": np.zeros(4, dtype=np.int32), "battery_capacity_kWh": 10.0}
+    weather = {"time": np.array([T0]), "temperature_2m": np.full((1, 1), 15.0),
+               "shortwave_radiation": np.full((1, 1), 300.0)}
+    tariff = {"valid_from": np.zeros(0, dtype=np.int64), "prices": np.zeros(0)}
+    with FleetRunner(sites, weather, tariff, workers=1) as runner:
+        ctx = runner.run_tick(now=T0)
+        assert ctx.columns["price_kWh"].tolist() == [FALLBACK_PRICE] * 4
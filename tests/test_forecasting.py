@@ -0,0 +1,95 @@
+# tests/test_forecasting.py
+# Hourly history for the learned forecaster: normalised per hour, read without a sync,
+# and only trusted while it is recent
+import time
+
+import numpy as np
+
+from agents.forecast_agent import ForecastAgent
+from services import energy_cache, energy_data, forecast_training
+from services.energy_cache import EnergyCache
+
+HOUR = 3600
+START = 1_700_000_000 // HOUR * HOUR
+
+
+def hourly_series(counts, consumption_per_reading, solar_per_reading):
+    # A "1h" get_energy_series result for hours with `counts` readings each
+    counts = np.asarray(counts)
+    consumption = np.full(len(counts), consumption_per_reading)
+    solar = np.full(len(counts), solar_per_reading)
+    series = {"bucket_start": (START + np.arange(len(counts)) * HOUR).astype("datetime64[s]"), "count": counts}
+    for name, values in (("consumption_kWh", consumption), ("solar_generation_kWh", solar)):
+        series[f"{name}_sum"] = values * counts
+        series[f"{name}_mean"] = values
+    return series
+
+
+def test_training_targets_do_not_scale_with_reading_count(monkeypatch):
+    # One reading in the first hour, two (a tick every 30 min) in the second, four in the third
+    monkeypatch.setattr(forecast_training, "get_energy_series", lambda **_: hourly_series([1, 2, 4], 12.5, 4.2))
+    monkeypatch.setattr(energy_data, "READING_INTERVAL_S", 3600.0)
+
+    times, consumption, solar = forecast_training.load_history(days=1)
+
+    assert list(times) == [START, START + HOUR, START + 2 * HOUR]
+    assert list(consumption) == [12.5] * 3
+    assert list(solar) == [4.2] * 3
+
+
+def test_interval_rows_add_up_to_an_hour(monkeypatch):
+    # A streamed meter stores one row of energy per 30-minute interval
+    monkeypatch.setattr(energy_data, "READING_INTERVAL_S", 1800.0)
+    series = hourly_series([2, 1], 0.3, 0.1)
+
+    # A missing interval is filled in from the other half of the hour
+    assert np.allclose(energy_data.hourly_kWh(series, "consumption_kWh"), [0.6, 0.6])
+
+
+def test_site_state_is_updated_from_the_cache_without_syncing(monkeypatch, tmp_path):
+    def fetch(since, columns):
+        raise AssertionError("ForecastAgent must not reach BigQuery")
+
+    cache = EnergyCache(str(tmp_path / "cache.sqlite"), fetch=fetch)
+    with cache._connect() as conn:
+        for hour in range(3):
+            for reading in range(hour + 1):
+                values = (START + hour * HOUR + reading * 60, 10.0 + hour) + (None,) * (len(energy_cache.COLUMNS) - 2)
+                conn.execute(f"INSERT INTO readings ({', '.join(energy_cache.COLUMNS)}, row_key) "
+                             f"VALUES ({', '.join('?' * (len(values) + 1))})", values + (str(values),))
+    monkeypatch.setattr(energy_cache, "get_energy_cache", lambda: cache)
+    monkeypatch.setattr(energy_data, "READING_INTERVAL_S", 3600.0)
+    monkeypatch.setattr("agents.forecast_agent.STATE_HISTORY_DAYS", 10_000)
+    updates = []
+    agent = ForecastAgent()
+    monkeypatch.setattr(agent.site_state, "update", lambda *args: updates.append(args))
+
+    agent.update_site_state({"time": np.array([], dtype=np.int64), "shortwave_radiation": np.array([])})
+
+    assert [(int(t), float(c)) for t, c, _, _ in updates] == [
+        (START, 10.0), (START + HOUR, 11.0), (START + 2 * HOUR, 12.0),
+    ]
+
+
+def test_stale_site_state_falls_back_to_the_heuristic(monkeypatch):
+    class Model:
+        def predict(self, state, times, temperature, radiation):
+            return np.full((1, len(times)), 99.0), np.full((1, len(times)), 99.0)
+
+    monkeypatch.setattr("agents.forecast_agent.get_forecast_model", lambda: Model())
+    agent = ForecastAgent()
+    monkeypatch.setattr(agent, "update_site_state", lambda series: None)
+    now = int(time.time()) // HOUR * HOUR
+    for hour in range(24):
+        agent.site_state.update(now - (48 - hour) * HOUR, 10.0, 1.0)
+    series = {"time": np.array([now]), "temperature_2m": np.array([15.0]), "shortwave_radiation": np.array([500.0])}
+
+    # A day of history, but the newest hour is a day old: the cache hasn't been synced
+    consumption, _ = agent.predict(series)
+    assert agent.model_name == "heuristic"
+    assert consumption[0] == 12.0
+
+    agent.site_state.update(now - HOUR, 10.0, 1.0)
+    consumption, _ = agent.predict(series)
+    assert agent.model_name == "ridge"
+    assert consumption[0] == 99.0
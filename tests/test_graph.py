@@ -0,0 +1,107 @@
+# tests/test_graph.py
+import threading
+import time
+
+from adk import Agent, AgentGraph
+
+
+class StepAgent(Agent):
+    def __init__(self, name, reads=(), writes=(), run=None, timeout=None, log=None):
+        super().__init__(name)
+        self.reads = reads
+        self.writes = writes
+        self.timeout = timeout
+        self.log = log if log is not None else []
+        self._run = run
+
+    def run(self, context):
+        self.log.append(("start", self.name, sorted(context)))
+        result = self._run(context) if self._run else {key: self.name for key in self.writes}
+        self.log.append(("end", self.name))
+        return result
+
+
+def test_independent_agents_run_concurrently():
+    # Each agent waits until all three are inside run(): only possible in parallel
+    barrier = threading.Barrier(3, timeout=5)
+
+    def meet(context):
+        barrier.wait()
+        return {}
+
+    graph = AgentGraph([StepAgent(f"a{i}", writes=(f"k{i}",), run=meet) for i in range(3)])
+    try:
+        graph.run()
+        assert graph.last_errors == {}
+    finally:
+        graph.shutdown()
+
+
+def test_dependencies_run_in_order_and_see_upstream_keys():
+    log = []
+    graph = AgentGraph([
+        StepAgent("sensor", writes=("sensor_data",), log=log),
+        StepAgent("forecast", writes=("forecast",), log=log),
+        StepAgent("optimizer", reads=("sensor_data", "forecast"), writes=("decision",), log=log),
+        StepAgent("advisor", reads=("decision",), writes=("report",), log=log),
+    ])
+    try:
+        ctx = graph.run({"site": 1})
+    finally:
+        graph.shutdown()
+    order = [entry[1] for entry in log if entry[0] == "end"]
+    assert order.index("optimizer") > max(order.index("sensor"), order.index("forecast"))
+    assert order[-1] == "advisor"
+    assert ("start", "optimizer", ["forecast", "sensor_data", "site"]) in log
+    assert ctx["report"] == "advisor"
+    assert set(ctx["timings_ms"]) == {"sensor", "forecast", "optimizer", "advisor", "tick"}
+    assert graph.deps == [set(), set(), {0, 1}, {2}]
+
+
+def test_timeout_drops_writes_and_unblocks_dependents():
+    release = threading.Event()
+
+    def hang(context):
+        release.wait(5)
+        return {"forecast": "late"}
+
+    log = []
+    graph = AgentGraph([
+        StepAgent("forecast", writes=("forecast",), run=hang, timeout=0.05, log=log),
+        StepAgent("optimizer", reads=("forecast",), writes=("decision",), log=log),
+    ])
+    try:
+        start = time.perf_counter()
+        ctx = graph.run()
+        assert time.perf_counter() - start < 2
+        assert "forecast" not in ctx
+        assert ctx["decision"] == "optimizer"
+        assert graph.last_errors == {"forecast": "timed out after 0.05s"}
+        # The dependent still ran, without the key
+        assert ("start", "optimizer", []) in log
+    finally:
+        release.set()
+        graph.shutdown()
+
+
+def test_errors_are_recorded_and_leave_other_keys():
+    def fail(context):
+        raise RuntimeError("upstream down")
+
+    graph = AgentGraph([
+        StepAgent("pricing", writes=("price_kWh",), run=fail),
+        StepAgent("sensor", writes=("sensor_data",)),
+        StepAgent("optimizer", reads=("price_kWh", "sensor_data"), writes=("decision",)),
+    ], default_timeout=5)
+    try:
+        ctx = graph.run()
+        assert graph.last_errors == {"pricing": "RuntimeError('upstream down')"}
+        assert "price_kWh" not in ctx
+        assert ctx["sensor_data"] == "sensor"
+        assert ctx["decision"] == "optimizer"
+        # The next tick starts with a clean error record
+        graph.agents[0]._run = None
+        graph.run()
+        assert graph.last_errors == {}
+    finally:
+        graph.shutdown()
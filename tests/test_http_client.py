@@ -0,0 +1,106 @@
+# tests/test_http_client.py
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from services import http_client
+from services.http_client import AsyncHttpClient, HttpError
+
+
+def fetch_all(client, requests):
+    # Run client.get() for each (url, params) concurrently on a fresh loop, then close the client
+    async def run():
+        try:
+            return await asyncio.gather(*(client.get(url, params) for url, params in requests))
+        finally:
+            await client.close()
+
+    return asyncio.run(run())
+
+
+def test_connections_are_pooled_per_host(online, serve):
+    peers = set()
+
+    async def handler(request):
+        peers.add(request.transport.get_extra_info("peername"))
+        await asyncio.sleep(0.01)
+        return web.Response(body=request.query["i"].encode())
+
+    server = serve({"/data": handler})
+    client = AsyncHttpClient(limit_per_host=2)
+    bodies = fetch_all(client, [(f"{server.url}/data", {"i": i}) for i in range(20)])
+
+    assert bodies == [str(i).encode() for i in range(20)]
+    assert len(server.hits) == 20
+    # 20 concurrent requests share the host's two keep-alive connections
+    assert len(peers) == 2
+
+
+def test_identical_concurrent_requests_are_coalesced(online, serve):
+    async def handler(request):
+        await asyncio.sleep(0.05)
+        return web.json_response({"hourly": request.query["hourly"]})
+
+    server = serve({"/forecast": handler})
+    client = AsyncHttpClient()
+    url = f"{server.url}/forecast"
+    bodies = fetch_all(client, [(url, {"hourly": ["a", "b"]})] * 5 + [(url, {"hourly": "a,c"})])
+
+    assert bodies[:5] == [b'{"hourly": "a,b"}'] * 5
+    assert bodies[5] == b'{"hourly": "a,c"}'
+    # Lists are sent comma-separated, and the five identical requests went out once
+    assert sorted(query["hourly"] for _, query in server.hits) == ["a,b", "a,c"]
+    assert client.stats["coalesced"] == 4
+
+
+def test_retries_with_backoff_until_success(online, serve, monkeypatch):
+    statuses = [503, 429, 200]
+    ranges = []
+    uniform = http_client.random.uniform
+
+    async def handler(request):
+        status = statuses.pop(0)
+        return web.Response(status=status, body=b"ok" if status == 200 else b"busy")
+
+    def record_uniform(low, high):
+        ranges.append((low, high))
+        return uniform(low, high)
+
+    monkeypatch.setattr(http_client.random, "uniform", record_uniform)
+    server = serve({"/rates": handler})
+    client = AsyncHttpClient(retries=3, backoff=0.01, max_backoff=0.015)
+
+    assert fetch_all(client, [(f"{server.url}/rates", None)]) == [b"ok"]
+    assert len(server.hits) == 3
+    assert client.stats["retries"] == 2
+    # Full jitter over an exponentially growing window, capped at max_backoff
+    assert ranges == [(0, 0.01), (0, 0.015)]
+
+
+def test_gives_up_after_retries(online, serve):
+    async def handler(request):
+        return web.Response(status=502, body=b"bad gateway")
+
+    server = serve({"/rates": handler})
+    client = AsyncHttpClient(retries=2, backoff=0.01)
+
+    with pytest.raises(HttpError) as error:
+        fetch_all(client, [(f"{server.url}/rates", None)])
+    assert error.value.status == 502
+    assert len(server.hits) == 3
+    assert client.stats["errors"] == 1
+
+
+def test_client_errors_are_not_retried(online, serve):
+    async def handler(request):
+        return web.Response(status=404, body=b"no such product")
+
+    server = serve({"/rates": handler})
+    client = AsyncHttpClient(retries=3)
+
+    with pytest.raises(HttpError) as error:
+        fetch_all(client, [(f"{server.url}/rates", None)])
+    assert error.value.status == 404
+    assert len(server.hits) == 1
+    assert client.stats["retries"] == 0
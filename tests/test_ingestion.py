@@ -0,0 +1,139 @@
+# tests/test_ingestion.py
+# IngestionWriter against MemorySink, including sink outages
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from services.ingestion import IngestionWriter, MemorySink
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def spill_path(tmp_path):
+    return str(tmp_path / "spill.jsonl")
+
+
+def rows(n, start=0):
+    return [{"i": i} for i in range(start, start + n)]
+
+
+def test_flushes_when_a_batch_fills(spill_path):
+    sink = MemorySink()
+    writer = IngestionWriter(sink, batch_size=10, flush_interval=60, spill_path=spill_path)
+    for row in rows(25):
+        writer.put(row)
+
+    wait_for(lambda: len(sink.rows) == 20)
+    assert sink.batches == 2
+    # The last 5 wait for the interval (or close)
+    time.sleep(0.05)
+    assert len(sink.rows) == 20
+    writer.close()
+    assert sink.rows == rows(25)
+
+
+def test_flushes_on_the_interval(spill_path):
+    sink = MemorySink()
+    writer = IngestionWriter(sink, batch_size=1000, flush_interval=0.05, spill_path=spill_path)
+    for row in rows(3):
+        writer.put(row)
+
+    wait_for(lambda: len(sink.rows) == 3)
+    assert sink.batches == 1
+    writer.close()
+
+
+def test_outage_spills_and_replays_ahead_of_the_next_batch(spill_path):
+    sink = MemorySink()
+    sink.available = False
+    writer = IngestionWriter(sink, batch_size=5, flush_interval=60, spill_path=spill_path)
+    for row in rows(5):
+        writer.put(row)
+
+    wait_for(lambda: writer.stats["spilled"] == 5)
+    with open(spill_path, encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == rows(5)
+
+    sink.available = True
+    for row in rows(5, start=5):
+        writer.put(row)
+    wait_for(lambda: len(sink.rows) == 10)
+    # Spilled rows go first, then the new batch
+    assert sink.rows == rows(10)
+    assert writer.stats["replayed"] == 5
+    assert not os.path.exists(spill_path)
+    writer.close()
+
+
+def test_rows_spilled_during_a_replay_are_kept(spill_path):
+    # A sink that blocks while replaying, so put() spills (full queue) mid-replay
+    class SlowSink(MemorySink):
+        def __init__(self):
+            super().__init__()
+            self.replaying = threading.Event()
+            self.release = threading.Event()
+
+        def write(self, rows):
+            if rows and rows[0]["i"] == 0:
+                self.replaying.set()
+                self.release.wait(5)
+            super().write(rows)
+
+    with open(spill_path, "w", encoding="utf-8") as f:
+        for row in rows(3):
+            f.write(json.dumps(row) + "\n")
+    sink = SlowSink()
+    writer = IngestionWriter(sink, max_queue=1, batch_size=100, flush_interval=0.01, spill_path=spill_path)
+
+    assert sink.replaying.wait(5)
+    for row in rows(20, start=3):
+        writer.put(row)  # the queue holds one; the rest spill while the replay is running
+    sink.release.set()
+    writer.close()
+
+    assert sorted(row["i"] for row in sink.rows) == list(range(23))
+
+
+def test_full_queue_spills_instead_of_blocking(spill_path):
+    sink = MemorySink()
+    sink.available = False
+    gate = threading.Event()
+
+    class BlockedSink(MemorySink):
+        def write(self, rows):
+            gate.wait(5)
+            sink.write(rows)
+
+    writer = IngestionWriter(BlockedSink(), max_queue=2, batch_size=1, flush_interval=60, spill_path=spill_path)
+    start = time.perf_counter()
+    for row in rows(50):
+        writer.put(row)
+    assert time.perf_counter() - start < 1.0
+    assert writer.stats["spilled"] >= 47
+
+    sink.available = True
+    gate.set()
+    writer.close()
+    assert sorted(row["i"] for row in sink.rows) == list(range(50))
+
+
+def test_close_flushes_everything(spill_path):
+    sink = MemorySink()
+    writer = IngestionWriter(sink, batch_size=1000, flush_interval=60, spill_path=spill_path)
+    for row in rows(123):
+        writer.put(row)
+
+    writer.close()
+
+    assert sink.rows == rows(123)
+    assert writer.stats["written"] == 123
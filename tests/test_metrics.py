@@ -0,0 +1,38 @@
+# tests/test_metrics.py
+import threading
+
+from adk.metrics import MetricsRegistry
+
+
+def test_reads_while_other_threads_write():
+    registry = MetricsRegistry()
+    stop = threading.Event()
+
+    def write(worker):
+        i = 0
+        while not stop.is_set():
+            # New label values keep growing the dicts; observations keep rotating the reservoirs
+            registry.inc("agent_runs_total", agent=f"agent-{worker}-{i % 500}")
+            registry.observe("agent_run_seconds", i * 1e-3, agent=f"agent-{worker}")
+            i += 1
+
+    writers = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+    for thread in writers:
+        thread.start()
+    errors = []
+    try:
+        for _ in range(100):
+            try:
+                registry.label_values("agent_runs_total", "agent")
+                registry.counter("agent_runs_total", agent="agent-0-1")
+                registry.percentile("agent_run_seconds", 0.99, agent="agent-1")
+            except RuntimeError as e:  # "changed size during iteration" / "deque mutated"
+                errors.append(e)
+    finally:
+        stop.set()
+        for thread in writers:
+            thread.join()
+
+    assert errors == []
+    assert len(registry.label_values("agent_runs_total", "agent")) == 4 * 500
+    assert registry.percentile("agent_run_seconds", 0.5, agent="agent-0") is not None
@@ -0,0 +1,119 @@
+# tests/test_optimizer_agent.py
+# OptimizerAgent's receding-horizon schedule mode
+import numpy as np
+import pytest
+
+from agents import optimizer_agent
+from agents.coordinator_agent import CoordinatorAgent
+from agents.optimizer_agent import SLOT_MINUTES, OptimizerAgent
+from services.battery_state import BatteryStateStore
+
+SLOT_S = SLOT_MINUTES * 60
+START_SLOT = 1_000_000
+
+
+class Clock:
+    def __init__(self, t):
+        self.t = t
+
+    def time(self):
+        return self.t
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(START_SLOT * SLOT_S + 60)
+    monkeypatch.setattr(optimizer_agent, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def optimizer(tmp_path):
+    store = BatteryStateStore(str(tmp_path / "battery_state.bin"))
+    yield OptimizerAgent(mode="schedule", state_store=store)
+    store.close()
+
+
+def tick_context(now, prices, consumption, solar):
+    # What PricingAgent and ForecastAgent hand over at `now`: prices from the current
+    # slot, hourly forecasts from the first hour starting at or after now
+    slot = int(now // SLOT_S) - START_SLOT
+    hour = -(-int(now) // 3600)
+    first_hour = (hour * 3600 - START_SLOT * SLOT_S) // 3600
+    return {
+        "price_curve_kWh": prices[slot:slot + 48].tolist(),
+        "forecast_series": {
+            "start": hour * 3600,
+            "interval_s": 3600,
+            "predicted_consumption_kWh": consumption[first_hour:].tolist(),
+            "predicted_solar_kWh": solar[first_hour:].tolist(),
+        },
+    }
+
+
+def test_slot_advance_reuses_the_cost_to_go(optimizer, clock):
+    rng = np.random.default_rng(0)
+    prices = rng.uniform(5, 40, 200)
+    consumption = rng.uniform(0.5, 2.0, 100)
+    solar = rng.uniform(0.0, 3.0, 100)
+
+    def tick():
+        before = dict(optimizer.scheduler.stats) if optimizer.scheduler else {"slots_computed": 0, "slots_reused": 0}
+        result = optimizer.run(tick_context(clock.t, prices, consumption, solar))
+        clock.t += SLOT_S
+        stats = optimizer.scheduler.stats
+        planned = len(result["schedule"]["battery_change_kWh"])
+        return planned, stats["slots_computed"] - before["slots_computed"], stats["slots_reused"] - before["slots_reused"]
+
+    assert tick() == (48, 48, 0)
+    # Next slot, nothing new published: every remaining slot's inputs are unchanged
+    assert tick() == (47, 0, 47)
+    # New hour: the forecast series now starts an hour later, so only the two slots
+    # of the hour we're in (which borrow the series' first hour) change
+    assert tick() == (46, 2, 44)
+    assert tick() == (45, 0, 45)
+
+    # A newly published price only recomputes the slots up to it
+    prices[10] += 5
+    assert tick() == (44, 7, 37)
+
+
+def test_horizon_is_extended_once_half_is_left(optimizer, clock):
+    flat = np.full(200, 20.0)
+    lengths = []
+    for _ in range(30):
+        result = optimizer.run(tick_context(clock.t, flat, np.ones(100), np.zeros(100)))
+        lengths.append(len(result["schedule"]["battery_change_kWh"]))
+        clock.t += SLOT_S
+    assert lengths[:25] == list(range(48, 23, -1))
+    assert lengths[25:] == [48, 47, 46, 45, 44]
+
+
+def test_numpy_price_curve_is_accepted(optimizer, clock):
+    result = optimizer.run({"price_curve_kWh": np.full(48, 25.0), "forecast": {"predicted_consumption_kWh": 1.0}})
+    assert len(result["schedule"]["soc_kWh"]) == 49
+    assert optimizer.run({"price_curve_kWh": np.empty(0), "price_kWh": 20.0})["decision"]
+
+
+def test_coordinator_selects_schedule_mode_from_the_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv("GREENGRID_OFFLINE", "1")
+    monkeypatch.setenv("GREENGRID_OPTIMIZER_MODE", "schedule")
+    store = BatteryStateStore(str(tmp_path / "battery_state.bin"))
+    coordinator = CoordinatorAgent(state_store=store)
+    try:
+        assert coordinator.optimizer.mode == "schedule"
+        result = coordinator.run({})
+        assert coordinator.graph.last_errors == {}
+        # Offline there's no price curve or forecast series: the plan covers the
+        # horizon with the current price and the hourly forecast
+        assert len(result["schedule"]["battery_change_kWh"]) == coordinator.optimizer.horizon_slots
+        assert store.soc(coordinator.optimizer.site_id) == result["battery_charge_kWh"]
+    finally:
+        coordinator.graph.shutdown()
+        store.close()
+
+
+def test_unknown_mode_is_rejected(monkeypatch):
+    monkeypatch.setenv("GREENGRID_OPTIMIZER_MODE", "lp")
+    with pytest.raises(ValueError, match="greedy, schedule"):
+        CoordinatorAgent()
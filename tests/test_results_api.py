@@ -0,0 +1,94 @@
+# tests/test_results_api.py
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from services.results_api import ResultsClient, ResultsServer
+
+
+@pytest.fixture
+def server():
+    server = ResultsServer(port=0).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def client(server):
+    return ResultsClient(f"http://127.0.0.1:{server.port}", timeout=5.0)
+
+
+def get(server, path, **headers):
+    request = urllib.request.Request(f"http://127.0.0.1:{server.port}{path}", headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_unchanged_snapshot_is_a_304(server, client):
+    assert client.latest(site=3) is None
+    server.publish(3, {"decision": "charge"}, tick="t1")
+    snapshot = client.latest(site=3)
+    assert (snapshot["tick"], snapshot["result"]) == ("t1", {"decision": "charge"})
+
+    status, headers, _ = get(server, "/results/3")
+    assert status == 200
+    etag = headers["ETag"]
+    status, _, body = get(server, "/results/3", **{"If-None-Match": etag})
+    assert (status, body) == (304, b"")
+    # The client answers a 304 from its cache
+    assert client.latest(site=3) is snapshot
+
+    server.publish(3, {"decision": "hold"}, tick="t2")
+    status, headers, _ = get(server, "/results/3", **{"If-None-Match": etag})
+    assert status == 200 and headers["ETag"] != etag
+
+
+def test_large_snapshots_are_served_gzipped(server, client):
+    server.publish(0, {"forecast_series": list(range(1000))})
+    status, headers, _ = get(server, "/results/0", **{"Accept-Encoding": "gzip"})
+    assert (status, headers["Content-Encoding"]) == (200, "gzip")
+    assert client.latest(site=0)["result"]["forecast_series"][-1] == 999
+
+
+def test_long_poll_returns_on_publish(server, client):
+    server.publish(0, {"decision": "charge"}, tick="t1")
+    client.latest()
+    polled = {}
+
+    def poll():
+        start = time.perf_counter()
+        polled["snapshot"] = client.latest(wait=10)
+        polled["elapsed"] = time.perf_counter() - start
+
+    thread = threading.Thread(target=poll)
+    thread.start()
+    time.sleep(0.2)
+    assert thread.is_alive()
+    server.publish(0, {"decision": "hold"}, tick="t2")
+    thread.join(timeout=5)
+    assert polled["snapshot"]["tick"] == "t2"
+    assert polled["elapsed"] < 5
+
+
+def test_long_poll_times_out_without_a_publish(server, client):
+    server.publish(0, {"decision": "charge"}, tick="t1")
+    cached = client.latest()
+    start = time.perf_counter()
+    # The server answers 304 after the wait; the client returns its cached snapshot
+    assert client.latest(wait=0.3) is cached
+    assert time.perf_counter() - start >= 0.25
+
+
+def test_long_poll_before_the_first_publish_is_a_404(server, client):
+    assert client.latest(site=9, wait=0.2) is None
+
+
+def test_start_raises_when_the_port_is_in_use(server):
+    with pytest.raises(OSError):
+        ResultsServer(port=server.port).start()
@@ -0,0 +1,70 @@
+# tests/test_sensor_stream.py
+import numpy as np
+import pytest
+
+from services.sensor_stream import SensorRing, parse_lines
+
+
+def test_parse_lines_fast_path():
+    rows = parse_lines(b"1,0.5,0.1\n2,0.6,0.2\n3,0.7,0.3")
+    assert rows.tolist() == [[1, 0.5, 0.1], [2, 0.6, 0.2], [3, 0.7, 0.3]]
+
+
+@pytest.mark.parametrize("data", [
+    # 2 + 4 fields add up to two rows' worth of values
+    b"1,0.5\n2,0.6,0.2,9\n3,0.7,0.3\n",
+    b"1,0.5,0.1,7\n2,0.6\n3,0.7,0.3\n",
+    b"junk\n3,0.7,0.3\n\n",
+    b"1,x,0.1\n3,0.7,0.3\n",
+])
+def test_parse_lines_skips_malformed_lines(data):
+    assert parse_lines(data).tolist() == [[3, 0.7, 0.3]]
+
+
+def test_parse_lines_empty():
+    assert parse_lines(b"").shape == (0, 3)
+
+
+def test_window_aggregates_evict_old_readings():
+    ring = SensorRing(capacity=16, window_s=10, interval_s=1800)
+    t0 = 1_800_000_000.0  # on a 30 min boundary
+    ring.extend([(t0 + i, float(i), 1.0) for i in range(30)])
+    snapshot = ring.snapshot()
+    # Readings at t0+20..t0+29 are newer than 10 s before the last one
+    assert snapshot["window_readings"] == 10
+    assert snapshot["consumption_kW"] == pytest.approx(np.mean(range(20, 30)))
+    assert snapshot["solar_kW"] == pytest.approx(1.0)
+    assert snapshot["rate_hz"] == 1.0
+    assert ring.window()[:, 0].tolist() == [t0 + i for i in range(20, 30)]
+    assert ring.stats["readings"] == 30
+
+
+def test_interval_energy_is_closed_on_slot_boundaries():
+    ring = SensorRing(interval_s=60, max_gap_s=5)
+    t0 = 1_800_000_000.0
+    # 3.6 kW for a reading per second: 1 Wh per second
+    ring.extend([(t0 + i, 3.6, 1.8) for i in range(150)])
+    intervals = ring.pop_intervals()
+    assert [interval["start"] for interval in intervals] == [
+        "2027-01-15T08:00:00.000000Z", "2027-01-15T08:01:00.000000Z"]
+    # The first reading has no predecessor, so the first slot has 59 seconds of energy
+    assert intervals[0]["consumption_kWh"] == pytest.approx(0.059)
+    assert intervals[1]["consumption_kWh"] == pytest.approx(0.060)
+    assert intervals[1]["solar_generation_kWh"] == pytest.approx(0.030)
+    snapshot = ring.snapshot()
+    assert snapshot["interval_start"] == "2027-01-15T08:02:00.000000Z"
+    assert snapshot["interval_consumption_kWh"] == pytest.approx(0.030)
+    assert ring.pop_intervals() == []
+
+
+def test_interval_energy_skips_gaps_and_clamps_late_readings():
+    ring = SensorRing(interval_s=3600, max_gap_s=5)
+    t0 = 1_800_000_000.0
+    ring.extend([(t0, 3.6, 0.0), (t0 + 1, 3.6, 0.0)])
+    # A 100 s outage is not integrated
+    ring.extend([(t0 + 101, 3.6, 0.0), (t0 + 102, 3.6, 0.0)])
+    # A late reading lands on the latest timestamp with no extra energy
+    ring.append(t0 + 50, 3.6, 0.0)
+    snapshot = ring.snapshot()
+    assert snapshot["interval_consumption_kWh"] == pytest.approx(0.002)
+    assert ring.stats["out_of_order"] == 1
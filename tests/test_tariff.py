@@ -0,0 +1,84 @@
+# tests/test_tariff.py
+from datetime import datetime, timedelta
+
+from services.tariff import RETRY_INTERVAL_S, TariffStore, UK
+
+
+def uk(day, hour, minute=0):
+    return datetime(2026, 3, day, hour, minute, tzinfo=UK).timestamp()
+
+
+class FakeOctopus:
+    # Half-hourly rates from period_from up to 23:00 UK on the last published day
+    def __init__(self, published_until):
+        self.published_until = published_until
+        self.calls = 0
+
+    def __call__(self, url, params, timeout=None):
+        self.calls += 1
+        period_from = datetime.fromisoformat(params["period_from"].replace("Z", "+00:00"))
+        slot = period_from.replace(minute=period_from.minute // 30 * 30, second=0)
+        results = []
+        while slot.timestamp() < self.published_until:
+            results.append({
+                "valid_from": slot.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "valid_to": (slot + timedelta(minutes=30)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "value_inc_vat": round(10 + slot.astimezone(UK).hour, 2),
+            })
+            slot += timedelta(minutes=30)
+        return {"results": results[::-1], "next": None}
+
+
+def test_refetches_after_publication_until_tomorrow_is_covered(monkeypatch):
+    monkeypatch.delenv("GREENGRID_OFFLINE", raising=False)
+    octopus = FakeOctopus(published_until=uk(10, 23))
+    store = TariffStore(fetch=octopus)
+
+    # Morning: today's prices are enough
+    assert store.get_curve(now=uk(10, 9)).end == uk(10, 23)
+    assert store.get_curve(now=uk(10, 15, 59)) is not None
+    assert octopus.calls == 1
+
+    # 16:00 and tomorrow's prices aren't out yet: retried, but at most every RETRY_INTERVAL_S
+    store.get_curve(now=uk(10, 16, 1))
+    store.get_curve(now=uk(10, 16, 2))
+    assert octopus.calls == 2
+    store.get_curve(now=uk(10, 16, 1) + RETRY_INTERVAL_S)
+    assert octopus.calls == 3
+
+    # Published late; the next retry picks them up and the store stays fresh until tomorrow's publication
+    octopus.published_until = uk(11, 23)
+    assert store.get_curve(now=uk(10, 16, 1) + 2 * RETRY_INTERVAL_S).end == uk(11, 23)
+    for now in (uk(10, 20), uk(10, 23, 30), uk(11, 9), uk(11, 15, 59)):
+        store.get_curve(now=now)
+    assert octopus.calls == 4
+    store.get_curve(now=uk(11, 16))
+    assert octopus.calls == 5
+
+
+def test_lookup_time_is_not_the_wall_clock(monkeypatch):
+    monkeypatch.delenv("GREENGRID_OFFLINE", raising=False)
+    octopus = FakeOctopus(published_until=uk(11, 23))
+    store = TariffStore(fetch=octopus)
+    now = uk(10, 17)
+
+    # Pricing tomorrow evening (or yesterday) doesn't make a curve that covers now stale
+    assert store.price_at(uk(11, 20), now=now) == 30.0
+    assert store.price_at(uk(11, 23, 30), now=now) is None
+    assert list(store.price_curve(uk(11, 21), n_slots=8, now=now)) == [31.0, 31.0, 32.0, 32.0]
+    assert store.price_at(now=now) == 27.0
+    assert octopus.calls == 1
+
+
+def test_stale_curve_is_kept_when_upstream_fails(monkeypatch):
+    monkeypatch.delenv("GREENGRID_OFFLINE", raising=False)
+    octopus = FakeOctopus(published_until=uk(10, 23))
+    store = TariffStore(fetch=octopus)
+    store.get_curve(now=uk(10, 9))
+
+    def down(url, params, timeout=None):
+        raise ConnectionError("octopus unavailable")
+
+    store.fetch = down
+    assert store.price_at(uk(10, 18), now=uk(10, 17)) == 28.0
+    assert store.get_curve(now=uk(10, 17)).end == uk(10, 23)
@@ -0,0 +1,212 @@
+# utils/backtest.py
+# Replays historical prices, consumption and solar through the optimizer's
+# threshold strategy (the same rule as utils.battery.simulate) for a whole grid
+# of parameter combinations at once.
+#
+# The battery's state of charge carries from slot to slot, so time is walked
+# slot by slot; every step is a handful of in-place NumPy operations over all
+# parameter combinations. Everything that doesn't depend on the battery (the
+# no-battery baseline) is computed over the whole series in one go. Large grids
+# are split across a process pool.
+#
+#   python -m utils.backtest history.csv --thresholds 0.05:0.40:0.01 --capacities 5,10,13.5,20
+
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.battery import (
+    BATTERY_CAPACITY_KWH, CHARGE_EFFICIENCY, DISCHARGE_EFFICIENCY, FEED_IN_PRICE, PENCE_PER_POUND,
+    PRICE_THRESHOLD, solar_from_radiation,
+)
+
+PARAMETERS = ("price_threshold", "battery_capacity_kWh", "charge_efficiency", "discharge_efficiency")
+SLOT_SECONDS = 1800
+# Below this many combinations per worker, process start-up costs more than it saves
+MIN_CHUNK = 1_000
+
+
+def parameter_grid(
+    price_threshold=(PRICE_THRESHOLD,),
+    battery_capacity_kWh=(BATTERY_CAPACITY_KWH,),
+    charge_efficiency=(CHARGE_EFFICIENCY,),
+    discharge_efficiency=(DISCHARGE_EFFICIENCY,),
+):
+    # Cartesian product as flat parallel arrays, one entry per combination
+    mesh = np.meshgrid(
+        *(np.atleast_1d(np.asarray(v, dtype=np.float64))
+          for v in (price_threshold, battery_capacity_kWh, charge_efficiency, discharge_efficiency)),
+        indexing="ij",
+    )
+    return {name: values.ravel() for name, values in zip(PARAMETERS, mesh)}
+
+
+def load_inputs(path, prices_path=None, slot_seconds=SLOT_SECONDS):
+    """Slot series from a local CSV with a header row:
+
+        timestamp,price_p_kWh,consumption_kWh,solar_kWh
+
+    timestamp is ISO 8601 (UTC) or unix seconds. solar_kWh may be replaced by
+    radiation_Wm2 (converted with the dashboard's panel model). prices_path
+    optionally points at saved Octopus unit-rates results (a JSON list, or a
+    page with "results"), which then supply the price for each slot.
+    """
+    import json
+
+    data = np.genfromtxt(path, delimiter=",", names=True, dtype=None, encoding="utf-8")
+    names = data.dtype.names
+    timestamps = data["timestamp"]
+    if timestamps.dtype.kind in "US":
+        times = np.array([t.replace("Z", "") for t in timestamps], dtype="datetime64[s]").astype(np.int64)
+    else:
+        times = timestamps.astype(np.int64)
+    inputs = {"time": times, "consumption_kWh": data["consumption_kWh"].astype(np.float64)}
+
+    if "solar_kWh" in names:
+        inputs["solar_kWh"] = data["solar_kWh"].astype(np.float64)
+    else:
+        inputs["solar_kWh"] = solar_from_radiation(data["radiation_Wm2"], sun_hours=slot_seconds / 3600)
+
+    if prices_path:
+        from services.tariff import TariffCurve
+
+        with open(prices_path, encoding="utf-8") as f:
+            results = json.load(f)
+        curve = TariffCurve.from_results(results.get("results", []) if isinstance(results, dict) else results, 0)
+        index = np.clip(np.searchsorted(curve.valid_from, times, side="right") - 1, 0, None)
+        covered = (curve.valid_from[index] <= times) & (times < curve.valid_to[index])
+        if not covered.all():
+            raise ValueError(f"{prices_path} has no price for {int((~covered).sum())} of {len(times)} slots")
+        inputs["price_p_kWh"] = curve.prices[index]
+    else:
+        inputs["price_p_kWh"] = data["price_p_kWh"].astype(np.float64)
+    return inputs
+
+
+def _run_chunk(args):
+    consumption, solar, price, feed_in_price, initial_soc, grid = args
+    threshold = grid["price_threshold"]
+    capacity = grid["battery_capacity_kWh"]
+    charge_efficiency = grid["charge_efficiency"]
+    discharge_efficiency = grid["discharge_efficiency"]
+    n = len(threshold)
+
+    charge = capacity * initial_soc
+    cost = np.zeros(n)
+    discharged = np.zeros(n)
+    # Scratch buffers reused every slot
+    discharge = np.empty(n, dtype=bool)
+    has_charge = np.empty(n, dtype=bool)
+    out = np.empty(n)
+    into = np.empty(n)
+    net = np.empty(n)
+    imported = np.empty(n)
+
+    for c, s, p in zip(consumption.tolist(), solar.tolist(), price.tolist()):
+        # Discharge when the grid is expensive and there is something to discharge ...
+        np.less(threshold, p, out=discharge)
+        np.greater(charge, 0, out=has_charge)
+        discharge &= has_charge
+        np.minimum(charge, c, out=out)
+        out *= discharge_efficiency
+        out *= discharge
+        # ... otherwise store solar in whatever room is left
+        np.subtract(capacity, charge, out=into)
+        np.minimum(into, s, out=into)
+        into *= charge_efficiency
+        np.copyto(into, 0.0, where=discharge)
+        charge -= out
+        charge += into
+        discharged += out
+
+        # Grid import (+) / export (-) after the battery: every kWh is worth the
+        # feed-in price, imports pay the difference to the slot price on top
+        np.subtract(into, out, out=net)
+        net += c - s
+        np.maximum(net, 0, out=imported)
+        imported *= p - feed_in_price
+        net *= feed_in_price
+        cost += net
+        cost += imported
+    return cost, discharged
+
+
+def run_backtest(inputs, grid, feed_in_price=FEED_IN_PRICE, initial_soc=0.5, workers=None):
+    """Total cost, savings and battery cycles for every combination in `grid`.
+
+    inputs: {"consumption_kWh", "solar_kWh", "price_p_kWh"} slot arrays (see load_inputs).
+    Returns the grid's parameter arrays plus "total_cost", "savings" and
+    "cycles" (discharged energy in full-capacity equivalents), and the
+    scalar "baseline_cost" (same solar, no battery).
+    """
+    consumption = np.asarray(inputs["consumption_kWh"], dtype=np.float64)
+    solar = np.asarray(inputs["solar_kWh"], dtype=np.float64)
+    price = np.asarray(inputs["price_p_kWh"], dtype=np.float64) / PENCE_PER_POUND  # p/kWh -> £/kWh
+    n = len(grid["price_threshold"])
+
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, n // MIN_CHUNK))
+    bounds = np.linspace(0, n, workers + 1).astype(int)
+    chunks = [
+        (consumption, solar, price, feed_in_price, initial_soc,
+         {name: grid[name][lo:hi] for name in PARAMETERS})
+        for lo, hi in itertools.pairwise(bounds)
+    ]
+    if workers == 1:
+        parts = [_run_chunk(chunks[0])]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            parts = list(pool.map(_run_chunk, chunks))
+    cost = np.concatenate([part[0] for part in parts])
+    discharged = np.concatenate([part[1] for part in parts])
+
+    net = consumption - solar
+    baseline = float(np.where(net > 0, net * price, net * feed_in_price).sum())
+    return {
+        **grid,
+        "total_cost": cost,
+        "savings": baseline - cost,
+        "cycles": np.divide(discharged, grid["battery_capacity_kWh"],
+                            out=np.zeros(n), where=grid["battery_capacity_kWh"] > 0),
+        "baseline_cost": baseline,
+    }
+
+
+def best(results, k=10):
+    # Indices of the k combinations with the largest savings
+    return np.argsort(results["savings"])[::-1][:k]
+
+
+def _values(spec):
+    # "0.05:0.40:0.01" (start:stop:step, inclusive) or "5,10,20"
+    if ":" in spec:
+        start, stop, step = (float(v) for v in spec.split(":"))
+        return np.arange(start, stop + step / 2, step)
+    return np.array([float(v) for v in spec.split(",")])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the optimizer's threshold strategy on local history")
+    parser.add_argument("inputs", help="CSV with timestamp,price_p_kWh,consumption_kWh,solar_kWh")
+    parser.add_argument("--prices", help="saved Octopus unit-rates JSON to take prices from")
+    parser.add_argument("--thresholds", default=str(PRICE_THRESHOLD), help="£/kWh")
+    parser.add_argument("--capacities", default=str(BATTERY_CAPACITY_KWH))
+    parser.add_argument("--charge-efficiencies", default=str(CHARGE_EFFICIENCY))
+    parser.add_argument("--discharge-efficiencies", default=str(DISCHARGE_EFFICIENCY))
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    grid = parameter_grid(
+        _values(args.thresholds), _values(args.capacities),
+        _values(args.charge_efficiencies), _values(args.discharge_efficiencies),
+    )
+    results = run_backtest(load_inputs(args.inputs, args.prices), grid, workers=args.workers)
+    print(f"No-battery cost: £{results['baseline_cost']:.2f} over {len(grid['price_threshold'])} combinations")
+    for i in best(results, args.top):
+        params = ", ".join(f"{name}={results[name][i]:g}" for name in PARAMETERS)
+        print(f"  {params}: cost £{results['total_cost'][i]:.2f}, "
+              f"savings £{results['savings'][i]:.2f}, {results['cycles'][i]:.1f} cycles")
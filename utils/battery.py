@@ -0,0 +1,102 @@
+# utils/battery.py
+# Single battery simulation used by OptimizerAgent, FleetOptimizerAgent and the
+# dashboard's what-if section. Pure and vectorized: every input may be a scalar
+# or an array (sites, scenarios, slider sweeps...) and results broadcast.
+
+import numpy as np
+
+# Octopus publishes pence per kWh; the simulation works in currency units (£) per kWh
+PENCE_PER_POUND = 100
+
+# Decision / action codes; index into these to get the strings the agents return
+DECISIONS = np.array(["store surplus", "use battery", "use solar, buy rest", "buy energy"])
+ACTIONS = np.array(["charge", "discharge"])
+
+STORE_SURPLUS, USE_BATTERY, USE_SOLAR_BUY_REST, BUY_ENERGY = range(4)
+CHARGE, DISCHARGE = range(2)
+
+# Defaults shared by every caller
+BATTERY_CAPACITY_KWH = 20
+CHARGE_EFFICIENCY = 0.9
+DISCHARGE_EFFICIENCY = 0.9
+PRICE_THRESHOLD = 0.15  # £ per kWh; discharge above it
+FEED_IN_PRICE = 0.05    # £ per kWh exported
+
+# Panel model the dashboard uses to turn radiation into energy
+PANEL_AREA_M2 = 10
+PANEL_EFFICIENCY = 0.18
+SUN_HOURS = 5
+
+
+def solar_from_radiation(radiation_Wm2, panel_area_m2=PANEL_AREA_M2, panel_efficiency=PANEL_EFFICIENCY,
+                         sun_hours=SUN_HOURS):
+    return np.asarray(radiation_Wm2, dtype=np.float64) * panel_area_m2 * panel_efficiency * sun_hours / 1000
+
+
+def decide(solar_kWh, consumption_kWh, discharge):
+    # High-level decision code for each site / scenario
+    solar = np.asarray(solar_kWh)
+    return np.where(
+        solar > np.asarray(consumption_kWh),
+        np.where(discharge, USE_BATTERY, STORE_SURPLUS),
+        np.where(solar > 0, USE_SOLAR_BUY_REST, BUY_ENERGY),
+    ).astype(np.int8)
+
+
+def simulate(
+    consumption_kWh,
+    solar_kWh,
+    price_kWh,
+    battery_charge_kWh,
+    battery_capacity_kWh=BATTERY_CAPACITY_KWH,
+    charge_efficiency=CHARGE_EFFICIENCY,
+    discharge_efficiency=DISCHARGE_EFFICIENCY,
+    price_threshold=PRICE_THRESHOLD,
+    feed_in_price=FEED_IN_PRICE,
+):
+    # One decision step. Prices are in £/kWh. Returns a dict of arrays; nothing is mutated.
+    consumption, solar, price, charge, capacity = np.broadcast_arrays(
+        *(np.asarray(v, dtype=np.float64) for v in
+          (consumption_kWh, solar_kWh, price_kWh, battery_charge_kWh, battery_capacity_kWh))
+    )
+    charge = np.clip(charge, 0, capacity)
+
+    # Discharge when the grid is expensive and there is something to discharge,
+    # otherwise store solar in whatever room is left
+    discharge = (price > price_threshold) & (charge > 0)
+    battery_change = np.where(
+        discharge,
+        np.minimum(charge, consumption) * discharge_efficiency,
+        np.minimum(capacity - charge, solar) * charge_efficiency,
+    )
+    new_charge = np.clip(charge + np.where(discharge, -battery_change, battery_change), 0, capacity)
+
+    effective_consumption = np.where(discharge, consumption - battery_change, consumption)
+    effective_solar = np.where(discharge, solar, solar - battery_change)
+
+    # Import what solar + battery don't cover, export what's left over
+    net_demand = np.maximum(0, effective_consumption - effective_solar)
+    exported = np.maximum(0, effective_solar - effective_consumption)
+    cost = net_demand * price
+    earnings = exported * feed_in_price
+    net_cost = cost - earnings
+
+    # Same household with solar but no battery
+    cost_without_battery = (np.maximum(0, consumption - solar) * price
+                            - np.maximum(0, solar - consumption) * feed_in_price)
+
+    return {
+        "decision": decide(solar, consumption, discharge),
+        "battery_action": discharge.astype(np.int8),
+        "battery_change_kWh": battery_change,
+        "battery_charge_kWh": new_charge,
+        "effective_consumption_kWh": effective_consumption,
+        "effective_solar_kWh": effective_solar,
+        "net_demand_kWh": net_demand,
+        "exported_kWh": exported,
+        "expected_cost": cost,
+        "earnings": earnings,
+        "net_cost": net_cost,
+        "cost_without_battery": cost_without_battery,
+        "savings": cost_without_battery - net_cost,
+    }
@@ -0,0 +1,137 @@
+# utils/battery_scheduler.py
+
+import numpy as np
+
+
+class BatteryScheduler:
+    """Plans battery charge/discharge over a multi-slot horizon.
+
+    Dynamic programming over a discretized state of charge: for every slot the
+    battery can move from any SOC level to any level reachable within the
+    charge/discharge power limits, paying the grid price for imports and
+    earning the feed-in price for exports.
+
+    Value functions are cached per absolute slot, so a replan whose tail
+    (prices + forecasts) matches the previous call reuses it instead of
+    recomputing it. The common case - the clock moved forward one slot and
+    nothing else changed - only needs the forward pass.
+    """
+
+    def __init__(
+        self,
+        battery_capacity_kWh=20,
+        charge_efficiency=0.9,
+        discharge_efficiency=0.9,
+        max_charge_kW=5.0,
+        max_discharge_kW=5.0,
+        slot_hours=0.5,
+        soc_levels=41,
+        feed_in_price=0.0,
+        terminal_price=0.0,
+    ):
+        self.capacity = float(battery_capacity_kWh)
+        self.charge_efficiency = charge_efficiency
+        self.discharge_efficiency = discharge_efficiency
+        self.max_charge = max_charge_kW * slot_hours
+        self.max_discharge = max_discharge_kW * slot_hours
+        self.slot_hours = slot_hours
+        self.feed_in_price = feed_in_price
+        self.levels = np.linspace(0.0, self.capacity, soc_levels)
+
+        # [i, j]: moving from level i to level j
+        delta = self.levels[None, :] - self.levels[:, None]
+        self.grid_delta = self._grid_delta(delta)
+        self.infeasible = (delta > self.max_charge + 1e-9) | (-delta > self.max_discharge + 1e-9)
+
+        # Value of energy left in the battery at the end of the horizon
+        self.terminal_value = -terminal_price * self.levels * discharge_efficiency
+
+        self._start = None   # absolute slot index of cached slot 0
+        self._inputs = None  # (T, 3) prices / consumption / solar for the cached slots
+        self._values = None  # (T + 1, S) cost-to-go
+        self._policy = None  # (T, S) next level index
+        self.stats = {"plans": 0, "slots_computed": 0, "slots_reused": 0}
+
+    def _grid_delta(self, delta):
+        # Energy drawn from (+) or delivered to (-) the household bus for a SOC change
+        return np.where(delta > 0, delta / self.charge_efficiency, delta * self.discharge_efficiency)
+
+    def _slot_cost(self, net, price):
+        return np.where(net > 0, net * price, net * self.feed_in_price)
+
+    def _reusable_from(self, start, inputs):
+        # First relative slot k such that values for slots >= k can be reused
+        T = len(inputs)
+        if self._start is None or start < self._start:
+            return T
+        old_T = len(self._inputs)
+        offset = start - self._start
+        if offset + T != old_T:
+            return T  # horizon end moved, the whole cost-to-go changes
+        changed = np.flatnonzero(np.any(self._inputs[offset:] != inputs, axis=1))
+        return int(changed[-1]) + 1 if len(changed) else 0
+
+    def plan(self, prices, consumption_kWh, solar_kWh, soc_kWh, start_slot=0):
+        # prices / consumption / solar are per-slot arrays for slots start_slot..start_slot+T
+        inputs = np.column_stack([
+            np.asarray(prices, dtype=np.float64),
+            np.broadcast_to(np.asarray(consumption_kWh, dtype=np.float64), len(prices)),
+            np.broadcast_to(np.asarray(solar_kWh, dtype=np.float64), len(prices)),
+        ])
+        T = len(inputs)
+        S = len(self.levels)
+
+        reuse_from = self._reusable_from(start_slot, inputs)
+        values = np.empty((T + 1, S))
+        policy = np.empty((T, S), dtype=np.int16)
+        if reuse_from < T:
+            offset = start_slot - self._start
+            values[reuse_from:] = self._values[offset + reuse_from:]
+            policy[reuse_from:] = self._policy[offset + reuse_from:]
+        else:
+            values[T] = self.terminal_value
+
+        # Backward pass over the slots whose cost-to-go changed
+        rows = np.arange(S)
+        for t in range(reuse_from - 1, -1, -1):
+            price, consumption, solar = inputs[t]
+            total = self._slot_cost(consumption - solar + self.grid_delta, price) + values[t + 1]
+            total[self.infeasible] = np.inf
+            best = np.argmin(total, axis=1)
+            policy[t] = best
+            values[t] = total[rows, best]
+
+        self._start, self._inputs, self._values, self._policy = start_slot, inputs, values, policy
+        self.stats["plans"] += 1
+        self.stats["slots_computed"] += reuse_from
+        self.stats["slots_reused"] += T - reuse_from
+
+        return self._forward(inputs, values, policy, soc_kWh)
+
+    def _forward(self, inputs, values, policy, soc_kWh):
+        T = len(inputs)
+        soc = np.empty(T + 1)
+        soc[0] = min(max(float(soc_kWh), 0.0), self.capacity)
+
+        # First slot starts from the exact SOC, not the nearest grid level
+        delta = self.levels - soc[0]
+        feasible = (delta <= self.max_charge + 1e-9) & (-delta <= self.max_discharge + 1e-9)
+        price, consumption, solar = inputs[0]
+        first = self._slot_cost(consumption - solar + self._grid_delta(delta), price) + values[1]
+        first[~feasible] = np.inf
+        level = int(np.argmin(first))
+        soc[1] = self.levels[level]
+        for t in range(1, T):
+            level = policy[t, level]
+            soc[t + 1] = self.levels[level]
+
+        change = np.diff(soc)
+        grid_import = inputs[:, 1] - inputs[:, 2] + self._grid_delta(change)
+        cost = self._slot_cost(grid_import, inputs[:, 0])
+        return {
+            "soc_kWh": soc,
+            "battery_change_kWh": change,
+            "grid_import_kWh": grid_import,
+            "cost": cost,
+            "total_cost": float(cost.sum()),
+        }
@@ -0,0 +1,219 @@
+# utils/forecast_model.py
+
+import os
+import threading
+
+import numpy as np
+
+MODEL_PATH = os.environ.get("GREENGRID_FORECAST_MODEL", ".forecast_model.npz")
+HOURS_PER_DAY = 24
+# Heating/cooling degree thresholds (°C)
+HEATING_BASE = 15.5
+COOLING_BASE = 22.0
+# Below this radiation (W/m²) solar output says nothing about panel size
+MIN_RADIATION = 50.0
+
+FEATURES = (
+    "bias",
+    "hour_sin1", "hour_cos1", "hour_sin2", "hour_cos2", "hour_sin3", "hour_cos3",
+    "weekend",
+    "temperature", "heating_degrees", "cooling_degrees",
+    "radiation", "radiation_x_solar_ratio",
+    "profile_consumption", "profile_solar",
+    "last_day_consumption", "last_day_solar",
+    "level_consumption",
+)
+
+
+class SiteState:
+    """Per-site history summary the forecaster's lag features are read from.
+
+    Updated one hourly observation at a time (O(sites) per hour) instead of
+    recomputing features from the full history:
+      - profile: EWMA of consumption/solar per hour of day
+      - last_day: the most recent observation at each hour of day
+      - level: EWMA of consumption over roughly the last day
+      - solar_ratio: EWMA of solar kWh per kW/m² of radiation (panel size)
+    Hours are UTC.
+    """
+
+    def __init__(self, n_sites, profile_alpha=0.2, level_alpha=1 / 24, ratio_alpha=0.05):
+        self.n_sites = n_sites
+        self.profile_alpha = profile_alpha
+        self.level_alpha = level_alpha
+        self.ratio_alpha = ratio_alpha
+        self.profile = np.zeros((n_sites, HOURS_PER_DAY, 2))
+        self.last_day = np.zeros((n_sites, HOURS_PER_DAY, 2))
+        self.level = np.zeros((n_sites, 2))
+        self.solar_ratio = np.zeros(n_sites)
+        self.hours_seen = np.zeros(n_sites, dtype=np.int64)
+        self.last_time = None
+
+    def update(self, time, consumption, solar, radiation=None):
+        # One hour of observations for every site; NaN means "no reading" for that site
+        hour = int(time // 3600) % HOURS_PER_DAY
+        obs = np.stack(np.broadcast_arrays(
+            np.asarray(consumption, dtype=np.float64), np.asarray(solar, dtype=np.float64)
+        ), axis=-1).reshape(self.n_sites, 2)
+        seen = ~np.isnan(obs).any(axis=1)
+        first = seen & (self.hours_seen < HOURS_PER_DAY)
+
+        profile = self.profile[:, hour]
+        blended = profile + self.profile_alpha * (obs - profile)
+        # Until a full day has been seen, the profile starts from the observation itself
+        self.profile[:, hour] = np.where(first[:, None], obs, np.where(seen[:, None], blended, profile))
+        self.last_day[:, hour] = np.where(seen[:, None], obs, self.last_day[:, hour])
+        level = np.where((self.hours_seen == 0)[:, None], obs, self.level + self.level_alpha * (obs - self.level))
+        self.level = np.where(seen[:, None], level, self.level)
+
+        if radiation is not None:
+            radiation = np.broadcast_to(np.asarray(radiation, dtype=np.float64), (self.n_sites,))
+            daylight = seen & (radiation > MIN_RADIATION)
+            ratio = np.divide(obs[:, 1] * 1000, radiation, out=np.zeros(self.n_sites), where=daylight)
+            blended = np.where(self.solar_ratio == 0, ratio, self.solar_ratio + self.ratio_alpha * (ratio - self.solar_ratio))
+            self.solar_ratio = np.where(daylight, blended, self.solar_ratio)
+
+        self.hours_seen += seen
+        self.last_time = time
+
+    @property
+    def warm(self):
+        # Sites with at least a day of history; colder sites use the heuristic
+        return self.hours_seen >= HOURS_PER_DAY
+
+
+def build_features(state, times, temperature, radiation, sites=slice(None)):
+    # times: (H,) unix seconds of each target hour; temperature/radiation: (S, H)
+    # Returns X with shape (S, H, len(FEATURES))
+    times = np.asarray(times, dtype=np.int64)
+    temperature = np.asarray(temperature, dtype=np.float64)
+    radiation = np.maximum(0, np.asarray(radiation, dtype=np.float64))
+    n_sites, n_hours = temperature.shape
+    hour = (times // 3600) % HOURS_PER_DAY
+    angle = 2 * np.pi * hour / HOURS_PER_DAY
+    weekday = (times // 86400 + 3) % 7  # 1970-01-01 was a Thursday
+
+    X = np.empty((n_sites, n_hours, len(FEATURES)))
+    X[..., 0] = 1.0
+    for k in range(1, 4):
+        X[..., 2 * k - 1] = np.sin(k * angle)
+        X[..., 2 * k] = np.cos(k * angle)
+    X[..., 7] = weekday >= 5
+    X[..., 8] = temperature
+    X[..., 9] = np.maximum(0, HEATING_BASE - temperature)
+    X[..., 10] = np.maximum(0, temperature - COOLING_BASE)
+    X[..., 11] = radiation
+    X[..., 12] = radiation / 1000 * state.solar_ratio[sites, None]
+    X[..., 13] = state.profile[sites][:, hour, 0]
+    X[..., 14] = state.profile[sites][:, hour, 1]
+    X[..., 15] = state.last_day[sites][:, hour, 0]
+    X[..., 16] = state.last_day[sites][:, hour, 1]
+    X[..., 17] = state.level[sites, None, 0]
+    return X
+
+
+def replay(times, consumption, solar, temperature, radiation, state=None, warmup_hours=HOURS_PER_DAY):
+    # Walk hourly history (arrays shaped (S, H)) through a SiteState, emitting a
+    # training row per site and hour from the state *before* that hour is seen.
+    # Returns X (rows, F), Y (rows, 2) and the final state.
+    consumption = np.asarray(consumption, dtype=np.float64)
+    n_sites, n_hours = consumption.shape
+    state = state or SiteState(n_sites)
+    rows_X, rows_Y = [], []
+    for j in range(n_hours):
+        if j >= warmup_hours:
+            X = build_features(state, times[j:j + 1], temperature[:, j:j + 1], radiation[:, j:j + 1])[:, 0]
+            Y = np.stack([consumption[:, j], solar[:, j]], axis=1)
+            keep = state.warm & ~np.isnan(Y).any(axis=1)
+            rows_X.append(X[keep])
+            rows_Y.append(Y[keep])
+        state.update(times[j], consumption[:, j], solar[:, j], radiation[:, j])
+    if not rows_X:
+        return np.empty((0, len(FEATURES))), np.empty((0, 2)), state
+    return np.concatenate(rows_X), np.concatenate(rows_Y), state
+
+
+class ForecastModel:
+    """Ridge regression from weather, calendar and lag features to hourly
+    consumption and solar kWh. One global weight matrix (features x 2) is
+    shared by every site; site differences come in through SiteState."""
+
+    def __init__(self, weights, mean, std, metadata=None):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        self.metadata = metadata or {}
+        # Standardization folded into the weights, so inference is one matmul
+        self._weights = self.weights / self.std[:, None]
+        self._offset = -(self.mean / self.std) @ self.weights
+
+    @classmethod
+    def fit(cls, X, Y, alpha=1.0, metadata=None):
+        # Closed-form ridge on standardized features; the bias column is not penalized
+        mean = X.mean(axis=0)
+        std = X.std(axis=0)
+        mean[0], std[0] = 0.0, 1.0
+        std[std == 0] = 1.0
+        Z = (X - mean) / std
+        penalty = alpha * np.eye(Z.shape[1])
+        penalty[0, 0] = 0.0
+        weights = np.linalg.solve(Z.T @ Z + penalty, Z.T @ Y)
+        return cls(weights, mean, std, dict(metadata or {}, rows=len(X), alpha=alpha))
+
+    def predict_features(self, X):
+        return np.maximum(0, X @ self._weights + self._offset)
+
+    def predict(self, state, times, temperature, radiation, chunk_sites=2048):
+        # Every site and hour in one call: returns (consumption, solar), each (S, H)
+        temperature = np.atleast_2d(temperature)
+        radiation = np.atleast_2d(radiation)
+        n_sites, n_hours = temperature.shape
+        out = np.empty((n_sites, n_hours, 2))
+        # Chunked over sites so the (S, H, F) feature block stays small
+        for lo in range(0, n_sites, chunk_sites):
+            sites = slice(lo, lo + chunk_sites)
+            X = build_features(state, times, temperature[sites], radiation[sites], sites)
+            out[sites] = self.predict_features(X)
+        return out[..., 0], out[..., 1]
+
+    def save(self, path=MODEL_PATH):
+        # Written next to the target and renamed into place, so readers never see half a file
+        tmp = f"{path}.tmp.npz"
+        np.savez(
+            tmp,
+            weights=self.weights,
+            mean=self.mean,
+            std=self.std,
+            features=np.array(FEATURES),
+            metadata_keys=np.array(list(self.metadata), dtype=str),
+            metadata_values=np.array([str(v) for v in self.metadata.values()], dtype=str),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with np.load(path) as data:
+            if tuple(data["features"]) != FEATURES:
+                raise ValueError(f"{path} was trained with a different feature set")
+            metadata = dict(zip(data["metadata_keys"].tolist(), data["metadata_values"].tolist()))
+            return cls(data["weights"], data["mean"], data["std"], metadata)
+
+
+_model = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+
+def get_forecast_model(path=None):
+    # The trained model, loaded once per process; None when no artifact exists
+    global _model, _model_loaded
+    with _model_lock:
+        if not _model_loaded:
+            path = path or MODEL_PATH
+            if os.path.exists(path):
+                try:
+                    _model = ForecastModel.load(path)
+                except Exception as e:
+                    print(f"⚠️ Could not load forecast model {path}: {e}")
+            _model_loaded = True
+        return _model
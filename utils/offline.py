@@ -0,0 +1,10 @@
+# utils/offline.py
+
+import os
+
+
+def is_offline():
+    # GREENGRID_OFFLINE=1 runs the pipeline without cloud services or network:
+    # readings go to a local file, forecasts/prices/reports use their fallbacks,
+    # and the Google client libraries are never imported.
+    return os.environ.get("GREENGRID_OFFLINE", "").lower() in ("1", "true", "yes")